@@ -1,23 +1,46 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
+import hashlib
 import os
+import sys
 
-credentials, project_id = google.auth.default()
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client, run_concurrently
+from functools import partial
+from utils.passages import select_passages, format_passages
+from utils.query_cache import get_query_cache
 
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
+def generate_ai_summary(query, results, documents, directory=None):
+    """
+    Function to generate an AI summary based on the user query and relevant documents.
+
+    Only the passages that best match the query are sent to the model, limited by
+    SUMMARY_TOP_PASSAGES and SUMMARY_TOKEN_BUDGET, rather than the full text of every document.
+    When a directory is given, summaries are cached until the directory's index changes, keyed on
+    the query and the documents in results, so each page of results gets its own summary.
+    """
+    cache_key = None
+    if directory is not None:
+        doc_ids = "\n".join(str(getattr(result, 'doc_id', result)) for result in results)
+        kind = f"summary:{hashlib.sha256(doc_ids.encode('utf-8')).hexdigest()}"
+        cache_key = get_query_cache().key_for(directory, kind, query)
+        cached_summary = get_query_cache().get(cache_key)
+        if cached_summary is not None:
+            return cached_summary
+
+    passages = select_passages(query, documents, directory)
+    rankings = "\n".join(str(result) for result in results)
 
-def generate_ai_summary(query, results, documents):
-    """Function to generate an AI summary based on the user query and relevant documents"""
-    
     prompt = f"""
     Summarize the following document search based on the query: {query}
     
-    Document rankings based on search: {results}
+    Document rankings based on search:
+    {rankings}
+    
+    Names of the available documents: {list(documents)}
     
-    Contents of the documents and their names: {documents}
+    Most relevant passages from the documents, labelled with their document names:
+    {format_passages(passages)}
     
     You should summarise as if the search is a google/web search querying the documents for the user.
     Provide a comprehensive summary that includes:
@@ -32,6 +55,8 @@ def generate_ai_summary(query, results, documents):
             contents=[prompt]
         )
         print("AI Response:", response.text)
+        if cache_key is not None and response.text:
+            get_query_cache().put(cache_key, response.text)
         return response.text
     except Exception as e:
         print(f"Error generating AI summary: {str(e)}")
@@ -122,23 +147,18 @@ def main():
 
     # Here you would typically call the search function to retrieve documents based on the transcribed question
     results = search_documents(query, all_documents)
-    new_results = []
-    for result in results:
-        start_index = 10
-        end_index = result.find(",")
-        new_results.append(result[start_index:end_index])
-    results = new_results
-    
-    # Generate an AI summary for those documents
-    summary = generate_ai_summary(query, results, all_documents)
-    
-    # Optional: Generate search suggestions
-    suggestions = generate_search_suggestions(query, all_documents)
+    
+    # Generate an AI summary for those documents, along with the optional search suggestions
+    # and search quality analysis, all at the same time
+    summary, suggestions, quality_analysis = run_concurrently(
+        partial(generate_ai_summary, query, results, all_documents, directory),
+        partial(generate_search_suggestions, query, all_documents),
+        partial(analyze_search_quality, query, results, all_documents),
+    )
+    
     print("\n--- Search Suggestions ---")
     print(suggestions)
     
-    # Optional: Analyze search quality
-    quality_analysis = analyze_search_quality(query, results, all_documents)
     print("\n--- Search Quality Analysis ---")
     print(quality_analysis)
 
@@ -78,10 +78,10 @@ def search():
     user_query = request.form['query']
     target_directory = request.form['directory']
     documents = handle_documents(target_directory)
-    results = search_documents(user_query, documents)
-    ai_summary = generate_ai_summary(user_query, results, documents)
+    results = search_documents(user_query, documents, target_directory)
+    ai_summary = generate_ai_summary(user_query, results, documents, target_directory)
     ai_summary = ai_summary.replace("\n","  <br>")
-    return render_template('index.html', results=results, ai_summary=ai_summary)
+    return render_template('index.html', results=results, ai_summary=ai_summary, documents=documents)
 
 if __name__ == '__main__':
     app.run(host='localhost', port=6922)
\ No newline at end of file
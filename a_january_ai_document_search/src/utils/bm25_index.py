@@ -0,0 +1,236 @@
+import heapq
+import math
+import re
+import threading
+
+from utils.chunking import iter_chunks
+
+# Same token pattern as scikit-learn's default so every engine splits words the same way
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+# Removed documents leave empty slots, which are compacted away once there are more of them than
+# live documents (and at least this many)
+COMPACT_MIN_SLOTS = 64
+
+_open_indexes = {}
+_open_indexes_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Split text into lower case terms"""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+def parse_query(query):
+    """
+    Split a query into its loose terms and its quoted phrases.
+
+    Returns:
+    tuple: (list of terms, list of phrases where each phrase is a list of terms)
+    """
+    phrases = [tokenize(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+    phrases = [phrase for phrase in phrases if phrase]
+    terms = tokenize(PHRASE_PATTERN.sub(" ", query))
+    for phrase in phrases:
+        terms.extend(phrase)
+    return terms, phrases
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 scoring.
+
+    Each term maps to a postings dictionary of {doc number: [positions]}, so a search only
+    touches the postings of the query terms and quoted phrases can be checked against the
+    stored positions. The defaults for k1 and b match Elasticsearch.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_ids = []
+        self.doc_numbers = {}
+        self.doc_lengths = []
+        self.doc_signatures = []
+        self.doc_terms = []
+        self.total_length = 0
+        self.live_docs = 0
+        self.synced_version = None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self.live_docs
+
+    def add_document(self, doc_id, text, signature=None):
+        """
+        Add a document, replacing any previous version with the same name.
+
+        The text can be a string or an iterable of strings (e.g. PDF pages), which is tokenised one
+        bounded chunk at a time with positions carrying on from one chunk to the next. signature is
+        what sync compares to tell whether the document has changed (e.g. its file's size and
+        modified time), by default the length of the text.
+        """
+        with self.lock:
+            self.remove_document(doc_id)
+
+            doc_number = len(self.doc_ids)
+            doc_terms = set()
+            position = 0
+            for chunk in iter_chunks(text):
+                for term in tokenize(chunk):
+                    self.postings.setdefault(term, {}).setdefault(doc_number, []).append(position)
+                    doc_terms.add(term)
+                    position += 1
+
+            self.doc_ids.append(doc_id)
+            self.doc_numbers[doc_id] = doc_number
+            self.doc_lengths.append(position)
+            self.doc_signatures.append(text_signature(text) if signature is None else signature)
+            self.doc_terms.append(doc_terms)
+            self.total_length += position
+            self.live_docs += 1
+
+    def remove_document(self, doc_id):
+        """Remove a document, returning True if it was indexed"""
+        with self.lock:
+            doc_number = self.doc_numbers.pop(doc_id, None)
+            if doc_number is None:
+                return False
+
+            for term in self.doc_terms[doc_number]:
+                postings = self.postings[term]
+                del postings[doc_number]
+                if not postings:
+                    del self.postings[term]
+
+            # The slot is left empty until there are enough empty slots to compact them away
+            self.total_length -= self.doc_lengths[doc_number]
+            self.doc_ids[doc_number] = None
+            self.doc_lengths[doc_number] = 0
+            self.doc_signatures[doc_number] = None
+            self.doc_terms[doc_number] = set()
+            self.live_docs -= 1
+            if len(self.doc_ids) - self.live_docs > max(COMPACT_MIN_SLOTS, self.live_docs):
+                self._compact()
+            return True
+
+    def _compact(self):
+        """Renumber the live documents from 0, dropping the empty slots left by removed documents"""
+        live = [doc_number for doc_number, doc_id in enumerate(self.doc_ids) if doc_id is not None]
+        renumbered = {old: new for new, old in enumerate(live)}
+        self.postings = {
+            term: {renumbered[doc_number]: positions for doc_number, positions in postings.items()}
+            for term, postings in self.postings.items()
+        }
+        self.doc_ids = [self.doc_ids[doc_number] for doc_number in live]
+        self.doc_lengths = [self.doc_lengths[doc_number] for doc_number in live]
+        self.doc_signatures = [self.doc_signatures[doc_number] for doc_number in live]
+        self.doc_terms = [self.doc_terms[doc_number] for doc_number in live]
+        self.doc_numbers = {doc_id: doc_number for doc_number, doc_id in enumerate(self.doc_ids)}
+
+    def sync(self, indexed_documents, signatures=None, version=None):
+        """
+        Index new or changed documents and drop missing ones, leaving unchanged documents alone.
+
+        A document has changed when its signature does, taken from signatures (e.g. the file
+        signatures of a DirectoryIndex) or else the length of its text, so the text itself is never
+        read again. If version (e.g. the DirectoryIndex version) is the same as on the last sync,
+        nothing has changed and the documents are not looked at at all.
+        """
+        with self.lock:
+            if version is not None and version == self.synced_version:
+                return
+            for doc_id in [doc_id for doc_id in self.doc_numbers if doc_id not in indexed_documents]:
+                self.remove_document(doc_id)
+            for doc_id, text in indexed_documents.items():
+                if text is None:
+                    continue
+                signature = signatures.get(doc_id) if signatures else None
+                if signature is None:
+                    signature = text_signature(text)
+                doc_number = self.doc_numbers.get(doc_id)
+                if doc_number is None or self.doc_signatures[doc_number] != signature:
+                    self.add_document(doc_id, text, signature)
+            self.synced_version = version
+
+    def _idf(self, term):
+        doc_freq = len(self.postings.get(term, ()))
+        return math.log(1 + (self.live_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _contains_phrase(self, doc_number, phrase):
+        """Check whether the terms of a phrase appear next to each other in a document"""
+        first_positions = self.postings[phrase[0]][doc_number]
+        following = [set(self.postings[term][doc_number]) for term in phrase[1:]]
+        for start in first_positions:
+            if all(start + offset + 1 in positions for offset, positions in enumerate(following)):
+                return True
+        return False
+
+    def search(self, query, top_k=10):
+        """
+        Rank documents against a query using BM25.
+
+        Loose terms are OR'd together. Quoted phrases must appear in a document for it to match.
+
+        Parameters:
+        query (str): The user's search query.
+        top_k (int): The maximum number of results to return (None for all matches).
+
+        Returns:
+        list: A list of tuples containing the document name and its BM25 score, sorted by score.
+        """
+        terms, phrases = parse_query(query)
+        with self.lock:
+            if not self.live_docs or not terms:
+                return []
+
+            candidates = None
+            for phrase in phrases:
+                if any(term not in self.postings for term in phrase):
+                    return []
+                # Start from the rarest term so the phrase check touches as few documents as possible
+                rarest = min(phrase, key=lambda term: len(self.postings[term]))
+                matches = {
+                    doc_number for doc_number in self.postings[rarest]
+                    if all(doc_number in self.postings[term] for term in phrase)
+                    and self._contains_phrase(doc_number, phrase)
+                }
+                candidates = matches if candidates is None else candidates & matches
+
+            average_length = self.total_length / self.live_docs
+            scores = {}
+            for term in set(terms):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = self._idf(term)
+                query_frequency = terms.count(term)
+                for doc_number, positions in postings.items():
+                    if candidates is not None and doc_number not in candidates:
+                        continue
+                    frequency = len(positions)
+                    length_norm = 1 - self.b + self.b * self.doc_lengths[doc_number] / average_length
+                    score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                    scores[doc_number] = scores.get(doc_number, 0.0) + query_frequency * score
+
+            if top_k is None:
+                ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            else:
+                ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(self.doc_ids[doc_number], score) for doc_number, score in ranked]
+
+
+def text_signature(text):
+    """Cheap stand-in for a file signature, the length of a text (None for an iterable of pages)"""
+    return len(text) if isinstance(text, str) else None
+
+
+def get_bm25_index(index_name):
+    """Return the shared BM25 index with the given name, creating it if needed"""
+    with _open_indexes_lock:
+        index = _open_indexes.get(index_name)
+        if index is None:
+            index = BM25Index()
+            _open_indexes[index_name] = index
+        return index
@@ -0,0 +1,63 @@
+import os
+
+# Upper bound on how much text is held at once while streaming documents through the indexers,
+# in bytes of UTF-8
+MAX_INFLIGHT_BYTES = int(os.environ.get("MAX_INFLIGHT_BYTES", 1024 * 1024))
+
+
+def utf8_size(text):
+    """Size of text in bytes once encoded as UTF-8"""
+    return len(text.encode("utf-8"))
+
+
+def iter_text_chunks(text, max_bytes=MAX_INFLIGHT_BYTES):
+    """
+    Split text into chunks of at most max_bytes of UTF-8, breaking on whitespace so no word is cut in two.
+
+    A single word longer than max_bytes is still cut, so every chunk stays within the budget.
+    """
+    if not text:
+        return
+    start = 0
+    length = len(text)
+    while start < length:
+        # Every character is at least one byte, so max_bytes characters is the most that can fit
+        end = min(start + max_bytes, length)
+        size = utf8_size(text[start:end])
+        while size > max_bytes and end - start > 1:
+            # Non-ASCII characters take several bytes, shrink in proportion until the chunk fits
+            end = start + max(1, (end - start) * max_bytes // size)
+            size = utf8_size(text[start:end])
+        if end < length:
+            # Move back to the last whitespace so a word is not split across chunks
+            split = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+            if split > start:
+                end = split + 1
+        yield text[start:end]
+        start = end
+
+
+def iter_chunks(source, max_bytes=MAX_INFLIGHT_BYTES):
+    """
+    Yield text chunks of at most max_bytes from either a string or an iterable of strings (such as
+    PDF pages). Small parts are grouped together and large ones split, so the chunks stay close to
+    the budget without going over it.
+    """
+    if source is None:
+        return
+    if isinstance(source, str):
+        yield from iter_text_chunks(source, max_bytes)
+        return
+    pending = []
+    pending_size = 0
+    for part in source:
+        for piece in iter_text_chunks(part, max_bytes):
+            size = utf8_size(piece)
+            if pending and pending_size + size > max_bytes:
+                yield "".join(pending)
+                pending = []
+                pending_size = 0
+            pending.append(piece)
+            pending_size += size
+    if pending:
+        yield "".join(pending)
@@ -1,36 +1,71 @@
 import docx
 import PyPDF2
+import hashlib
 import os
+from itertools import chain
+from utils.search_index import get_directory_index, file_signature
+from utils.extraction_cache import get_extraction_cache
+from utils.ingestion import ingest_files
+from utils.query_cache import get_query_cache
 
 search_index = {}
+SUPPORTED_TYPES = ('pdf', 'docx', 'txt')
+INDEX_BATCH_SIZE = 32
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# PDFs larger than this are indexed straight from their pages, never holding their whole text. Only
+# their first MAX_INFLIGHT_BYTES of text is kept for result snippets and summaries
+STREAM_PDF_BYTES = int(os.environ.get("STREAM_PDF_BYTES", 16 * 1024 * 1024))
 
-def process_document(file_path):
+def process_document(file_path, sha256=None):
     # Function to process a document based on its file type
+    if not is_supported(file_path):
+        print(f"Unsupported file type: {file_path.split('.')[-1]}")
+        return None
+    text = get_extraction_cache().get_or_extract(file_path, extract_text, sha256)
+    index_document(file_path, text)
+    return text
+
+def is_supported(file_path):
+    # Function to check whether text can be extracted from a file
+    return file_path.split('.')[-1] in SUPPORTED_TYPES
+
+def extract_text(file_path):
+    # Function to extract text from a document based on its file type
     file_type = file_path.split('.')[-1]
     match file_type:
         case 'pdf':
-            text = extract_text_from_pdf(file_path)
-            index_document(file_path, text)
-            return text
+            return extract_text_from_pdf(file_path)
         case 'docx':
-            text = extract_text_from_docx(file_path)
-            index_document(file_path, text)
-            return text
+            return extract_text_from_docx(file_path)
         case 'txt':
-            text = extract_text_from_txt(file_path)
-            index_document(file_path, text)
-            return text
+            return extract_text_from_txt(file_path)
         case _:
             print(f"Unsupported file type: {file_type}")
+            return None
 
 def extract_text_from_pdf(pdf_path):
     # Function to extract text from a PDF file
+    return "".join(text for _, text in iter_pdf_pages(pdf_path))
+
+def extract_text_from_pdf_pages(pdf_path, start_page, end_page):
+    # Function to extract text from a range of pages in a PDF file, so large PDFs can be split across workers
+    return "".join(text for _, text in iter_pdf_pages(pdf_path, start_page, end_page))
+
+def iter_pdf_pages(pdf_path, start_page=0, end_page=None):
+    # Generator that extracts a PDF one page at a time, yielding (page_no, text)
     reader = PyPDF2.PdfReader(pdf_path)
-    text = ""
-    for page_num in range(len(reader.pages)):
-        page = reader.pages[page_num]
-        text += page.extract_text()
-    return text
+    page_count = len(reader.pages)
+    end_page = page_count if end_page is None else min(end_page, page_count)
+    for page_num in range(start_page, end_page):
+        yield page_num, reader.pages[page_num].extract_text() or ""
+
+def should_stream(file_path):
+    # Function to check whether a document is large enough to be indexed page by page
+    return file_path.split('.')[-1] == 'pdf' and os.path.getsize(file_path) > STREAM_PDF_BYTES
+
+def count_pdf_pages(pdf_path):
+    # Function to count the pages of a PDF file without extracting any text
+    return len(PyPDF2.PdfReader(pdf_path).pages)
 
 
 def extract_text_from_docx(docx_path):
@@ -54,75 +89,124 @@ def extract_text_from_txt(txt_path):
 def index_document(file_name, text):
     # Function to index the processed document
     search_index[file_name] = text
-    print()
-    print("Search index now contains:")
-    print(f"Indexed document: {file_name}")
-    print(f"Document text: {text}")
-    print()
+    print(f"Indexed document: {file_name} ({len(text or '')} characters)")
 
 def handle_document_upload(file, file_path):
-    # Copy the file to the docs folder
-    fileType = file.filename.split('.')[-1]
-    match fileType:
-        case 'pdf':
-            reader = PyPDF2.PdfReader(file)
-            # save the pdf file to the file path using PyPDF2
-            with open(file_path, 'wb') as f:
-                writer = PyPDF2.PdfWriter()
-                for page_num in range(len(reader.pages)):
-                    writer.add_page(reader.pages[page_num])
-                writer.write(f)
-                writer.close()
-        case 'docx':
-            template = docx.Document()
-            this_file = docx.Document(file)
-            for para in this_file.paragraphs:
-                template.add_paragraph(para.text)
-            for table in this_file.tables:
-                # Get the number of rows and columns from the table
-                rows = len(table.rows)
-                cols = len(table.columns)
-                # Add a table to the template with the same number of rows and columns
-                new_table = template.add_table(rows=rows, cols=cols)
-                # Copy the content of each cell
-                for i in range(rows):
-                    for j in range(cols):
-                        new_table.cell(i, j).text = table.cell(i, j).text
-            template.save(file_path)
-        case 'txt':
-            fileContents = file.readlines()
-            with open(file_path, 'w') as f:
-                for line in fileContents:
-                    f.write(line.decode('utf-8'))
-        case _:
-            print(f"Unsupported file type: {fileType}")
+    sha256 = save_document_upload(file, file_path)
     # Process and index the document
-    text = process_document(file_path)
+    text = process_document(file_path, sha256)
     return text
 
+def save_document_upload(file, file_path):
+    # Stream the upload straight to the docs folder in fixed size chunks, hashing it on the way
+    # so the saved file never has to be read again just to fingerprint it
+    fileType = file.filename.split('.')[-1]
+    if fileType not in SUPPORTED_TYPES:
+        print(f"Unsupported file type: {fileType}")
+        return None
+
+    digest = hashlib.sha256()
+    partial_path = file_path + ".part"
+    try:
+        with open(partial_path, 'wb') as f:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        # Only replace the file once it has been fully written
+        os.replace(partial_path, file_path)
+    except Exception:
+        # Don't leave a half written copy behind
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return digest.hexdigest()
+
 def process_documents(files, target_directory):
     # Ensure the target directory exists
+    directory_name = target_directory
     target_directory = f"{os.path.dirname(__file__)}\\docs\\{target_directory}"
     os.makedirs(target_directory, exist_ok=True)
 
+    # Save every upload first so extraction can run across all of them in parallel
+    file_paths = []
+    hashes = {}
     for file in files:
         file_path = os.path.join(target_directory, file.filename)
-        text = handle_document_upload(file, file_path)
+        sha256 = save_document_upload(file, file_path)
+        if sha256 is not None:
+            file_paths.append(file_path)
+            hashes[file_path] = sha256
+
+    directory_index = get_directory_index(directory_name)
+    batch = {}
+    signatures = {}
+
+    def add_stream_to_index(file_path, chunks):
+        # Large PDFs go straight from their pages (or the cache) into the index, one MAX_INFLIGHT_BYTES chunk at a time
+        doc_name = os.path.basename(file_path)
+        directory_index.add_documents({doc_name: chunks}, {doc_name: file_signature(file_path)})
+        print(f"Indexed document: {file_path} (streamed page by page)")
+
+    def add_to_index(file_path, text):
+        # Stream finished documents into the index in batches while other files are still being extracted
+        doc_name = os.path.basename(file_path)
+        index_document(file_path, text)
+        batch[doc_name] = text
+        signatures[doc_name] = file_signature(file_path)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            directory_index.add_documents(batch, signatures)
+            batch.clear()
+
+    ingest_files(file_paths, on_document=add_to_index, hashes=hashes, on_stream=add_stream_to_index)
+
+    # Only the new files are vectorised, the rest of the directory index is reused
+    directory_index.add_documents(batch, signatures)
+    directory_index.save()
+    # Cached results and summaries for this directory are out of date now
+    get_query_cache().invalidate(directory_name)
     return search_index
 
 def handle_documents(target_directory):
     # Process all documents in the target directory
+    directory_name = target_directory
     target_directory = f"{os.path.dirname(__file__)}/docs/{target_directory}"
     all_documents = []
-    indexed_documents = {}
+    signatures = {}
 
     for file_name in os.listdir(target_directory):
         if os.path.isfile(os.path.join(target_directory, file_name)):
             all_documents.append(file_name)
 
-    for doc_name in all_documents:
-        doc_path = os.path.join(target_directory, doc_name)
-        text = process_document(doc_path)
-        indexed_documents[doc_name] = text
+    doc_paths = [os.path.join(target_directory, doc_name) for doc_name in all_documents]
+    for doc_name, doc_path in zip(all_documents, doc_paths):
+        signatures[doc_name] = file_signature(doc_path)
+
+    directory_index = get_directory_index(directory_name)
+    stale = set(directory_index.stale_documents(signatures))
+    previews = {}
+    streamed = []
+
+    def preview_stream(file_path, chunks):
+        # Large PDFs are only read through when they need indexing, otherwise just their first chunk is kept
+        doc_name = os.path.basename(file_path)
+        chunks = iter(chunks)
+        previews[doc_name] = next(chunks, "")
+        if doc_name in stale:
+            directory_index.add_documents({doc_name: chain([previews[doc_name]], chunks)}, {doc_name: signatures[doc_name]})
+            streamed.append(doc_name)
+
+    extracted = ingest_files(doc_paths, on_document=index_document, on_stream=preview_stream)
+
+    indexed_documents = {}
+    for doc_name, doc_path in zip(all_documents, doc_paths):
+        indexed_documents[doc_name] = previews.get(doc_name, extracted[doc_path]['text'])
+
+    # Keep the persistent index in step with files added or removed outside of uploads
+    if directory_index.update_directory(indexed_documents, signatures) or streamed:
+        directory_index.save()
+        get_query_cache().invalidate(directory_name)
 
     return indexed_documents
\ No newline at end of file
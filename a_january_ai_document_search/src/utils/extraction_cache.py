@@ -0,0 +1,241 @@
+import codecs
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Extracted text lives alongside the search indexes so both can be cleared together
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "indexes", "extraction_cache.db")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+# How much compressed text is inflated at a time when a cached text is streamed back
+STREAM_CHUNK_SIZE = 256 * 1024
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def file_sha256(file_path):
+    """Hash a file in fixed size chunks so large PDFs are never read into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_decompressed(content):
+    """Inflate zlib compressed UTF-8 a piece at a time, yielding the text without holding it whole"""
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(content), STREAM_CHUNK_SIZE):
+        text = decoder.decode(decompressor.decompress(content[start:start + STREAM_CHUNK_SIZE]))
+        if text:
+            yield text
+    text = decoder.decode(decompressor.flush(), final=True)
+    if text:
+        yield text
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of text extracted from documents.
+
+    Files are looked up by (path, size, mtime) first, which needs nothing more than a stat call.
+    If that misses the file is hashed and looked up by its sha256, so renamed or re-uploaded
+    copies of a document are not parsed again either. Text is stored zlib compressed in SQLite
+    and the least recently used entries are evicted once the store grows past max_bytes.
+    """
+
+    def __init__(self, db_path=CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.lock, self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            ''')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS texts (
+                    sha256 TEXT PRIMARY KEY,
+                    content BLOB NOT NULL,
+                    stored_bytes INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_texts_last_used ON texts (last_used)")
+
+    def _lookup(self, sha256):
+        row = self.connection.execute("SELECT content FROM texts WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute("UPDATE texts SET last_used = ? WHERE sha256 = ?", (time.time(), sha256))
+        return row[0]
+
+    def get(self, file_path):
+        """Return the cached text for a file, or None if it has not been extracted before"""
+        return self.find(file_path)[0]
+
+    def find(self, file_path, sha256=None):
+        """
+        Look a file up, returning (text, sha256) where sha256 is only set if it had to be hashed.
+
+        If the sha256 of the file is already known (e.g. it was hashed while being uploaded) it is
+        used directly instead of reading the file again.
+        """
+        content, sha256 = self._find(file_path, sha256)
+        if content is None:
+            return None, sha256
+        return zlib.decompress(content).decode("utf-8"), sha256
+
+    def find_stream(self, file_path, sha256=None):
+        """
+        Like find, but returns (chunks, sha256) where chunks is an iterable of pieces of the text, so
+        a large cached document is never decompressed whole.
+        """
+        content, sha256 = self._find(file_path, sha256)
+        if content is None:
+            return None, sha256
+        return iter_decompressed(content), sha256
+
+    def _find(self, file_path, sha256=None):
+        path = os.path.abspath(file_path)
+        stats = os.stat(path)
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stats.st_size, stats.st_mtime_ns)
+            ).fetchone()
+            if row is not None:
+                content = self._lookup(row[0])
+                if content is not None:
+                    self.hits += 1
+                    return content, None
+
+        # The path is new or the file was touched, fall back to the content hash
+        sha256 = sha256 or file_sha256(path)
+        with self.lock, self.connection:
+            content = self._lookup(sha256)
+            if content is None:
+                self.misses += 1
+                return None, sha256
+            self._remember_file(path, stats, sha256)
+            self.hits += 1
+            return content, sha256
+
+    def put(self, file_path, text, sha256=None):
+        """Store the extracted text of a file"""
+        self._store(file_path, zlib.compress(text.encode("utf-8"), 6), sha256)
+
+    def put_stream(self, file_path, chunks, sha256=None):
+        """
+        Store the text of a file from an iterable of chunks, compressing each one as it passes.
+
+        This is a generator that yields the chunks on, so the text can be indexed in the same pass
+        without ever being held whole. The text is stored once the chunks run out, and not at all
+        if the iteration stops early.
+        """
+        compressor = zlib.compressobj(6)
+        compressed = []
+        for chunk in chunks:
+            compressed.append(compressor.compress(chunk.encode("utf-8")))
+            yield chunk
+        compressed.append(compressor.flush())
+        self._store(file_path, b"".join(compressed), sha256)
+
+    def _store(self, file_path, content, sha256=None):
+        path = os.path.abspath(file_path)
+        stats = os.stat(path)
+        sha256 = sha256 or file_sha256(path)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO texts (sha256, content, stored_bytes, last_used) VALUES (?, ?, ?, ?)",
+                (sha256, content, len(content), time.time())
+            )
+            self._remember_file(path, stats, sha256)
+            self._evict()
+
+    def _remember_file(self, path, stats, sha256):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (path, stats.st_size, stats.st_mtime_ns, sha256)
+        )
+
+    def _evict(self):
+        """Drop least recently used texts until the store is back under its size limit"""
+        total = self.connection.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM texts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self.connection.execute("SELECT sha256, stored_bytes FROM texts ORDER BY last_used ASC").fetchall()
+        evicted = []
+        for sha256, stored_bytes in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((sha256,))
+            total -= stored_bytes
+
+        self.connection.executemany("DELETE FROM texts WHERE sha256 = ?", evicted)
+        self.connection.executemany("DELETE FROM files WHERE sha256 = ?", evicted)
+        self.evictions += len(evicted)
+
+    def get_or_extract(self, file_path, extract, sha256=None):
+        """Return the text of a file, only calling extract(file_path) when it is not cached"""
+        text, sha256 = self.find(file_path, sha256)
+        if text is None:
+            text = extract(file_path)
+            if text is not None:
+                self.put(file_path, text, sha256)
+        return text
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the store"""
+        with self.lock:
+            entries, stored_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0) FROM texts"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'stored_bytes': stored_bytes,
+            'max_bytes': self.max_bytes
+        }
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM texts")
+            self.connection.execute("DELETE FROM files")
+
+
+def get_extraction_cache():
+    """Return the process wide extraction cache, creating it on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            max_bytes = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+            _shared_cache = ExtractionCache(CACHE_PATH, max_bytes)
+        return _shared_cache
@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.chunking import iter_chunks
+from utils.extraction_cache import get_extraction_cache
+
+# PDFs bigger than this are split into page ranges so one large file can use several cores
+LARGE_PDF_BYTES = 2 * 1024 * 1024
+PAGES_PER_TASK = 20
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_count():
+    """Number of extraction processes, configurable through INGESTION_WORKERS"""
+    return max(1, int(os.environ.get("INGESTION_WORKERS", os.cpu_count() or 1)))
+
+
+def get_ingestion_pool():
+    """Return the shared process pool, starting it on first use so workers are reused between requests"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=get_worker_count())
+        return _pool
+
+
+def shutdown_ingestion_pool():
+    """Stop the worker processes, e.g. when the pool has broken or the app is shutting down"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def extract_task(file_path, page_range=None):
+    """Worker entry point: extract a whole file or a range of PDF pages, returning (text, seconds)"""
+    # Imported here as document_processing imports this module
+    from utils import document_processing
+
+    start = time.perf_counter()
+    if page_range is None:
+        text = document_processing.extract_text(file_path)
+    else:
+        text = document_processing.extract_text_from_pdf_pages(file_path, *page_range)
+    return text, time.perf_counter() - start
+
+
+def plan_tasks(file_path):
+    """Split a file into extraction tasks, one per page range for large PDFs and one otherwise"""
+    from utils import document_processing
+
+    if file_path.split('.')[-1] == 'pdf' and os.path.getsize(file_path) > LARGE_PDF_BYTES:
+        try:
+            page_count = document_processing.count_pdf_pages(file_path)
+        except Exception as e:
+            print(f"Error counting pages in {file_path}: {str(e)}")
+            return [None]
+        return [(start, start + PAGES_PER_TASK) for start in range(0, page_count, PAGES_PER_TASK)] or [None]
+    return [None]
+
+
+def iter_pdf_ranges(file_path, workers=None):
+    """
+    Yield the text of a PDF one page range at a time, in page order.
+
+    The ranges are extracted in the shared process pool with at most one range per worker in
+    flight, so a large PDF uses several cores while only a few ranges of text are held at once.
+    """
+    tasks = plan_tasks(file_path)
+    workers = workers or get_worker_count()
+    pending = deque()
+    next_task = 0
+    if workers > 1 and len(tasks) > 1:
+        try:
+            pool = get_ingestion_pool()
+            while next_task < len(tasks) or pending:
+                while next_task < len(tasks) and len(pending) < workers:
+                    pending.append((tasks[next_task], pool.submit(extract_task, file_path, tasks[next_task])))
+                    next_task += 1
+                text, _ = pending[0][1].result()
+                pending.popleft()
+                yield text
+            return
+        except BrokenProcessPool as e:
+            print(f"Ingestion pool failed, extracting in process instead: {str(e)}")
+            shutdown_ingestion_pool()
+            tasks = [page_range for page_range, _ in pending] + tasks[next_task:]
+        finally:
+            # Stop extracting ranges nobody will read, e.g. if the caller gave up early
+            for _, future in pending:
+                future.cancel()
+
+    for page_range in tasks:
+        yield extract_task(file_path, page_range)[0]
+
+
+def ingest_files(file_paths, on_document=None, workers=None, hashes=None, on_stream=None):
+    """
+    Extract the text of several files in parallel, reusing cached text where possible.
+
+    Parameters:
+    file_paths (list): Paths of the files to extract.
+    on_document (function): Optional callback called with (file_path, text) as soon as each file
+    is ready, so results can be streamed into an index while other files are still being parsed.
+    workers (int): Number of processes to use (optional, defaults to INGESTION_WORKERS or the CPU count).
+    hashes (dictionary): Optional sha256 of files that are already known, e.g. hashed while uploading.
+    on_stream (function): Optional callback for PDFs over STREAM_PDF_BYTES, called with (file_path,
+    chunks) where chunks yields the text in MAX_INFLIGHT_BYTES pieces, from the cache or from page
+    ranges extracted in parallel (and cached as they pass). The callback must read the chunks
+    through for an extraction to be cached. Without it large PDFs are extracted whole like any other.
+
+    Returns:
+    dict: A mapping of file paths to a dictionary with the text, the extraction time in seconds
+    and whether the text came from the cache. Streamed files have no text.
+    """
+    from utils import document_processing
+
+    cache = get_extraction_cache()
+    workers = workers or get_worker_count()
+    results = {}
+
+    def finish(file_path, text, seconds, cached):
+        results[file_path] = {'text': text, 'seconds': seconds, 'cached': cached}
+        print(f"Ingested {os.path.basename(file_path)} in {seconds:.3f}s{' (cached)' if cached else ''}")
+        if on_document is not None and text is not None:
+            on_document(file_path, text)
+
+    pending = []
+    for file_path in file_paths:
+        if not document_processing.is_supported(file_path):
+            print(f"Unsupported file type: {file_path.split('.')[-1]}")
+            results[file_path] = {'text': None, 'seconds': 0.0, 'cached': False}
+            continue
+        start = time.perf_counter()
+        if on_stream is not None and document_processing.should_stream(file_path):
+            chunks, sha256 = cache.find_stream(file_path, (hashes or {}).get(file_path))
+            cached = chunks is not None
+            if not cached:
+                chunks = cache.put_stream(file_path, iter_pdf_ranges(file_path, workers), sha256)
+            try:
+                on_stream(file_path, iter_chunks(chunks))
+            except Exception as e:
+                print(f"Error streaming {file_path}: {str(e)}")
+            seconds = time.perf_counter() - start
+            results[file_path] = {'text': None, 'seconds': seconds, 'cached': cached}
+            print(f"Ingested {os.path.basename(file_path)} in {seconds:.3f}s (streamed{', cached' if cached else ''})")
+            continue
+        text, sha256 = cache.find(file_path, (hashes or {}).get(file_path))
+        if text is not None:
+            finish(file_path, text, time.perf_counter() - start, True)
+        else:
+            pending.append((file_path, sha256))
+
+    if not pending:
+        return results
+
+    tasks = [(file_path, page_range) for file_path, _ in pending for page_range in plan_tasks(file_path)]
+    hashes = dict(pending)
+    parts = {file_path: {} for file_path, _ in pending}
+    part_counts = {file_path: 0 for file_path, _ in pending}
+    timings = {file_path: 0.0 for file_path, _ in pending}
+    for file_path, _ in tasks:
+        part_counts[file_path] += 1
+
+    def collect(file_path, page_range, text, seconds):
+        parts[file_path][page_range or (0, 0)] = text
+        timings[file_path] += seconds
+        if len(parts[file_path]) == part_counts[file_path]:
+            file_parts = [parts[file_path][key] for key in sorted(parts[file_path])]
+            if any(part is None for part in file_parts):
+                # Failed extractions are not cached so they are retried next time
+                finish(file_path, None, timings[file_path], False)
+                return
+            text = "".join(file_parts)
+            cache.put(file_path, text, hashes[file_path])
+            finish(file_path, text, timings[file_path], False)
+
+    if workers > 1 and len(tasks) > 1:
+        try:
+            pool = get_ingestion_pool()
+            futures = {pool.submit(extract_task, file_path, page_range): (file_path, page_range) for file_path, page_range in tasks}
+            for future in as_completed(futures):
+                file_path, page_range = futures[future]
+                try:
+                    text, seconds = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    print(f"Error extracting {file_path}: {str(e)}")
+                    text, seconds = None, 0.0
+                collect(file_path, page_range, text, seconds)
+            return results
+        except BrokenProcessPool as e:
+            # Fall back to extracting in this process, e.g. if workers cannot be started
+            print(f"Ingestion pool failed, extracting in process instead: {str(e)}")
+            shutdown_ingestion_pool()
+            tasks = [
+                (file_path, page_range) for file_path, page_range in tasks
+                if file_path not in results and (page_range or (0, 0)) not in parts[file_path]
+            ]
+
+    for file_path, page_range in tasks:
+        try:
+            text, seconds = extract_task(file_path, page_range)
+        except Exception as e:
+            print(f"Error extracting {file_path}: {str(e)}")
+            text, seconds = None, 0.0
+        collect(file_path, page_range, text, seconds)
+    return results
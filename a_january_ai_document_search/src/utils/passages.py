@@ -0,0 +1,179 @@
+import os
+import threading
+from collections import OrderedDict
+
+from utils.bm25_index import BM25Index, TOKEN_PATTERN, text_signature
+from utils.search_index import get_directory_index
+
+# Passage windows are measured in words, with an overlap so an answer is never cut in half
+PASSAGE_WORDS = int(os.environ.get("PASSAGE_WORDS", 200))
+PASSAGE_OVERLAP = int(os.environ.get("PASSAGE_OVERLAP", 50))
+# How much document text is allowed into a single summary prompt
+SUMMARY_TOP_PASSAGES = int(os.environ.get("SUMMARY_TOP_PASSAGES", 8))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("SUMMARY_TOKEN_BUDGET", 4000))
+# How many directories keep a passage index, the least recently used is dropped past this
+PASSAGE_RETRIEVERS = int(os.environ.get("PASSAGE_RETRIEVERS", 8))
+
+_retrievers = OrderedDict()
+_retrievers_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Rough token count for Gemini models (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def split_passages(text, window_words=PASSAGE_WORDS, overlap_words=PASSAGE_OVERLAP):
+    """
+    Split text into overlapping windows of words.
+
+    Returns:
+    list: A list of (start offset, end offset) pairs into the original text.
+    """
+    words = [match.span() for match in TOKEN_PATTERN.finditer(text or "")]
+    if not words:
+        return []
+    step = max(1, window_words - overlap_words)
+    passages = []
+    for first in range(0, len(words), step):
+        last = min(first + window_words, len(words)) - 1
+        passages.append((words[first][0], words[last][1]))
+        if last == len(words) - 1:
+            break
+    return passages
+
+
+class PassageRetriever:
+    """
+    BM25 index over the passages of a set of documents.
+
+    Passages of a document are only rebuilt when it changes, so repeated summaries over the same
+    directory just run a BM25 search over the passage postings. Only the offsets of each passage
+    are kept, its text is sliced out of the synced documents when it is retrieved.
+    """
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.documents = {}
+        self.passages = {}
+        self.doc_passages = {}
+        self.doc_signatures = {}
+        self.synced_version = None
+        self.lock = threading.Lock()
+
+    def sync(self, documents, signatures=None, version=None):
+        """
+        Re-split new or changed documents and drop passages of documents that have gone.
+
+        Changes are spotted the same way as BM25Index.sync, from signatures (e.g. a DirectoryIndex's
+        file signatures) or the length of each text, and not at all while version is unchanged.
+        """
+        with self.lock:
+            self.documents = documents
+            if version is not None and version == self.synced_version:
+                return
+            for doc_id in [doc_id for doc_id in self.doc_passages if doc_id not in documents]:
+                self._remove(doc_id)
+            for doc_id, text in documents.items():
+                if text is None:
+                    continue
+                signature = signatures.get(doc_id) if signatures else None
+                if signature is None:
+                    signature = text_signature(text)
+                if doc_id not in self.doc_passages or self.doc_signatures.get(doc_id) != signature:
+                    self._remove(doc_id)
+                    self._add(doc_id, text, signature)
+            self.synced_version = version
+
+    def _add(self, doc_id, text, signature):
+        passage_ids = []
+        for number, (start, end) in enumerate(split_passages(text)):
+            passage_id = (doc_id, number)
+            self.passages[passage_id] = {'doc_id': doc_id, 'start': start, 'end': end}
+            self.index.add_document(passage_id, text[start:end])
+            passage_ids.append(passage_id)
+        self.doc_passages[doc_id] = passage_ids
+        self.doc_signatures[doc_id] = signature
+
+    def _remove(self, doc_id):
+        for passage_id in self.doc_passages.pop(doc_id, []):
+            self.index.remove_document(passage_id)
+            self.passages.pop(passage_id, None)
+        self.doc_signatures.pop(doc_id, None)
+
+    def retrieve(self, query, top_n=SUMMARY_TOP_PASSAGES, token_budget=SUMMARY_TOKEN_BUDGET):
+        """
+        Return the passages that best match the query, best first, without going over the token budget.
+
+        Returns:
+        list: A list of passage dictionaries with doc_id, start, end, text and score.
+        """
+        with self.lock:
+            selected = []
+            used_tokens = 0
+            # Ask for a few extra passages in case some are too big to fit the remaining budget
+            for passage_id, score in self.index.search(query, top_k=top_n * 2):
+                passage = self.passages[passage_id]
+                text = self.documents.get(passage['doc_id'])
+                if not isinstance(text, str):
+                    continue
+                passage_text = text[passage['start']:passage['end']]
+                tokens = estimate_tokens(passage_text)
+                if used_tokens + tokens > token_budget:
+                    continue
+                selected.append(dict(passage, text=passage_text, score=score))
+                used_tokens += tokens
+                if len(selected) >= top_n:
+                    break
+            return selected
+
+
+def get_passage_retriever(name=None):
+    """
+    Return the shared passage retriever for a directory, or a new one if no name is given.
+
+    At most PASSAGE_RETRIEVERS directories keep a retriever, the least recently used one is dropped
+    (and rebuilt if that directory is summarised again).
+    """
+    if name is None:
+        return PassageRetriever()
+    with _retrievers_lock:
+        retriever = _retrievers.get(name)
+        if retriever is None:
+            retriever = PassageRetriever()
+            _retrievers[name] = retriever
+        _retrievers.move_to_end(name)
+        while len(_retrievers) > PASSAGE_RETRIEVERS:
+            _retrievers.popitem(last=False)
+        return retriever
+
+
+def select_passages(query, documents, directory=None, top_n=SUMMARY_TOP_PASSAGES, token_budget=SUMMARY_TOKEN_BUDGET):
+    """
+    Pick the passages of a set of documents that are most relevant to a query.
+
+    Parameters:
+    query (str): The user's search query.
+    documents (dictionary): A mapping of document names and their text.
+    directory (str): The directory the documents came from, used to reuse the passage index (optional).
+    top_n (int): The maximum number of passages to return.
+    token_budget (int): The maximum number of (estimated) tokens across all passages.
+
+    Returns:
+    list: A list of passage dictionaries with doc_id, start, end, text and score.
+    """
+    retriever = get_passage_retriever(directory)
+    if directory is not None:
+        directory_index = get_directory_index(directory)
+        retriever.sync(documents, directory_index.signatures, directory_index.version)
+    else:
+        retriever.sync(documents)
+    return retriever.retrieve(query, top_n, token_budget)
+
+
+def format_passages(passages):
+    """Format passages for a prompt, labelling each with its document name"""
+    return "\n\n".join(
+        f"[{passage['doc_id']} (characters {passage['start']}-{passage['end']})]\n{passage['text']}"
+        for passage in passages
+    )
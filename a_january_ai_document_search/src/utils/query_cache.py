@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.search_index import get_directory_index, index_name_for
+
+# How many results and summaries are kept, and for how long (in seconds)
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 512))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", 6 * 60 * 60))
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def normalise_query(query):
+    """Lower case a query and collapse its whitespace so trivially different queries share entries"""
+    return " ".join((query or "").lower().split())
+
+
+class QueryCache:
+    """
+    LRU cache of search results and AI summaries with a time to live.
+
+    Entries are keyed on (directory, directory index version, kind, normalised query). Adding or
+    removing documents bumps the version of a directory's index, so entries made before the change
+    can never be returned again, and invalidate() drops them straight away to free the space.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key_for(self, directory, kind, query):
+        """Build the cache key for a query against the current version of a directory's index"""
+        version = get_directory_index(directory).version
+        return (index_name_for(directory), version, kind, normalise_query(query))
+
+    def get(self, key):
+        """Return the cached value for a key, or None if it is missing or has expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries once the cache is full"""
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, directory, kind, query, compute):
+        """Return the cached value for a query, calling compute() and caching its result on a miss"""
+        key = self.key_for(directory, kind, query)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def invalidate(self, directory):
+        """Drop every entry for a directory, returning how many were removed"""
+        name = index_name_for(directory)
+        with self.lock:
+            stale = [key for key in self.entries if key[0] == name]
+            for key in stale:
+                del self.entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return hit and miss counters for monitoring"""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+def get_query_cache():
+    """Return the process wide query cache, creating it on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = QueryCache()
+        return _shared_cache
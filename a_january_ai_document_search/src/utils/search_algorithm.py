@@ -1,22 +1,56 @@
 #from elasticsearch import Elasticsearch
 import os
 from utils.document_processing import handle_documents
+from utils.search_index import get_directory_index
+from utils.bm25_index import get_bm25_index
+from utils.query_cache import get_query_cache
+from utils.search_results import build_results
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
-def search_documents_v2(query, indexed_documents, index_name="my_index"):
+# Engine used by search_documents_v2, either "bm25" (built in) or "elasticsearch"
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "bm25").lower()
+# Number of ranked documents search_documents keeps, results past this are never scored or formatted
+SEARCH_TOP_K = int(os.environ.get("SEARCH_TOP_K", 50))
+
+def search_documents_v2(query, indexed_documents, index_name="my_index", top_k=10, directory=None):
     """
-    Search for documents that match the user's query and rank them based on relevance using Elastic Search.
+    Search for documents that match the user's query and rank them based on relevance using BM25.
+
+    By default this uses the built in inverted index, which only re-indexes documents that are new
+    or have changed since the last search. Set SEARCH_ENGINE=elasticsearch to use an Elasticsearch
+    server at localhost:9200 instead.
+
+    When directory is given, changes are spotted from the file signatures and version of that
+    directory's index (kept up to date by handle_documents), so a search of an unchanged directory
+    does no indexing work at all.
 
     Parameters:
-    query (str): The user's search query.
+    query (str): The user's search query. Words in double quotes are matched as a phrase.
     indexed_documents (dictionary): A mapping of document names and their text that have been indexed.
     index_name (str): The name of the index to use for searching (optional argument with default value "my_index").
+    top_k (int): The maximum number of results to return (optional argument with default value 10).
+    directory (str): The document directory the documents came from (optional).
 
     Returns:
     list: A list of tuples containing the document and its relevance score, sorted by score.
     """
+    if SEARCH_ENGINE == "elasticsearch":
+        return search_documents_elasticsearch(query, indexed_documents, index_name)
+
+    index = get_bm25_index(index_name)
+    if directory is not None:
+        directory_index = get_directory_index(directory)
+        index.sync(indexed_documents, directory_index.signatures, directory_index.version)
+    else:
+        index.sync(indexed_documents)
+    return index.search(query, top_k)
+
+def search_documents_elasticsearch(query, indexed_documents, index_name="my_index"):
+    """Search for documents using an Elasticsearch server, indexing every document first"""
+    from elasticsearch import Elasticsearch
+
     es = Elasticsearch(hosts=["http://localhost:9200"])
 
     #Index documents if not already indexed
@@ -36,17 +70,34 @@ def search_documents_v2(query, indexed_documents, index_name="my_index"):
     results.sort(key=lambda x: x[1], reverse=True)
     return results
 
-def search_documents(query, indexed_documents):
+def search_documents(query, indexed_documents, directory=None, offset=0, limit=None, top_k=SEARCH_TOP_K):
     """
     Search for documents that match the user's query and rank them based on relevance using Machine Learning.
 
     Parameters:
     query (str): The user's search query.
     indexed_documents (dictionary): A mapping of document names and their text that have been indexed.
+    directory (str): The document directory being searched (optional). When given, the persistent
+    index for that directory is used so only the query has to be vectorised, and the ranking is cached
+    until the directory's index changes.
+    offset (int): The number of results to skip, for paging (optional argument with default value 0).
+    limit (int): The maximum number of results to return (optional, defaults to all results up to top_k).
+    top_k (int): Only the top_k best documents are ranked and kept (None for every document).
 
     Returns:
-    list: A list of tuples containing the document and its relevance score, sorted by score.
+    list: A list of SearchResult objects, sorted by score.
     """
+    if directory is not None:
+        ranked_documents = get_query_cache().get_or_compute(
+            directory, f"ranked:{top_k}", query,
+            lambda: get_directory_index(directory).search(query, top_k),
+        )
+    else:
+        ranked_documents = rank_documents(query, indexed_documents)[:top_k]
+    return build_results(ranked_documents, indexed_documents, query, offset, limit)
+
+def rank_documents(query, indexed_documents):
+    """Rank documents by fitting a TF-IDF vectorizer over the documents and the query"""
     # Create a TF-IDF Vectorizer
     vectorizer = TfidfVectorizer()
     
@@ -63,15 +114,7 @@ def search_documents(query, indexed_documents):
     scored_documents = list(zip(indexed_documents, cosine_similarities.flatten()))
     
     # Sort documents by score in descending order
-    sorted_documents = sorted(scored_documents, key=lambda x: x[1], reverse=True)
-
-    search_results = []
-    for doc in sorted_documents:
-        # Convert the np.float64 value stored in doc[1] to a percentage
-        score_percentage = doc[1] * 100
-        thisResult = f"Doc Name: {doc[0]}, Text Preview: {indexed_documents[doc[0]][:100]}..., Relevance Score: {score_percentage}%"
-        search_results.append(thisResult)
-    return search_results
+    return sorted(scored_documents, key=lambda x: x[1], reverse=True)
 
 # Example usage
 if __name__ == "__main__":
@@ -93,7 +136,7 @@ if __name__ == "__main__":
         print()
     
     query = input("Enter your search query: ")
-    results = search_documents(query, indexed_documents)
+    results = search_documents(query, indexed_documents, directory_name)
     print(results)
 
     
\ No newline at end of file
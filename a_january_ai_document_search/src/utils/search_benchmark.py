@@ -0,0 +1,270 @@
+"""
+Benchmark harness for the January search engines.
+
+Generates synthetic corpora, then measures index build time, incremental add time, query
+latency (p50/p99) and resident memory for each engine. Every (engine, corpus size) pair runs in
+its own process so memory figures are not affected by earlier runs. Results are written to JSON,
+tagged with the current git commit, so they can be compared across commits.
+
+Run from the src folder:
+    python -m utils.search_benchmark --sizes 1000 10000 100000 --output search_benchmark.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_QUERIES = 200
+DOC_WORDS = 200
+VOCABULARY_SIZE = 20000
+SEED = 2025
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "da", "pe", "zu", "ho", "ri", "ba", "fo", "gu"]
+
+
+def make_vocabulary(size=VOCABULARY_SIZE):
+    """Build a deterministic list of made up words, all at least two letters long"""
+    words = []
+    length = 1
+    while len(words) < size:
+        length += 1
+        rng = random.Random(SEED + length)
+        seen = set(words)
+        for _ in range(size * 2):
+            word = "".join(rng.choice(SYLLABLES) for _ in range(length))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                if len(words) >= size:
+                    break
+    return words
+
+
+def zipf_weights(size):
+    """Word frequencies that roughly follow Zipf's law, like natural language"""
+    return [1.0 / rank for rank in range(1, size + 1)]
+
+
+def make_corpus(size, seed=SEED, doc_words=DOC_WORDS, prefix="doc"):
+    """
+    Generate a reproducible synthetic corpus.
+
+    Returns:
+    dict: A mapping of document names and their text.
+    """
+    vocabulary = make_vocabulary()
+    weights = zipf_weights(len(vocabulary))
+    rng = random.Random(seed)
+    corpus = {}
+    for number in range(size):
+        length = max(10, int(rng.gauss(doc_words, doc_words / 4)))
+        corpus[f"{prefix}{number:06d}.txt"] = " ".join(rng.choices(vocabulary, weights, k=length))
+    return corpus
+
+
+def make_queries(count, seed=SEED):
+    """Generate distinct one to three word queries, skipping the most common words"""
+    vocabulary = make_vocabulary()
+    weights = zipf_weights(len(vocabulary))
+    rng = random.Random(seed + 1)
+    queries = []
+    seen = set()
+    while len(queries) < count:
+        query = " ".join(rng.choices(vocabulary[50:], weights[50:], k=rng.randint(1, 3)))
+        if query not in seen:
+            seen.add(query)
+            queries.append(query)
+    return queries
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def resident_memory():
+    """Current resident set size of this process in bytes, or None if it cannot be read"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Falls back to the peak size, which is reported in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class SearchDocumentsEngine:
+    """search_documents backed by the persistent TF-IDF directory index"""
+
+    name = "search_documents"
+
+    def __init__(self, index_root):
+        from utils import search_index
+        from utils.query_cache import get_query_cache
+
+        self.directory = "benchmark"
+        self.index = search_index.DirectoryIndex(self.directory, index_root=index_root)
+        search_index._open_indexes[self.directory] = self.index
+        self.query_cache = get_query_cache()
+        self.documents = {}
+
+    def build(self, corpus):
+        self.documents = dict(corpus)
+        self.index.add_documents(corpus)
+
+    def add(self, documents):
+        self.documents.update(documents)
+        self.index.add_documents(documents)
+
+    def search(self, query):
+        from utils.search_algorithm import search_documents
+
+        # Every query is timed cold, the query cache would otherwise hide the engine
+        self.query_cache.clear()
+        return search_documents(query, self.documents, self.directory, limit=10)
+
+
+class BM25Engine:
+    """search_documents_v2 backed by the in-process BM25 inverted index"""
+
+    name = "bm25"
+
+    def __init__(self, index_root):
+        from utils.bm25_index import get_bm25_index
+
+        self.index_name = "benchmark"
+        self.index = get_bm25_index(self.index_name)
+        self.documents = {}
+
+    def build(self, corpus):
+        self.documents = dict(corpus)
+        self.index.sync(self.documents)
+
+    def add(self, documents):
+        self.documents.update(documents)
+        self.index.sync(self.documents)
+
+    def search(self, query):
+        from utils.search_algorithm import search_documents_v2
+
+        # Timed through search_documents_v2 so the sync it runs before every query is counted too
+        return search_documents_v2(query, self.documents, self.index_name, top_k=10)
+
+
+ENGINES = {engine.name: engine for engine in (SearchDocumentsEngine, BM25Engine)}
+
+
+def run_benchmark(engine_name, size, query_count=DEFAULT_QUERIES, incremental_size=None):
+    """
+    Benchmark one engine on one corpus size. Meant to be run in a fresh process.
+
+    Returns:
+    dict: The measurements, with times in seconds and latencies in milliseconds.
+    """
+    corpus = make_corpus(size)
+    incremental_size = incremental_size or max(1, size // 100)
+    additions = make_corpus(incremental_size, seed=SEED + size, prefix="new")
+    queries = make_queries(query_count)
+    memory_before = resident_memory()
+
+    with tempfile.TemporaryDirectory() as index_root:
+        engine = ENGINES[engine_name](index_root)
+
+        start = time.perf_counter()
+        engine.build(corpus)
+        build_seconds = time.perf_counter() - start
+        memory_after_build = resident_memory()
+
+        start = time.perf_counter()
+        engine.add(additions)
+        add_seconds = time.perf_counter() - start
+
+        # One warm up query so lazily built structures are not counted against the first query
+        engine.search(queries[0])
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            engine.search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'engine': engine_name,
+        'documents': size,
+        'build_seconds': build_seconds,
+        'incremental_documents': incremental_size,
+        'incremental_add_seconds': add_seconds,
+        'queries': len(latencies),
+        'query_p50_ms': percentile(latencies, 0.50),
+        'query_p99_ms': percentile(latencies, 0.99),
+        'query_mean_ms': sum(latencies) / len(latencies),
+        'rss_bytes': memory_after_build,
+        'index_rss_bytes': None if memory_before is None or memory_after_build is None else memory_after_build - memory_before,
+    }
+
+
+def git_commit():
+    """The commit being benchmarked, or None outside of a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the January search engines on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="corpus sizes to generate")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="number of queries to time")
+    parser.add_argument("--output", default="search_benchmark.json", help="where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for engine_name in args.engines:
+            print(f"Benchmarking {engine_name} on {size} documents...")
+            # A fresh process per run so memory and caches start from nothing
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_benchmark, engine_name, size, args.queries).result()
+            print(
+                f"  build {result['build_seconds']:.2f}s, add {result['incremental_add_seconds']:.2f}s, "
+                f"p50 {result['query_p50_ms']:.2f}ms, p99 {result['query_p99_ms']:.2f}ms"
+            )
+            results.append(result)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'doc_words': DOC_WORDS,
+        'results': results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
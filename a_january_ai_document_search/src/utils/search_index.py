@@ -0,0 +1,289 @@
+import json
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from utils.chunking import iter_chunks
+
+# Indexes are stored next to the docs folder, one sub folder per document directory
+INDEX_ROOT = os.path.join(os.path.dirname(__file__), "indexes")
+
+# Use the same tokeniser as the original TfidfVectorizer search so rankings stay comparable
+analyze_text = TfidfVectorizer().build_analyzer()
+
+_open_indexes = {}
+_open_indexes_lock = threading.Lock()
+
+
+def file_signature(file_path):
+    """Return a cheap (size, modified time) signature used to spot changed files"""
+    stats = os.stat(file_path)
+    return [stats.st_size, stats.st_mtime_ns]
+
+
+def index_name_for(target_directory):
+    """Map a directory name or path to the name of its index folder"""
+    return os.path.basename(os.path.normpath(str(target_directory)))
+
+
+class DirectoryIndex:
+    """
+    Persistent TF-IDF index for a single document directory.
+
+    The fitted vocabulary, the sparse document-term count matrix and the document id map are
+    kept on disk, so documents only need to be vectorised once when they are added. A search
+    then only has to vectorise the query and take a sparse dot product against the columns of
+    the query terms.
+    """
+
+    def __init__(self, directory_name, index_root=INDEX_ROOT):
+        self.directory_name = directory_name
+        self.index_path = os.path.join(index_root, directory_name)
+        self.lock = threading.RLock()
+        self.version = 0
+        self._reset()
+        self.load()
+
+    def _reset(self):
+        self.vocabulary = {}
+        self.doc_ids = []
+        self.doc_positions = {}
+        self.signatures = {}
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.doc_freq = np.zeros(0, dtype=np.float64)
+        self._weights = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_positions
+
+    def _count_terms(self, text, grow_vocabulary):
+        """
+        Count the terms of a piece of text, returning (column ids, counts, unknown term count).
+
+        The text can be a string or an iterable of strings (e.g. PDF pages) and is tokenised one
+        bounded chunk at a time, so a very long document never becomes one huge token list.
+        """
+        term_counts = {}
+        unknown = {}
+        for chunk in iter_chunks(text):
+            for term in analyze_text(chunk):
+                column = self.vocabulary.get(term)
+                if column is None:
+                    if not grow_vocabulary:
+                        unknown[term] = unknown.get(term, 0) + 1
+                        continue
+                    column = len(self.vocabulary)
+                    self.vocabulary[term] = column
+                term_counts[column] = term_counts.get(column, 0) + 1
+        columns = np.fromiter(term_counts.keys(), dtype=np.int64, count=len(term_counts))
+        values = np.fromiter(term_counts.values(), dtype=np.float64, count=len(term_counts))
+        return columns, values, unknown
+
+    def add_documents(self, documents, signatures=None):
+        """
+        Add or replace documents in the index.
+
+        Parameters:
+        documents (dictionary): A mapping of document names and their text (a string or an iterable of text chunks).
+        signatures (dictionary): Optional mapping of document names to their file signatures.
+
+        Returns:
+        int: The number of documents added.
+        """
+        documents = {doc_id: text for doc_id, text in documents.items() if text is not None}
+        if not documents:
+            return 0
+
+        with self.lock:
+            self.remove_documents([doc_id for doc_id in documents if doc_id in self.doc_positions])
+
+            indptr = [0]
+            indices = []
+            data = []
+            for doc_id, text in documents.items():
+                columns, values, _ = self._count_terms(text, grow_vocabulary=True)
+                indices.append(columns)
+                data.append(values)
+                indptr.append(indptr[-1] + len(columns))
+                self.doc_positions[doc_id] = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                if signatures and doc_id in signatures:
+                    self.signatures[doc_id] = list(signatures[doc_id])
+
+            vocabulary_size = len(self.vocabulary)
+            new_rows = sparse.csr_matrix(
+                (np.concatenate(data), np.concatenate(indices), np.array(indptr)),
+                shape=(len(documents), vocabulary_size),
+            )
+            counts = self.counts.tocsr(copy=True)
+            counts.resize((counts.shape[0], vocabulary_size))
+            self.counts = sparse.vstack([counts, new_rows], format="csr")
+
+            doc_freq = np.zeros(vocabulary_size, dtype=np.float64)
+            doc_freq[:len(self.doc_freq)] = self.doc_freq
+            doc_freq += np.bincount(new_rows.indices, minlength=vocabulary_size)
+            self.doc_freq = doc_freq
+
+            self._weights = None
+            self.version += 1
+            return len(documents)
+
+    def remove_documents(self, doc_ids):
+        """Remove documents from the index, returning how many were removed"""
+        with self.lock:
+            positions = [self.doc_positions[doc_id] for doc_id in doc_ids if doc_id in self.doc_positions]
+            if not positions:
+                return 0
+
+            removed = self.counts[positions]
+            self.doc_freq = self.doc_freq - np.bincount(removed.indices, minlength=len(self.vocabulary))
+
+            keep = np.ones(len(self.doc_ids), dtype=bool)
+            keep[positions] = False
+            self.counts = self.counts[keep]
+            self.doc_ids = [doc_id for doc_id, kept in zip(self.doc_ids, keep) if kept]
+            self.doc_positions = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+            for doc_id in doc_ids:
+                self.signatures.pop(doc_id, None)
+
+            self._weights = None
+            self.version += 1
+            return len(positions)
+
+    def update_directory(self, documents, signatures):
+        """
+        Bring the index in line with the current contents of its directory.
+
+        Documents whose signature has changed (or that are not indexed yet) are re-indexed and
+        documents that are no longer in the directory are dropped.
+
+        Returns:
+        bool: True if the index changed.
+        """
+        with self.lock:
+            removed = [doc_id for doc_id in self.doc_ids if doc_id not in documents]
+            stale = {
+                doc_id: text for doc_id, text in documents.items()
+                if doc_id not in self.doc_positions or self.signatures.get(doc_id) != list(signatures.get(doc_id, []))
+            }
+            changed = self.remove_documents(removed) + self.add_documents(stale, signatures)
+            return changed > 0
+
+    def stale_documents(self, signatures):
+        """Return the names of documents that are missing from the index or have changed on disk"""
+        with self.lock:
+            return [
+                doc_id for doc_id, signature in signatures.items()
+                if doc_id not in self.doc_positions or self.signatures.get(doc_id) != list(signature)
+            ]
+
+    def _idf(self):
+        # Smoothed idf, matching TfidfVectorizer(smooth_idf=True)
+        return np.log((1 + len(self.doc_ids)) / (1 + self.doc_freq)) + 1
+
+    def _tfidf_weights(self):
+        """Return the l2 normalised tf-idf matrix in column format, rebuilding it only after changes"""
+        if self._weights is None:
+            weighted = self.counts.multiply(self._idf()).tocsr()
+            self._weights = normalize(weighted, norm="l2", copy=False).tocsc()
+        return self._weights
+
+    def search(self, query, top_k=None):
+        """
+        Rank indexed documents against a query using cosine similarity of tf-idf vectors.
+
+        Parameters:
+        query (str): The user's search query.
+        top_k (int): Optional limit on the number of results returned.
+
+        Returns:
+        list: A list of tuples containing the document name and its relevance score, sorted by score.
+        """
+        with self.lock:
+            if not self.doc_ids:
+                return []
+
+            weights = self._tfidf_weights()
+            columns, values, unknown = self._count_terms(query, grow_vocabulary=False)
+            scores = np.zeros(len(self.doc_ids), dtype=np.float64)
+
+            if len(columns):
+                idf = self._idf()
+                query_weights = values * idf[columns]
+                # Terms that are not in the vocabulary still count towards the query length
+                unknown_idf = np.log(1 + len(self.doc_ids)) + 1
+                unknown_weights = np.array(list(unknown.values()), dtype=np.float64) * unknown_idf
+                query_norm = np.sqrt(np.sum(query_weights ** 2) + np.sum(unknown_weights ** 2))
+                scores = weights[:, columns] @ (query_weights / query_norm)
+                scores = np.asarray(scores).ravel()
+
+            if top_k is not None and top_k < len(scores):
+                top = np.argpartition(-scores, top_k)[:top_k]
+                order = top[np.argsort(-scores[top], kind="stable")]
+            else:
+                order = np.argsort(-scores, kind="stable")
+            return [(self.doc_ids[position], float(scores[position])) for position in order]
+
+    def save(self):
+        """Write the index to disk, replacing the previous copy atomically"""
+        with self.lock:
+            os.makedirs(self.index_path, exist_ok=True)
+            matrix_path = os.path.join(self.index_path, "matrix.npz")
+            meta_path = os.path.join(self.index_path, "meta.json")
+
+            sparse.save_npz(matrix_path + ".tmp.npz", self.counts.tocsr(), compressed=True)
+            os.replace(matrix_path + ".tmp.npz", matrix_path)
+
+            meta = {
+                "vocabulary": self.vocabulary,
+                "doc_ids": self.doc_ids,
+                "signatures": self.signatures,
+            }
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(meta_path + ".tmp", meta_path)
+
+    def load(self):
+        """Load the index from disk if it has been saved before"""
+        matrix_path = os.path.join(self.index_path, "matrix.npz")
+        meta_path = os.path.join(self.index_path, "meta.json")
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return False
+
+        with self.lock:
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                counts = sparse.load_npz(matrix_path).tocsr()
+            except Exception as e:
+                print(f"Error loading search index {self.directory_name}: {str(e)}")
+                self._reset()
+                return False
+
+            self.vocabulary = meta["vocabulary"]
+            self.doc_ids = meta["doc_ids"]
+            self.doc_positions = {doc_id: position for position, doc_id in enumerate(self.doc_ids)}
+            self.signatures = meta.get("signatures", {})
+            self.counts = counts
+            self.doc_freq = np.bincount(counts.indices, minlength=len(self.vocabulary)).astype(np.float64)
+            self._weights = None
+            self.version += 1
+            return True
+
+
+def get_directory_index(target_directory):
+    """Return the (shared) persistent index for a document directory, loading it on first use"""
+    name = index_name_for(target_directory)
+    with _open_indexes_lock:
+        index = _open_indexes.get(name)
+        if index is None:
+            index = DirectoryIndex(name)
+            _open_indexes[name] = index
+        return index
@@ -0,0 +1,105 @@
+import re
+
+from utils.bm25_index import tokenize
+
+# How much text either side of the first query match is used as a snippet
+SNIPPET_CHARS = 100
+
+
+class SearchResult:
+    """
+    A single ranked document in a set of search results.
+
+    Only the document name, its score, the character offsets of a snippet and the query terms found
+    in the document are stored, so results stay small and can be cached or sent as JSON. The snippet
+    text itself is sliced out of the document on demand.
+    """
+
+    __slots__ = ("doc_id", "score", "snippet_start", "snippet_end", "highlights")
+
+    def __init__(self, doc_id, score, snippet_start=0, snippet_end=0, highlights=()):
+        self.doc_id = doc_id
+        self.score = float(score)
+        self.snippet_start = snippet_start
+        self.snippet_end = snippet_end
+        self.highlights = list(highlights)
+
+    def __str__(self):
+        return f"Doc Name: {self.doc_id}, Relevance Score: {self.score * 100:.2f}%"
+
+    def __repr__(self):
+        return f"SearchResult({self.doc_id!r}, {self.score:.4f})"
+
+    def snippet(self, documents):
+        """Return the snippet text of this result from a mapping of document names and their text"""
+        text = documents.get(self.doc_id) or ""
+        return text[self.snippet_start:self.snippet_end]
+
+    def to_dict(self, documents=None):
+        """Convert the result to a JSON friendly dictionary, including the snippet text if documents are given"""
+        result = {
+            'doc_id': self.doc_id,
+            'score': self.score,
+            'snippet_start': self.snippet_start,
+            'snippet_end': self.snippet_end,
+            'highlights': self.highlights,
+        }
+        if documents is not None:
+            result['snippet'] = self.snippet(documents)
+        return result
+
+
+def build_result(doc_id, score, text, query_terms):
+    """
+    Build a search result, placing the snippet around the first query term found in the text.
+
+    Parameters:
+    doc_id (str): The document name.
+    score (float): The relevance score of the document.
+    text (str): The text of the document.
+    query_terms (list): The tokenised query terms.
+
+    Returns:
+    SearchResult: The result, with the snippet at the start of the document if no term is found.
+    """
+    text = text or ""
+    first_match = None
+    highlights = []
+    if query_terms:
+        pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in query_terms) + r")\b", re.IGNORECASE)
+        remaining = set(query_terms)
+        for match in pattern.finditer(text):
+            if first_match is None:
+                first_match = match.start()
+            term = match.group(1).lower()
+            if term in remaining:
+                remaining.discard(term)
+                highlights.append(term)
+                if not remaining:
+                    break
+
+    if first_match is None:
+        start = 0
+    else:
+        start = max(0, first_match - SNIPPET_CHARS)
+    end = min(len(text), (first_match or 0) + SNIPPET_CHARS)
+    return SearchResult(doc_id, score, start, end, highlights)
+
+
+def build_results(ranked_documents, indexed_documents, query, offset=0, limit=None):
+    """
+    Turn a page of ranked (document name, score) pairs into search results.
+
+    Documents that are not in indexed_documents are skipped before paging, and snippets are only
+    worked out for the documents on the requested page.
+
+    Returns:
+    list: A list of SearchResult objects, best first.
+    """
+    ranked_documents = [doc for doc in ranked_documents if doc[0] in indexed_documents]
+    end = None if limit is None else offset + limit
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    return [
+        build_result(doc_id, score, indexed_documents[doc_id], query_terms)
+        for doc_id, score in ranked_documents[offset:end]
+    ]
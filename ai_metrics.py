@@ -0,0 +1,228 @@
+# Token and latency accounting for every model call made through gemini_client.
+# Each call is recorded against the app that made it, with its model, input and
+# output token counts, latency and cache status, and kept as histograms so the
+# prompts that drive cost and latency can be found from /api/metrics.
+
+import bisect
+import contextlib
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+
+from ai_scheduler import estimate_prompt_tokens
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules that sit between the apps and the model, skipped when working out who made a call
+INFRASTRUCTURE_MODULES = {
+    "gemini_client.py", "llm_cache.py", "ai_scheduler.py", "ai_metrics.py", "fake_gemini.py",
+    "prompt_budget.py", "model_router.py",
+}
+
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+TOKEN_BUCKETS = [100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000]
+# How many of the largest prompts are kept for the report
+LARGEST_PROMPTS = int(os.environ.get("AI_METRICS_LARGEST_PROMPTS", 10))
+
+# Cache statuses
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+UNCACHED = "uncached"
+
+_shared_metrics = None
+_shared_metrics_lock = threading.Lock()
+
+
+class Histogram:
+    """Counts of values falling at or under each bucket bound, plus an overflow bucket"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the max for the overflow bucket)"""
+        if not self.total:
+            return None
+        target = fraction * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        buckets = {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets['overflow'] = self.counts[-1]
+        return {
+            'count': self.total,
+            'sum': self.sum,
+            'mean': self.sum / self.total if self.total else None,
+            'p50': self.quantile(0.50),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+            'buckets': buckets,
+        }
+
+
+class AppMetrics:
+    """Counters and histograms for the calls made by one app"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache = {CACHE_HIT: 0, CACHE_MISS: 0, UNCACHED: 0}
+        self.models = {}
+        self.callers = {}
+        self.input_tokens = Histogram(TOKEN_BUCKETS)
+        self.output_tokens = Histogram(TOKEN_BUCKETS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'cache': dict(self.cache),
+            'models': dict(self.models),
+            'input_tokens_by_caller': dict(sorted(self.callers.items(), key=lambda item: -item[1])),
+            'input_tokens': self.input_tokens.to_dict(),
+            'output_tokens': self.output_tokens.to_dict(),
+            'latency_ms': self.latency_ms.to_dict(),
+        }
+
+
+_calling_as = threading.local()
+
+
+@contextlib.contextmanager
+def calling_as(app, caller):
+    """
+    Record model calls made by this thread inside the block as made by app and caller, for work
+    done on another thread on an app's behalf, whose own stack does not reach the app.
+    """
+    previous = getattr(_calling_as, "caller", None)
+    _calling_as.caller = (app, caller)
+    try:
+        yield
+    finally:
+        _calling_as.caller = previous
+
+
+def find_caller():
+    """
+    Work out which app and function made a model call from the call stack, unless the call is
+    made inside calling_as.
+
+    Returns:
+    tuple: The app (its folder name, or "hub" for modules at the root) and "module:function".
+    """
+    override = getattr(_calling_as, "caller", None)
+    if override is not None:
+        return override
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(ROOT_DIR + os.sep) and os.path.basename(filename) not in INFRASTRUCTURE_MODULES:
+            relative = os.path.relpath(filename, ROOT_DIR)
+            parts = relative.split(os.sep)
+            app = parts[0] if len(parts) > 1 else "hub"
+            module = os.path.splitext(parts[-1])[0]
+            return app, f"{module}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown", "unknown"
+
+
+def usage_tokens(response, contents, output_text=None):
+    """
+    Input and output token counts of a call, from the response's usage metadata when it has it
+    and estimated from the text otherwise.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if input_tokens is None:
+        input_tokens = estimate_prompt_tokens(contents)
+    if output_tokens is None:
+        if output_text is None:
+            output_text = getattr(response, "text", None) or ""
+        output_tokens = estimate_prompt_tokens(output_text) if output_text else 0
+    return input_tokens, output_tokens
+
+
+class MetricsRecorder:
+    """Process wide record of model calls, grouped by calling app"""
+
+    def __init__(self, largest_prompts=LARGEST_PROMPTS):
+        self.lock = threading.Lock()
+        self.apps = {}
+        self.largest_prompts = largest_prompts
+        self.largest = []
+        self.sequence = itertools.count()
+        self.started = time.time()
+
+    def record(self, app, caller, model, input_tokens, output_tokens, latency_ms, cache_status=UNCACHED, error=None):
+        """Record one model call"""
+        with self.lock:
+            metrics = self.apps.get(app)
+            if metrics is None:
+                metrics = self.apps[app] = AppMetrics()
+            metrics.calls += 1
+            if error is not None:
+                metrics.errors += 1
+            metrics.cache[cache_status] = metrics.cache.get(cache_status, 0) + 1
+            metrics.models[model] = metrics.models.get(model, 0) + 1
+            metrics.callers[caller] = metrics.callers.get(caller, 0) + input_tokens
+            metrics.input_tokens.observe(input_tokens)
+            metrics.output_tokens.observe(output_tokens)
+            metrics.latency_ms.observe(latency_ms)
+
+            entry = (input_tokens, next(self.sequence), {
+                'app': app,
+                'caller': caller,
+                'model': model,
+                'input_tokens': input_tokens,
+                'output_tokens': output_tokens,
+                'latency_ms': round(latency_ms, 1),
+                'cache': cache_status,
+                'timestamp': time.time(),
+            })
+            if len(self.largest) < self.largest_prompts:
+                heapq.heappush(self.largest, entry)
+            elif self.largest and input_tokens > self.largest[0][0]:
+                heapq.heapreplace(self.largest, entry)
+
+    def snapshot(self):
+        """Return every app's counters and histograms, and the largest prompts seen, as plain data"""
+        with self.lock:
+            return {
+                'since': self.started,
+                'apps': {app: metrics.to_dict() for app, metrics in sorted(self.apps.items())},
+                'largest_prompts': [entry[2] for entry in sorted(self.largest, reverse=True)],
+            }
+
+    def reset(self):
+        with self.lock:
+            self.apps = {}
+            self.largest = []
+            self.started = time.time()
+
+
+def get_metrics():
+    """Return the process wide metrics recorder, creating it on first use"""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = MetricsRecorder()
+        return _shared_metrics
@@ -0,0 +1,283 @@
+# A process wide scheduler for model calls from every app in the hub.
+# Each model gets token buckets for requests and tokens per minute, waiting
+# calls are served by priority, calls that cannot start before their deadline
+# are rejected instead of queueing forever, and low priority work is shed
+# when the queue is full. Rate limit errors pause the model for everyone
+# instead of each thread retrying on its own.
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+# Priority classes, lower numbers are served first
+INTERACTIVE = 0
+NORMAL = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+
+# How long a call may wait (including retries) before it is given up on, per priority class
+DEFAULT_DEADLINES = {INTERACTIVE: 30.0, NORMAL: 120.0, BATCH: 600.0}
+
+DEFAULT_RPM = int(os.environ.get("GEMINI_RPM", 60))
+DEFAULT_TPM = int(os.environ.get("GEMINI_TPM", 1000000))
+MAX_QUEUE = int(os.environ.get("AI_SCHEDULER_MAX_QUEUE", 32))
+MAX_RETRIES = int(os.environ.get("AI_SCHEDULER_MAX_RETRIES", 3))
+RETRY_DELAY = float(os.environ.get("AI_SCHEDULER_RETRY_DELAY", 2.0))
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+class RequestRejected(Exception):
+    """A model call was not made, because it was shed, ran out of time or kept hitting rate limits"""
+
+
+class RequestShed(RequestRejected):
+    """The queue was full and this call had the lowest priority"""
+
+
+class DeadlineExceeded(RequestRejected):
+    """The call could not have started before its deadline"""
+
+
+class RateLimitExceeded(RequestRejected):
+    """The model kept returning rate limit errors and there was no time or retries left"""
+
+
+def is_rate_limit_error(error):
+    """Check whether an exception from the SDK is a 429 / RESOURCE_EXHAUSTED error"""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    if getattr(error, "status", None) == 'RESOURCE_EXHAUSTED':
+        return True
+    # A bare '429' in a message could be any number (a token count, a port), so only the status name counts
+    return 'RESOURCE_EXHAUSTED' in str(error)
+
+
+def estimate_prompt_tokens(contents):
+    """Rough token count of a prompt (about four characters per token)"""
+    if isinstance(contents, str):
+        contents = [contents]
+    return sum(len(part) // 4 + 1 for part in contents if isinstance(part, str))
+
+
+def parse_model_limits(value):
+    """Parse GEMINI_MODEL_LIMITS, e.g. "gemini-2.5-pro=5:250000,gemini-2.0-flash=15:1000000" (rpm:tpm)"""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        model, rates = item.split("=", 1)
+        rpm, _, tpm = rates.partition(":")
+        limits[model.strip()] = (int(rpm), int(tpm or DEFAULT_TPM))
+    return limits
+
+
+class TokenBucket:
+    """A bucket that refills continuously at rate_per_minute and holds at most one minute's worth"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount tokens are available (0 if they are available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self, now):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class Ticket:
+    """A call waiting for its turn"""
+
+    def __init__(self, model, tokens, priority, deadline, sequence):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.deadline = deadline
+        self.sequence = sequence
+        self.shed = False
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class AIScheduler:
+    """
+    Admits model calls in priority order while keeping each model under its rate limits.
+
+    Calls for a model queue in a heap ordered by priority and arrival. Only the head of each
+    model's queue checks the buckets, so a burst of batch work cannot starve a chat request that
+    arrives later. When the queue is full the lowest priority waiter is shed.
+    """
+
+    def __init__(self, default_rpm=DEFAULT_RPM, default_tpm=DEFAULT_TPM, max_queue=MAX_QUEUE, model_limits=None):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_queue = max_queue
+        self.model_limits = dict(model_limits if model_limits is not None else parse_model_limits(os.environ.get("GEMINI_MODEL_LIMITS")))
+        self.buckets = {}
+        self.queues = {}
+        self.paused_until = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.counters = {'admitted': 0, 'shed': 0, 'expired': 0, 'rate_limited': 0, 'retries': 0}
+
+    def set_limits(self, model, rpm, tpm):
+        """Set the requests and tokens per minute for a model"""
+        with self.condition:
+            self.model_limits[model] = (rpm, tpm)
+            self.buckets.pop(model, None)
+            self.condition.notify_all()
+
+    def _buckets_for(self, model):
+        buckets = self.buckets.get(model)
+        if buckets is None:
+            rpm, tpm = self.model_limits.get(model, (self.default_rpm, self.default_tpm))
+            buckets = (TokenBucket(rpm), TokenBucket(tpm))
+            self.buckets[model] = buckets
+        return buckets
+
+    def _queued(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _enqueue(self, ticket):
+        if self._queued() >= self.max_queue:
+            # Shed whichever waiter has the lowest priority, which may be the new call itself
+            worst = max((t for queue in self.queues.values() for t in queue), default=None)
+            if worst is None or not ticket < worst:
+                self.counters['shed'] += 1
+                raise RequestShed(f"AI request queue is full, {PRIORITY_NAMES.get(ticket.priority, ticket.priority)} request dropped")
+            self._remove(worst)
+            worst.shed = True
+            self.counters['shed'] += 1
+        heapq.heappush(self.queues.setdefault(ticket.model, []), ticket)
+
+    def _remove(self, ticket):
+        queue = self.queues.get(ticket.model, [])
+        if ticket in queue:
+            queue.remove(ticket)
+            heapq.heapify(queue)
+        self.condition.notify_all()
+
+    def acquire(self, model, tokens=0, priority=NORMAL, deadline=None):
+        """
+        Block until a call to model may be made, then take its share of the rate limits.
+
+        Parameters:
+        model (str): The model being called.
+        tokens (int): Estimated tokens for the call, counted against the tokens per minute.
+        priority (int): INTERACTIVE, NORMAL or BATCH.
+        deadline (float): time.monotonic() by which the call must have started (optional).
+
+        Raises:
+        RequestShed: If the call was dropped to make room for higher priority work.
+        DeadlineExceeded: If the call could not start before its deadline.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + DEFAULT_DEADLINES.get(priority, DEFAULT_DEADLINES[NORMAL])
+        with self.condition:
+            ticket = Ticket(model, tokens, priority, deadline, next(self.sequence))
+            self._enqueue(ticket)
+            while True:
+                if ticket.shed:
+                    raise RequestShed(f"AI request for {model} dropped for higher priority work")
+                now = time.monotonic()
+                queue = self.queues[model]
+                if queue[0] is ticket:
+                    requests, token_bucket = self._buckets_for(model)
+                    wait = max(
+                        requests.wait_time(1, now),
+                        token_bucket.wait_time(tokens, now),
+                        self.paused_until.get(model, 0.0) - now,
+                    )
+                    if wait <= 0:
+                        heapq.heappop(queue)
+                        requests.consume(1, now)
+                        token_bucket.consume(tokens, now)
+                        self.counters['admitted'] += 1
+                        self.condition.notify_all()
+                        return
+                    if now + wait > deadline:
+                        # No point waiting, the call could not start in time anyway
+                        self._remove(ticket)
+                        self.counters['expired'] += 1
+                        raise DeadlineExceeded(f"AI request for {model} could not start within its deadline")
+                    self.condition.wait(wait)
+                else:
+                    if now >= deadline:
+                        self._remove(ticket)
+                        self.counters['expired'] += 1
+                        raise DeadlineExceeded(f"AI request for {model} could not start within its deadline")
+                    self.condition.wait(deadline - now)
+
+    def report_rate_limited(self, model, retry_after):
+        """Pause a model for everyone after a rate limit error, so other calls do not hit it too"""
+        with self.condition:
+            now = time.monotonic()
+            self.paused_until[model] = max(self.paused_until.get(model, 0.0), now + retry_after)
+            self._buckets_for(model)[0].drain(now)
+            self.counters['rate_limited'] += 1
+            self.condition.notify_all()
+
+    def call(self, model, func, tokens=0, priority=NORMAL, deadline=None):
+        """
+        Run func (a model call) once the scheduler admits it, retrying rate limit errors while
+        there is time left before the deadline.
+
+        Raises:
+        RequestRejected: If the call was shed, timed out or kept being rate limited.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + DEFAULT_DEADLINES.get(priority, DEFAULT_DEADLINES[NORMAL])
+        attempt = 0
+        while True:
+            self.acquire(model, tokens, priority, deadline)
+            try:
+                return func()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                backoff = (2 ** attempt) * RETRY_DELAY + random.uniform(0, 1)
+                self.report_rate_limited(model, backoff)
+                attempt += 1
+                if attempt > MAX_RETRIES or time.monotonic() + backoff > deadline:
+                    # Retrying would only burn quota on a call that cannot finish in time
+                    raise RateLimitExceeded(f"Rate limit for {model} still active, giving up") from e
+                with self.condition:
+                    self.counters['retries'] += 1
+
+    def stats(self):
+        """Return admission counters and queue lengths for monitoring"""
+        with self.condition:
+            stats = dict(self.counters)
+            stats['queued'] = {model: len(queue) for model, queue in self.queues.items() if queue}
+            return stats
+
+
+def get_scheduler():
+    """Return the process wide scheduler, creating it on first use"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = AIScheduler()
+        return _shared_scheduler
@@ -1,28 +1,914 @@
 #A file that contains necessary and supplementary methods to 
 # log output and errors from the program and store them
 
+# Log files hold one JSON record per line ({"time", "type", "message", "prompt"}),
+# and each has a sidecar index (<log file>.idx) of fixed size entries giving the
+# byte offset, time and type of every record, so reads by type or time range seek
+# straight to the records they need instead of scanning the whole file.
+# Logs are rotated by size and age into compressed archive segments beside them
+# (<log file>.<timestamp>.gz), which search and tail read alongside the live file.
+
+import atexit
+import collections
+import gzip
+import json
 import os
+import re
+import shutil
+import sqlite3
+import struct
+import threading
+import time
 from datetime import datetime
 
+# Optional zstd compression of archived segments
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Entries held in memory before the oldest are dropped, if the writer falls behind
+LOG_BUFFER_ENTRIES = int(os.environ.get("LOG_BUFFER_ENTRIES", 10000))
+# Pending bytes that wake the writer early, and the longest an entry waits to be written
+LOG_FLUSH_BYTES = int(os.environ.get("LOG_FLUSH_BYTES", 64 * 1024))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 0.5))
+# Set to 0 to write every entry straight to its file, as before
+LOG_BUFFERED = os.environ.get("LOG_BUFFERED", "1") != "0"
+
+# Rotate a log once it reaches this size, or once its oldest record is this many seconds old (0 for never)
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_MAX_AGE = float(os.environ.get("LOG_MAX_AGE", 7 * 24 * 60 * 60))
+# Archived segments kept per log, and the most days one is kept (0 for no limit)
+LOG_KEEP_SEGMENTS = int(os.environ.get("LOG_KEEP_SEGMENTS", 10))
+LOG_KEEP_DAYS = float(os.environ.get("LOG_KEEP_DAYS", 90))
+# "gzip" or "zstd" (needs the zstandard package, gzip is used without it)
+LOG_COMPRESSION = os.environ.get("LOG_COMPRESSION", "gzip")
+
+INDEX_SUFFIX = ".idx"
+SEARCH_SUFFIX = ".search.db"
+SEGMENT_SUFFIX = ".segment"
+# Records inserted into the search index per transaction while catching up with a log
+SEARCH_BATCH_RECORDS = 10000
+# Bytes read at a time when reading a log backwards from its end
+TAIL_BLOCK_BYTES = 64 * 1024
+# Byte offset, Unix time and type of a record
+INDEX_ENTRY = struct.Struct("<QdB")
+# Index entries read at a time when scanning a range of the index
+INDEX_BLOCK_ENTRIES = 4096
+RECORD_TYPES = ['output', 'error', 'input']
+TYPE_CODES = {name: code for code, name in enumerate(RECORD_TYPES)}
+TYPE_LABELS = {'output': "Output", 'error': "Error", 'input': "User Input"}
+LEGACY_HEADER = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (Output|Error|User Input):\s*$")
+
+
+def make_record(log_type, message, prompt=None, when=None):
+    """Encode one log record as a line of JSON, returning (time, type code, bytes)"""
+    when = when if when is not None else datetime.now().timestamp()
+    record = {'time': round(when, 6), 'type': log_type, 'message': message}
+    if prompt is not None:
+        record['prompt'] = prompt
+    return when, TYPE_CODES[log_type], (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# Held while a log file is appended to or rotated, so no records are written mid-rotation
+_append_lock = threading.RLock()
+# When each live log file's segment started, for age-based rotation
+_segment_started = {}
+
+
+def append_records(filename, records):
+    """Append encoded records to a log file and their entries to its index, rotating the log when it is due"""
+    with _append_lock:
+        position = 0
+        while position < len(records):
+            position, size = _append_until_full(filename, records, position)
+            if rotation_due(filename, size):
+                rotate_log(filename)
+
+
+def _append_until_full(filename, records, position):
+    """Append records from position on, stopping once the log reaches LOG_MAX_BYTES"""
+    index = bytearray()
+    with open(filename, 'ab') as logger:
+        offset = logger.seek(0, os.SEEK_END)
+        for when, type_code, data in records[position:]:
+            index += INDEX_ENTRY.pack(offset, when, type_code)
+            logger.write(data)
+            offset += len(data)
+            position += 1
+            if LOG_MAX_BYTES and offset >= LOG_MAX_BYTES:
+                break
+    with open(filename + INDEX_SUFFIX, 'ab') as index_file:
+        start = index_file.seek(0, os.SEEK_END)
+        index_file.write(index)
+    counts = _record_counts.get(os.path.abspath(filename))
+    if counts is not None:
+        counts.added(start, index)
+    return position, offset
+
+
+def start_segment(filename, when=None):
+    """
+    Record that the live segment of a log file started at when (now by default), in a sidecar file
+    beside it. Age-based rotation counts from here rather than from the records' own times, which
+    may be much older (e.g. in a converted log).
+    """
+    when = time.time() if when is None else when
+    with open(filename + SEGMENT_SUFFIX, 'w') as segment_file:
+        segment_file.write(repr(when))
+    _segment_started[os.path.abspath(filename)] = when
+    return when
+
+
+def segment_started(filename):
+    """Return when the live segment of a log file started, starting it now if that was never recorded"""
+    key = os.path.abspath(filename)
+    started = _segment_started.get(key)
+    if started is None:
+        try:
+            with open(filename + SEGMENT_SUFFIX) as segment_file:
+                started = _segment_started[key] = float(segment_file.read())
+        except (FileNotFoundError, ValueError):
+            started = start_segment(filename)
+    return started
+
+
+def rotation_due(filename, size):
+    """Whether a log file of the given size has reached LOG_MAX_BYTES or its segment is LOG_MAX_AGE old"""
+    if LOG_MAX_BYTES and size >= LOG_MAX_BYTES:
+        return True
+    if not LOG_MAX_AGE or not size:
+        return False
+    return time.time() - segment_started(filename) >= LOG_MAX_AGE
+
+
+def list_archives(filename):
+    """Return the archived segments of a log file, oldest first"""
+    directory, name = os.path.split(os.path.abspath(filename))
+    pattern = re.compile(re.escape(name) + r"\.(\d{8}-\d{6}(?:-\d+)?)\.(gz|zst)$")
+    archives = []
+    for entry in os.listdir(directory):
+        match = pattern.match(entry)
+        if match:
+            archives.append((match.group(1), os.path.join(directory, entry)))
+    return [path for _, path in sorted(archives, key=lambda archive: _stamp_order(archive[0]))]
+
+
+def _stamp_order(stamp):
+    date, clock, *counter = stamp.split("-")
+    return date, clock, int(counter[0]) if counter else 0
+
+
+def open_archive(path, mode='rb'):
+    """Open an archived segment, compressed with gzip or zstd according to its extension"""
+    if path.endswith(".zst"):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError(f"The zstandard package is needed to read {os.path.basename(path)}")
+        return zstandard.open(path, mode)
+    return gzip.open(path, mode)
+
+
+def iter_archive_records(path):
+    """Yield the records of an archived segment, oldest first"""
+    with open_archive(path) as archive:
+        for line in archive:
+            record = parse_record(line)
+            if record is not None:
+                yield record
+
+
+_archive_counts = {}
+_archive_counts_lock = threading.Lock()
+
+
+def _archive_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def count_archive_records(path):
+    """
+    Return the number of records of each type in an archived segment, by type name. Archives do
+    not change once written, so each is only read the first time it is counted, and not at all if
+    it was rotated by this process.
+    """
+    key = _archive_key(path)
+    with _archive_counts_lock:
+        counts = _archive_counts.get(key)
+    if counts is None:
+        counts = dict.fromkeys(RECORD_TYPES, 0)
+        for record in iter_archive_records(path):
+            counts[record['type']] = counts.get(record['type'], 0) + 1
+        with _archive_counts_lock:
+            _archive_counts[key] = counts
+    return dict(counts)
+
+
+def rotate_log(filename):
+    """
+    Move the records of a log file into a compressed archive segment beside it, leaving the log empty,
+    and remove the archives that fall outside the retention policy.
+
+    Returns:
+    str: The path of the new archive, or None if the log was empty.
+    """
+    with _append_lock:
+        if not os.path.getsize(filename):
+            return None
+        extension = ".zst" if LOG_COMPRESSION == "zstd" and ZSTD_AVAILABLE else ".gz"
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        archive = f"{filename}.{stamp}{extension}"
+        counter = 0
+        while os.path.exists(archive):
+            counter += 1
+            archive = f"{filename}.{stamp}-{counter}{extension}"
+
+        temporary = archive + ".writing"
+        with open(filename, 'rb') as logger, open_archive(temporary, 'wb') as compressed:
+            shutil.copyfileobj(logger, compressed)
+        os.replace(temporary, archive)
+        with _archive_counts_lock:
+            _archive_counts[_archive_key(archive)] = get_record_counts(filename).get()
+
+        # Keep what the search index already holds, now under the archive's name
+        if os.path.exists(filename + SEARCH_SUFFIX):
+            get_search_index(filename).archived(os.path.basename(archive))
+        open(filename, 'wb').close()
+        reset_indexes(filename)
+        start_segment(filename)
+        apply_retention(filename)
+        return archive
+
+
+def apply_retention(filename, keep_segments=LOG_KEEP_SEGMENTS, keep_days=LOG_KEEP_DAYS):
+    """
+    Delete the archived segments of a log beyond the newest keep_segments, or older than keep_days.
+
+    Returns:
+    list: The paths of the archives deleted.
+    """
+    archives = list_archives(filename)
+    expired = archives[:-keep_segments] if keep_segments and len(archives) > keep_segments else []
+    if keep_days:
+        cutoff = time.time() - keep_days * 24 * 60 * 60
+        expired += [archive for archive in archives if archive not in expired and os.path.getmtime(archive) < cutoff]
+    return remove_archives(filename, expired)
+
+
+def remove_archives(filename, archives):
+    """Delete archived segments of a log and drop their records from its search index"""
+    for archive in archives:
+        os.remove(archive)
+        with _archive_counts_lock:
+            for key in [key for key in _archive_counts if key[0] == os.path.abspath(archive)]:
+                del _archive_counts[key]
+        if os.path.exists(filename + SEARCH_SUFFIX):
+            get_search_index(filename).forget_segment(os.path.basename(archive))
+    return archives
+
+
+def update_index(filename):
+    """
+    Bring the index of a log file up to date if records were written without it (e.g. the process
+    stopped between writing the two files). Only the index's last entry is read to find where the
+    indexed records end.
+
+    Returns:
+    int: The number of entries in the index.
+    """
+    index_path = filename + INDEX_SUFFIX
+    with _append_lock:
+        index_size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        # A partly written last entry is dropped and indexed again
+        size = index_size - index_size % INDEX_ENTRY.size
+        count = size // INDEX_ENTRY.size
+        with open(filename, 'rb') as logger:
+            if count:
+                logger.seek(read_entries(index_path, count - 1, count)[0][0])
+                logger.readline()
+            position = logger.tell()
+            missing = bytearray()
+            for line in logger:
+                record = parse_record(line)
+                if record is not None:
+                    missing += INDEX_ENTRY.pack(position, record['time'], TYPE_CODES.get(record['type'], 0))
+                    count += 1
+                position += len(line)
+        if missing or size != index_size or not os.path.exists(index_path):
+            with open(index_path, 'r+b' if os.path.exists(index_path) else 'wb') as index_file:
+                index_file.truncate(size)
+                index_file.seek(size)
+                index_file.write(missing)
+    return count
+
+
+def read_entries(index, first, last):
+    """
+    Read entries first to last (last not included) of an index, given its path or an open file.
+
+    Returns:
+    list: (offset, time, type code) for each entry, in file order.
+    """
+    if isinstance(index, str):
+        with open(index, 'rb') as index_file:
+            return read_entries(index_file, first, last)
+    index.seek(first * INDEX_ENTRY.size)
+    data = index.read(max(0, last - first) * INDEX_ENTRY.size)
+    return list(INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size]))
+
+
+def bisect_index(index_file, count, timestamp, right=False):
+    """
+    Find the first of count entries of an open index logged at or after timestamp (after it, if
+    right is set). Records are appended in time order, so this is a binary search that reads one
+    entry per step.
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        when = read_entries(index_file, middle, middle + 1)[0][1]
+        if when < timestamp or (right and when == timestamp):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def select_entries(index_file, first, last, type_code=None, limit=None):
+    """
+    Pick out the entries first to last of an open index, only those of one type if type_code is
+    given and only the last limit of them if limit is set. The index is read a block at a time,
+    backwards from last when there is a limit, so no more of it is read than is needed.
+
+    Returns:
+    list: (entry number, entry) pairs, in file order.
+    """
+    selected = []
+    if limit:
+        end = last
+        while end > first and len(selected) < limit:
+            start = max(first, end - INDEX_BLOCK_ENTRIES)
+            block = read_entries(index_file, start, end)
+            for number in range(len(block) - 1, -1, -1):
+                if type_code is None or block[number][2] == type_code:
+                    selected.append((start + number, block[number]))
+                    if len(selected) == limit:
+                        break
+            end = start
+        selected.reverse()
+        return selected
+    for start in range(first, last, INDEX_BLOCK_ENTRIES):
+        block = read_entries(index_file, start, min(last, start + INDEX_BLOCK_ENTRIES))
+        selected.extend(
+            (start + number, entry) for number, entry in enumerate(block)
+            if type_code is None or entry[2] == type_code
+        )
+    return selected
+
+
+def parse_record(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) and 'time' in record else None
+
+
+def _as_timestamp(value):
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+def format_record(record):
+    """Render a record as the text shown in log viewers, e.g. "[2025-10-01 12:00:00] Output: message" """
+    timestamp = datetime.fromtimestamp(record['time']).strftime("%Y-%m-%d %H:%M:%S")
+    message = record.get('message', '')
+    if record.get('prompt') is not None:
+        message = f"{record['prompt']}: {message}"
+    return f"[{timestamp}] {TYPE_LABELS.get(record['type'], record['type'])}: {message}"
+
+
+def convert_legacy_log(filename):
+    """
+    Rewrite a log file in the old free-text format ("[timestamp] Output:" headers followed by the
+    message) as records, keeping any records already appended to it, and rebuild its index.
+    """
+    with open(filename, 'r', encoding='utf-8', errors='replace') as logger:
+        lines = logger.readlines()
+    records = []
+    current = None
+    preamble = []
+    for line in lines:
+        if line.startswith('{'):
+            record = parse_record(line)
+            if record is not None:
+                records.append(record)
+                current = None
+                continue
+        header = LEGACY_HEADER.match(line)
+        if header:
+            log_type = {'Output': 'output', 'Error': 'error', 'User Input': 'input'}[header.group(2)]
+            when = datetime.strptime(header.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+            current = {'time': when, 'type': log_type, 'message': []}
+            records.append(current)
+        elif current is not None:
+            current['message'].append(line.rstrip("\n"))
+        elif line.strip():
+            preamble.append(line.strip())
+
+    encoded = []
+    if preamble:
+        first_time = records[0]['time'] if records else os.path.getmtime(filename)
+        encoded.append(make_record('output', "\n".join(preamble), when=first_time))
+    for record in records:
+        message = record['message']
+        prompt = record.get('prompt')
+        if isinstance(message, list):
+            message = "\n".join(message).strip()
+            if record['type'] == 'input' and ": " in message:
+                prompt, message = message.split(": ", 1)
+        encoded.append(make_record(record['type'], message, prompt, record['time']))
+
+    temporary = filename + ".converting"
+    with open(temporary, 'wb') as logger:
+        logger.write(b"".join(data for _, _, data in encoded))
+    os.replace(temporary, filename)
+    reset_indexes(filename)
+    # The converted records keep their old times, but the segment starts now
+    start_segment(filename)
+
+
+def reset_indexes(filename):
+    """Rebuild the offset index and counts of a log file that was rewritten, and reindex it for search"""
+    if os.path.exists(filename + INDEX_SUFFIX):
+        os.remove(filename + INDEX_SUFFIX)
+    update_index(filename)
+    get_record_counts(filename).reset()
+    if os.path.exists(filename + SEARCH_SUFFIX):
+        get_search_index(filename).reset()
+
+
+def iter_records_reversed(filename, block_size=TAIL_BLOCK_BYTES):
+    """Yield the records of a log file newest first, reading backwards from its end a block at a time"""
+    with open(filename, 'rb') as logger:
+        position = logger.seek(0, os.SEEK_END)
+        # Start of a line whose beginning is in an earlier block
+        pending = b""
+        at_end = True
+        while position > 0:
+            start = max(0, position - block_size)
+            logger.seek(start)
+            data = logger.read(position - start) + pending
+            position = start
+            if at_end:
+                # Anything after the last newline is a record still being written
+                end = data.rfind(b"\n")
+                if end == -1:
+                    pending = data
+                    continue
+                data = data[:end + 1]
+                at_end = False
+            lines = data.split(b"\n")
+            pending = lines.pop(0) if position > 0 else b""
+            for line in reversed(lines):
+                record = parse_record(line)
+                if record is not None:
+                    yield record
+
+
+class RecordCounts:
+    """
+    Running count of the records of each type in a log file.
+
+    Records appended through append_records are counted as they are written. Anything else that
+    grew the offset index (another process, an index repair) is caught up by reading only the new
+    index entries, so counting never reads the log itself.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.counts = [0] * len(RECORD_TYPES)
+        self.counted_bytes = 0
+
+    def _count(self, index_bytes):
+        for _, _, type_code in INDEX_ENTRY.iter_unpack(index_bytes):
+            self.counts[type_code] += 1
+        self.counted_bytes += len(index_bytes)
+
+    def added(self, start, index_bytes):
+        """Count index entries just appended at byte start of the index"""
+        with self.lock:
+            # Otherwise entries from elsewhere came first, and get() reads them all from the index
+            if start == self.counted_bytes:
+                self._count(index_bytes)
+
+    def get(self):
+        """Return the number of records of each type, by type name"""
+        index_path = self.filename + INDEX_SUFFIX
+        size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+        size -= size % INDEX_ENTRY.size
+        with self.lock:
+            if size < self.counted_bytes:
+                self._reset()
+            if size > self.counted_bytes:
+                with open(index_path, 'rb') as index_file:
+                    index_file.seek(self.counted_bytes)
+                    self._count(index_file.read(size - self.counted_bytes))
+            return dict(zip(RECORD_TYPES, self.counts))
+
+    def _reset(self):
+        self.counts = [0] * len(RECORD_TYPES)
+        self.counted_bytes = 0
+
+    def reset(self):
+        """Forget the counts, so the next get() counts the whole index again"""
+        with self.lock:
+            self._reset()
+
+
+_record_counts = {}
+_record_counts_lock = threading.Lock()
+
+
+def get_record_counts(filename):
+    """Return the running record counts of a log file, shared by every logger writing to it"""
+    filename = os.path.abspath(filename)
+    with _record_counts_lock:
+        counts = _record_counts.get(filename)
+        if counts is None:
+            counts = _record_counts[filename] = RecordCounts(filename)
+        return counts
+
+
+class BufferedLogWriter:
+    """
+    Appends log records to their files from a background thread.
+
+    Callers only add the record to an in-memory ring buffer, so they never wait on the disk. The
+    writer thread wakes when LOG_FLUSH_BYTES are pending or every LOG_FLUSH_INTERVAL seconds, and
+    writes everything pending with one open and write per file. If the buffer fills up the oldest
+    records are dropped and counted, rather than blocking the caller.
+    """
+
+    def __init__(self, max_entries=LOG_BUFFER_ENTRIES, flush_bytes=LOG_FLUSH_BYTES, flush_interval=LOG_FLUSH_INTERVAL):
+        self.buffer = collections.deque(maxlen=max_entries)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.pending_bytes = 0
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.flush_requested = False
+
+    def write(self, filename, record):
+        """Queue a record from make_record to be appended to filename"""
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+                self.written += 1
+            self.buffer.append((filename, record))
+            self.queued += 1
+            self.pending_bytes += len(record[2])
+            if self.thread is None:
+                self._start()
+            if self.pending_bytes >= self.flush_bytes:
+                self.condition.notify_all()
+
+    def _start(self):
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.stopping or self.flush_requested or self.pending_bytes >= self.flush_bytes,
+                    self.flush_interval
+                )
+                batch = list(self.buffer)
+                self.buffer.clear()
+                self.pending_bytes = 0
+                self.flush_requested = False
+                if not batch and self.stopping:
+                    self.thread = None
+                    self.condition.notify_all()
+                    return
+            self._write_batch(batch)
+            with self.condition:
+                self.written += len(batch)
+                self.condition.notify_all()
+
+    def _write_batch(self, batch):
+        by_file = {}
+        for filename, record in batch:
+            by_file.setdefault(filename, []).append(record)
+        for filename, records in by_file.items():
+            try:
+                append_records(filename, records)
+            except Exception:
+                self.write_errors += 1
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been written, returning False on timeout"""
+        with self.condition:
+            target = self.queued
+            if self.thread is None:
+                return self.written >= target
+            self.flush_requested = True
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: self.written >= target or self.thread is None, timeout)
+
+    def shutdown(self, timeout=5.0):
+        """Write everything still pending and stop the writer thread"""
+        with self.condition:
+            if self.thread is None:
+                return
+            self.stopping = True
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.thread is None, timeout)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'pending': len(self.buffer),
+                'written': self.written - self.dropped,
+                'dropped': self.dropped,
+                'write_errors': self.write_errors,
+            }
+
+
+_log_writer = BufferedLogWriter()
+atexit.register(_log_writer.shutdown)
+
+
+def flush_logs(timeout=5.0):
+    """Write all buffered log entries now, e.g. before reading a log file from outside general_logger"""
+    return _log_writer.flush(timeout)
+
+
+class LogSearchIndex:
+    """
+    Full-text index of the records in one log file and its archived segments, kept in a SQLite FTS5
+    table beside the log.
+
+    The index remembers how far into the log it has read and, just before each search, indexes only
+    the records appended since, so logging never waits on it. When the log is rotated its rows are
+    relabelled with the archive's name rather than indexed again, and they are dropped when the
+    archive is deleted. The trigram tokenizer keeps the case-insensitive substring matching of the
+    old line by line search, and the search terms and type become one query instead of a scan of
+    the file per type. Terms shorter than three characters have no trigrams and are matched with
+    LIKE instead.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename + SEARCH_SUFFIX, check_same_thread=False)
+        with self.connection:
+            try:
+                self.connection.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS entries USING "
+                    "fts5(content, type UNINDEXED, segment UNINDEXED, line UNINDEXED, tokenize='trigram')"
+                )
+                self.full_text = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5 or older than 3.34, every term is matched with LIKE
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS entries (content TEXT, type TEXT, segment TEXT, line INTEGER)"
+                )
+                self.full_text = False
+            self.connection.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value INTEGER)")
+            if self.connection.execute("SELECT count(*) FROM entries").fetchone()[0] == 0:
+                self.connection.execute("DELETE FROM state")
+
+    def _state(self):
+        return dict(self.connection.execute("SELECT name, value FROM state"))
+
+    def _save_state(self, offset, records):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)", [('offset', offset), ('records', records)]
+        )
+
+    def _insert(self, rows, offset=None, records=None):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO entries (content, type, segment, line) VALUES (?, ?, ?, ?)", rows
+            )
+            if offset is not None:
+                self._save_state(offset, records)
+
+    def _index_archives(self):
+        for archive in list_archives(self.filename):
+            segment = os.path.basename(archive)
+            rows = [
+                (format_record(record), record['type'], segment, line)
+                for line, record in enumerate(iter_archive_records(archive), 1)
+            ]
+            self._insert(rows)
+
+    def sync(self):
+        """Index the records appended to the log since the last sync"""
+        state = self._state()
+        if 'offset' not in state:
+            # A new index starts with the archived segments, oldest first
+            self._index_archives()
+            with self.connection:
+                self._save_state(0, 0)
+        offset, records = state.get('offset', 0), state.get('records', 0)
+        size = os.path.getsize(self.filename)
+        if size < offset:
+            # The log was cleared or rewritten since, start again from the beginning
+            self._clear_live()
+            offset, records = 0, 0
+        if size == offset:
+            return
+        rows = []
+        with open(self.filename, 'rb') as logger:
+            logger.seek(offset)
+            for line in logger:
+                if not line.endswith(b"\n"):
+                    # Still being written, picked up by the next sync
+                    break
+                offset += len(line)
+                record = parse_record(line)
+                if record is None:
+                    continue
+                records += 1
+                rows.append((format_record(record), record['type'], "", records))
+                if len(rows) >= SEARCH_BATCH_RECORDS:
+                    self._insert(rows, offset, records)
+                    rows = []
+        self._insert(rows, offset, records)
+
+    def _clear_live(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM entries WHERE segment = ''")
+            self._save_state(0, 0)
+
+    def reset(self):
+        """Forget the live log's records, so the next search indexes it from the start"""
+        with self.lock:
+            self._clear_live()
+
+    def archived(self, segment):
+        """Move the live log's records under the name of the archive it is being rotated into"""
+        with self.lock:
+            self.sync()
+            with self.connection:
+                self.connection.execute("UPDATE entries SET segment = ? WHERE segment = ''", (segment,))
+                self._save_state(0, 0)
+
+    def forget_segment(self, segment):
+        """Drop the records of a deleted archive"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM entries WHERE segment = ?", (segment,))
+
+    def search(self, terms, log_type=None, limit=None):
+        """
+        Find the records containing every one of terms, in the log and its archives.
+
+        Parameters:
+        terms (list): Text each record must contain, matched case-insensitively. Empty terms are ignored.
+        log_type (str): 'output', 'error' or 'input' to only find that type (optional).
+        limit (int): Only return the most recent limit matches (optional).
+
+        Returns:
+        list: (segment, line, type, text) of each matching record, oldest first. The segment is the
+        archive's file name, or "" for the live log.
+        """
+        terms = [term for term in terms if term]
+        conditions = []
+        parameters = []
+        phrases = [term for term in terms if self.full_text and len(term) >= 3]
+        if phrases:
+            conditions.append("entries MATCH ?")
+            parameters.append(" AND ".join('"' + term.replace('"', '""') + '"' for term in phrases))
+        for term in terms:
+            if term not in phrases:
+                conditions.append("content LIKE ? ESCAPE '\\'")
+                parameters.append("%" + re.sub(r"([%_\\])", r"\\\1", term) + "%")
+        if log_type is not None:
+            conditions.append("type = ?")
+            parameters.append(log_type)
+        query = "SELECT segment, line, type, content FROM entries"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid DESC"
+        if limit:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        with self.lock:
+            self.sync()
+            matches = self.connection.execute(query, parameters).fetchall()
+        matches.reverse()
+        return matches
+
+
+_search_indexes = {}
+_search_indexes_lock = threading.Lock()
+
+
+def get_search_index(filename):
+    """Return the search index of a log file, shared by every logger writing to it"""
+    filename = os.path.abspath(filename)
+    with _search_indexes_lock:
+        index = _search_indexes.get(filename)
+        if index is None:
+            index = _search_indexes[filename] = LogSearchIndex(filename)
+        return index
+
+
 class general_logger():
     def __init__(self, filename):
         self.loggerFile = filename
         # Ensure the directory exists
         os.makedirs(os.path.dirname(filename), exist_ok=True)
-        # Create file if it doesn't exist
+        # Create file if it doesn't exist. Files in the old text format are converted by the first
+        # read or write, or an explicit migrate()
         if not os.path.exists(filename):
-            with open(filename, 'w') as f:
-                f.write(f"Log file created: {datetime.now().isoformat()}\n\n")
+            append_records(filename, [make_record('output', f"Log file created: {datetime.now().isoformat()}")])
+        self._migrated = False
+
+    def migrate(self):
+        """
+        Convert the log file in place if it was written in the old free-text format.
+
+        Returns:
+        bool: True if the file was converted.
+        """
+        self._migrated = True
+        self.flush()
+        with _append_lock:
+            if not os.path.exists(self.loggerFile):
+                return False
+            with open(self.loggerFile, 'rb') as logger:
+                first_byte = logger.read(1)
+            if not first_byte or first_byte == b'{':
+                return False
+            convert_legacy_log(self.loggerFile)
+        return True
+
+    def _ensureMigrated(self):
+        if not self._migrated:
+            self.migrate()
+
+    def _write(self, log_type, message, prompt=None):
+        """Append a record to the log file, through the background writer unless buffering is turned off"""
+        self._ensureMigrated()
+        record = make_record(log_type, message, prompt)
+        if LOG_BUFFERED:
+            _log_writer.write(self.loggerFile, record)
+            return
+        append_records(self.loggerFile, [record])
+
+    def flush(self, timeout=5.0):
+        """Wait until every entry logged so far is in the file"""
+        return _log_writer.flush(timeout)
+
+    def readRecords(self, log_type=None, start_time=None, end_time=None, limit=None):
+        """
+        Read records from the log, oldest first, using the index to skip straight to the ones wanted.
+
+        Parameters:
+        log_type (str): 'output', 'error' or 'input' to only read that type (optional).
+        start_time, end_time (datetime or float): Only read records logged in this range (optional).
+        limit (int): Only read the most recent limit matching records (optional).
+
+        Returns:
+        list: Record dictionaries with time, type, message, prompt (for inputs) and line (1-based).
+        """
+        self._ensureMigrated()
+        self.flush()
+        count = update_index(self.loggerFile)
+        type_code = None if log_type is None else TYPE_CODES[log_type]
+
+        records = []
+        with open(self.loggerFile + INDEX_SUFFIX, 'rb') as index_file, open(self.loggerFile, 'rb') as logger:
+            first = 0 if start_time is None else bisect_index(index_file, count, _as_timestamp(start_time))
+            last = count if end_time is None else bisect_index(index_file, count, _as_timestamp(end_time), right=True)
+            for number, (offset, _, _) in select_entries(index_file, first, last, type_code, limit):
+                logger.seek(offset)
+                record = parse_record(logger.readline())
+                if record is not None:
+                    record['line'] = number + 1
+                    records.append(record)
+        return records
 
     def printMenu(self):
         """Returns menu as dictionary instead of printing - for Flask compatibility"""
         menu = {
-            1: "Add to logs", 
-            2: "Search for logs", 
-            3: "Add Error to logs", 
-            4: "Search for errors in logs", 
-            5: "Add Input to logs", 
-            6: "Search for inputs in logs", 
+            1: "Add to logs",
+            2: "Search for logs",
+            3: "Add Error to logs",
+            4: "Search for errors in logs",
+            5: "Add Input to logs",
+            6: "Search for inputs in logs",
             7: "Exit"
         }
         return menu
@@ -32,16 +918,19 @@ class general_logger():
         pass
 
     def cleanLoggerFile(self):
-        """Clean empty lines from log file"""
+        """Drop unreadable lines from the log file and rebuild its indexes"""
         try:
-            with open(self.loggerFile, 'r', encoding='utf-8') as logger:
-                current_lines = ""
-                for line in logger.readlines():
-                    if line.strip():  # Keep non-empty lines
-                        current_lines += line
-            
-            with open(self.loggerFile, 'w', encoding='utf-8') as new_logger:
-                new_logger.write(current_lines)
+            self._ensureMigrated()
+            self.flush()
+            temporary = self.loggerFile + ".cleaning"
+            with _append_lock:
+                # Streamed line by line, so memory use does not grow with the log
+                with open(self.loggerFile, 'rb') as logger, open(temporary, 'wb') as new_logger:
+                    for line in logger:
+                        if parse_record(line) is not None:
+                            new_logger.write(line)
+                os.replace(temporary, self.loggerFile)
+                reset_indexes(self.loggerFile)
             return True
         except Exception as e:
             return False
@@ -52,9 +941,11 @@ class general_logger():
 
     def changeLoggerFile(self, filename):
         """Change log file path"""
+        self.flush()
         self.loggerFile = filename
         # Ensure new directory exists
         os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self._migrated = False
 
     def handleChoice(self, choice):
         """Not used in Flask - kept for compatibility"""
@@ -63,12 +954,8 @@ class general_logger():
     def addToLogs(self, outputStatement):
         """Add output log entry with timestamp"""
         try:
-            with open(self.loggerFile, 'a', encoding='utf-8') as logger:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                logger.write(f"[{timestamp}] Output:\n")
-                # Replace double spaces with newlines for better formatting
-                outputStatement = outputStatement.replace("  ", "\n")
-                logger.write(f"{outputStatement}\n\n")
+            # Replace double spaces with newlines for better formatting
+            self._write('output', outputStatement.replace("  ", "\n"))
             return True
         except Exception as e:
             return False
@@ -76,98 +963,62 @@ class general_logger():
     def addToInputLogs(self, inputPrompt, inputStatement):
         """Add input log entry with timestamp"""
         try:
-            with open(self.loggerFile, 'a', encoding='utf-8') as logger:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                logger.write(f"[{timestamp}] User Input:\n")
-                logger.write(f"{inputPrompt}: {inputStatement}\n\n")
+            self._write('input', str(inputStatement), str(inputPrompt))
             return True
         except Exception as e:
             return False
 
-    def searchForInputs(self, searchTerm):
-        """Search for input logs - Flask version without user interaction"""
+    def searchLogs(self, searchTerm, log_type=None, narrowTerm=None, limit=None):
+        """
+        Search the log through its full-text index, in one lookup whatever the filters.
+
+        Parameters:
+        searchTerm (str): Text every result must contain, ignoring case.
+        log_type (str): 'output', 'error' or 'input' to only search that type (optional).
+        narrowTerm (str): Further text every result must contain (optional).
+        limit (int): Only return the most recent limit results (optional).
+
+        Returns:
+        list: Dictionaries with each result's type, line, segment (the archive it is in, or None for
+        the live log) and "Line N: [timestamp] Type: message" content, oldest first.
+        """
+        self._ensureMigrated()
+        self.flush()
+        matches = get_search_index(self.loggerFile).search([searchTerm, narrowTerm], log_type, limit)
+        return [
+            {
+                'type': record_type,
+                'line': line,
+                'segment': segment or None,
+                'content': f"Line {line} ({segment}): {text}" if segment else f"Line {line}: {text}"
+            }
+            for segment, line, record_type, text in matches
+        ]
+
+    def _searchRecords(self, log_type, searchTerm, narrowTerm=None):
+        """Search records of one type, returning "Line N: [timestamp] Type: message" strings"""
         try:
-            with open(self.loggerFile, 'r', encoding='utf-8') as logger:
-                inputLines = []
-                lineToAdd = False
-                
-                for lineNum, line in enumerate(logger, 1):
-                    if "User Input:" in line:
-                        lineToAdd = True
-                    if lineToAdd:
-                        inputLines.append(f"Line {lineNum}: {line.strip()}")
-                    if ("Error:" in line or "Output:" in line) and not "User Input:" in line:
-                        lineToAdd = False
-                
-                # Filter results containing search term
-                results = []
-                for line in inputLines:
-                    if searchTerm.lower() in line.lower():
-                        results.append(line)
-                
-                return results
+            return [result['content'] for result in self.searchLogs(searchTerm, log_type, narrowTerm)]
         except Exception as e:
             return []
 
+    def searchForInputs(self, searchTerm):
+        """Search for input logs - Flask version without user interaction"""
+        return self._searchRecords('input', searchTerm)
+
     def searchForLogs(self, searchTerm):
         """Search for output logs - Flask version without user interaction"""
-        try:
-            with open(self.loggerFile, 'r', encoding='utf-8') as logger:
-                outputLines = []
-                lineToAdd = False
-                
-                for lineNum, line in enumerate(logger, 1):
-                    if "Output:" in line:
-                        lineToAdd = True
-                    if lineToAdd:
-                        outputLines.append(f"Line {lineNum}: {line.strip()}")
-                    if ("Error:" in line or "User Input:" in line) and not "Output:" in line:
-                        lineToAdd = False
-                
-                # Filter results containing search term
-                results = []
-                for line in outputLines:
-                    if searchTerm.lower() in line.lower():
-                        results.append(line)
-                
-                return results
-        except Exception as e:
-            return []
+        return self._searchRecords('output', searchTerm)
 
     def searchForErrors(self, searchTerm):
         """Search for error logs - Flask version without user interaction"""
-        try:
-            with open(self.loggerFile, 'r', encoding='utf-8') as logger:
-                errorLines = []
-                lineToAdd = False
-                
-                for lineNum, line in enumerate(logger, 1):
-                    if "Error:" in line:
-                        lineToAdd = True
-                    if lineToAdd:
-                        errorLines.append(f"Line {lineNum}: {line.strip()}")
-                    if ("Output:" in line or "User Input:" in line) and not "Error:" in line:
-                        lineToAdd = False
-                
-                # Filter results containing search term
-                results = []
-                for line in errorLines:
-                    if searchTerm.lower() in line.lower():
-                        results.append(line)
-                
-                return results
-        except Exception as e:
-            return []
+        return self._searchRecords('error', searchTerm)
 
     def addToErrorLogs(self, errorStatement):
         """Add error log entry with timestamp"""
         try:
-            with open(self.loggerFile, 'a', encoding='utf-8') as logger:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                logger.write(f"[{timestamp}] Error:\n")
-                # Replace double spaces with newlines for better formatting
-                errorStatement = errorStatement.replace("  ", "\n")
-                logger.write(f"{errorStatement}\n\n")
+            # Replace double spaces with newlines for better formatting
+            self._write('error', errorStatement.replace("  ", "\n"))
             return True
         except Exception as e:
             return False
@@ -177,31 +1028,15 @@ class general_logger():
         pass
 
     # Additional Flask-friendly methods
-    
+
     def searchWithNarrow(self, searchType, initialTerm, narrowTerm=None):
         """Enhanced search method for Flask with optional narrow search"""
-        # Get initial results
-        if searchType == "output":
-            results = self.searchForLogs(initialTerm)
-        elif searchType == "error":
-            results = self.searchForErrors(initialTerm)
-        elif searchType == "input":
-            results = self.searchForInputs(initialTerm)
-        else:
+        if searchType not in TYPE_CODES:
             return []
-        
-        # Apply narrow search if provided
-        if narrowTerm and results:
-            narrowResults = []
-            for line in results:
-                if narrowTerm.lower() in line.lower():
-                    narrowResults.append(line)
-            return narrowResults
-        
-        return results
-
-    def getLogStats(self):
-        """Get statistics about the log file"""
+        return self._searchRecords(searchType, initialTerm, narrowTerm)
+
+    def getLogStats(self, include_archives=False):
+        """Get statistics about the log file, with the archived segments' records in the counts if include_archives is set"""
         try:
             if not os.path.exists(self.loggerFile):
                 return {
@@ -210,117 +1045,172 @@ class general_logger():
                     'error_count': 0,
                     'input_count': 0,
                     'file_size': 0,
-                    'last_modified': None
+                    'last_modified': None,
+                    'archived_segments': 0,
+                    'archived_size': 0
                 }
-            
-            output_count = 0
-            error_count = 0
-            input_count = 0
-            total_lines = 0
-            
-            with open(self.loggerFile, 'r', encoding='utf-8') as logger:
-                for line in logger:
-                    total_lines += 1
-                    if "Output:" in line:
-                        output_count += 1
-                    elif "Error:" in line:
-                        error_count += 1
-                    elif "User Input:" in line:
-                        input_count += 1
-            
+
+            counts = self.getRecordCounts(include_archives)
+            archives = self.getArchives()
+
             file_size = os.path.getsize(self.loggerFile)
             last_modified = datetime.fromtimestamp(os.path.getmtime(self.loggerFile))
-            
+
             return {
-                'total_lines': total_lines,
-                'output_count': output_count,
-                'error_count': error_count,
-                'input_count': input_count,
+                'total_lines': sum(counts.values()),
+                'output_count': counts['output'],
+                'error_count': counts['error'],
+                'input_count': counts['input'],
                 'file_size': file_size,
-                'last_modified': last_modified.isoformat()
+                'last_modified': last_modified.isoformat(),
+                'archived_segments': len(archives),
+                'archived_size': sum(archive['size'] for archive in archives)
             }
         except Exception as e:
             return {'error': str(e)}
 
-    def getAllLogs(self, log_type=None, limit=None):
+    def getRecordCounts(self, include_archives=False):
+        """
+        Get the number of records of each type, from running counts rather than reading the log.
+        With include_archives the records of the archived segments are counted too.
+        """
+        self._ensureMigrated()
+        self.flush()
+        counts = get_record_counts(self.loggerFile).get()
+        if include_archives:
+            for archive in list_archives(self.loggerFile):
+                for log_type, count in count_archive_records(archive).items():
+                    counts[log_type] = counts.get(log_type, 0) + count
+        return counts
+
+    def getLogCount(self, log_type=None, include_archives=False):
+        """Get the number of records in the log (and its archives, with include_archives), or of one type"""
+        counts = self.getRecordCounts(include_archives)
+        return counts[log_type] if log_type is not None else sum(counts.values())
+
+    def _iterNewestFirst(self):
+        """Yield (segment, line, record) for every record, newest first, from the live log then its archives"""
+        total = self.getLogCount()
+        for from_end, record in enumerate(iter_records_reversed(self.loggerFile)):
+            yield None, total - from_end, record
+        for archive in reversed(list_archives(self.loggerFile)):
+            # Archives are compressed, so each is read forwards, but rotation keeps them small
+            archived = list(iter_archive_records(archive))
+            for line in range(len(archived), 0, -1):
+                yield os.path.basename(archive), line, archived[line - 1]
+
+    def tailRecords(self, limit=50, log_type=None):
+        """
+        Read the most recent records by reading the log backwards from its end, continuing into its
+        archived segments if needed, so the cost depends on limit rather than on the size of the log.
+
+        Parameters:
+        limit (int): Most records to return.
+        log_type (str): 'output', 'error' or 'input' to only return that type (optional).
+
+        Returns:
+        list: Record dictionaries, as returned by readRecords, oldest first. Records from an archive
+        also have its file name under 'segment'.
+        """
+        self._ensureMigrated()
+        records = []
+        for segment, line, record in self._iterNewestFirst():
+            if len(records) >= limit:
+                break
+            if log_type is None or record['type'] == log_type:
+                record['line'] = line
+                if segment:
+                    record['segment'] = segment
+                records.append(record)
+        records.reverse()
+        return records
+
+    def getLogs(self, limit=None, log_type=None, include_archives=False):
+        """
+        Get log entries as "[timestamp] Type: message" strings, oldest first, only the last limit if
+        given. The last limit can reach into the archived segments; without a limit only the live log
+        is read unless include_archives is set.
+        """
+        try:
+            if limit is not None:
+                records = self.tailRecords(limit, log_type) if limit > 0 else []
+            else:
+                records = self.readRecords(log_type)
+                if include_archives:
+                    archived = [
+                        record
+                        for archive in list_archives(self.loggerFile)
+                        for record in iter_archive_records(archive)
+                        if log_type is None or record['type'] == log_type
+                    ]
+                    records = archived + records
+            return [format_record(record) for record in records]
+        except Exception as e:
+            return []
+
+    def clearLogs(self, archivesOnly=False):
+        """Remove every entry from the log file and its archives, or only delete the archived segments"""
+        try:
+            self.flush()
+            with _append_lock:
+                remove_archives(self.loggerFile, list_archives(self.loggerFile))
+                if not archivesOnly:
+                    open(self.loggerFile, 'wb').close()
+                    reset_indexes(self.loggerFile)
+                    start_segment(self.loggerFile)
+            return True
+        except Exception as e:
+            return False
+
+    def rotate(self):
+        """Archive the log's entries now, instead of waiting for it to reach LOG_MAX_BYTES or LOG_MAX_AGE"""
+        self.flush()
+        return rotate_log(self.loggerFile)
+
+    def getArchives(self):
+        """Get the archived segments of the log, oldest first"""
+        return [
+            {
+                'filename': os.path.basename(archive),
+                'size': os.path.getsize(archive),
+                'modified': datetime.fromtimestamp(os.path.getmtime(archive)).isoformat()
+            }
+            for archive in list_archives(self.loggerFile)
+        ]
+
+    def getAllLogs(self, log_type=None, limit=None, start_time=None, end_time=None):
         """Get all logs of a specific type or all logs"""
         try:
-            with open(self.loggerFile, 'r', encoding='utf-8') as logger:
-                all_logs = []
-                current_entry = []
-                entry_type = None
-                
-                for line_num, line in enumerate(logger, 1):
-                    line = line.strip()
-                    
-                    if "Output:" in line:
-                        if current_entry and entry_type:
-                            all_logs.append({
-                                'type': entry_type,
-                                'content': '\n'.join(current_entry),
-                                'line_start': line_num - len(current_entry)
-                            })
-                        current_entry = [line]
-                        entry_type = 'output'
-                    elif "Error:" in line:
-                        if current_entry and entry_type:
-                            all_logs.append({
-                                'type': entry_type,
-                                'content': '\n'.join(current_entry),
-                                'line_start': line_num - len(current_entry)
-                            })
-                        current_entry = [line]
-                        entry_type = 'error'
-                    elif "User Input:" in line:
-                        if current_entry and entry_type:
-                            all_logs.append({
-                                'type': entry_type,
-                                'content': '\n'.join(current_entry),
-                                'line_start': line_num - len(current_entry)
-                            })
-                        current_entry = [line]
-                        entry_type = 'input'
-                    elif line and entry_type:
-                        current_entry.append(line)
-                
-                # Don't forget the last entry
-                if current_entry and entry_type:
-                    all_logs.append({
-                        'type': entry_type,
-                        'content': '\n'.join(current_entry),
-                        'line_start': line_num - len(current_entry) + 1
-                    })
-                
-                # Filter by type if specified
-                if log_type:
-                    all_logs = [log for log in all_logs if log['type'] == log_type]
-                
-                # Apply limit if specified
-                if limit:
-                    all_logs = all_logs[-limit:]  # Get most recent entries
-                
-                return all_logs
+            return [
+                {
+                    'type': record['type'],
+                    'content': format_record(record).replace(": ", ":\n", 1),
+                    'line_start': record['line']
+                }
+                for record in self.readRecords(log_type, start_time, end_time, limit)
+            ]
         except Exception as e:
             return []
 
+
 # For backwards compatibility when run as script
 if __name__ == "__main__":
     # Interactive version for command line use
     myLogger = general_logger("logs/run_logs.txt")
-    
+
     # Simple demo of Flask-compatible methods
     print("Flask-compatible autoLogger demo:")
-    
+
     myLogger.addToLogs("Demo output log entry")
     myLogger.addToErrorLogs("Demo error log entry")
     myLogger.addToInputLogs("Demo prompt", "Demo input")
-    
+
     print("Logs added successfully!")
-    
+
     # Show stats
     stats = myLogger.getLogStats()
     print(f"Log stats: {stats}")
-    
+
     # Search demo
     results = myLogger.searchForLogs("demo")
-    print(f"Found {len(results)} results for 'demo'")
\ No newline at end of file
+    print(f"Found {len(results)} results for 'demo'")
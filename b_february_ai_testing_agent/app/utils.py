@@ -2,14 +2,13 @@ import PyPDF2
 from PIL import Image
 import pytesseract
 import os
+import sys
 
-from google import genai
-import google.auth
-
-credentials, project_id = google.auth.default()
-
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client
+from prompt_budget import fit_texts
 
 # Configure pytesseract to use the installed Tesseract executable
 pytesseract.pytesseract.tesseract_cmd = f"{os.path.dirname(__file__)}\\bin\\tesseract"
@@ -40,6 +39,15 @@ def process_files(expected_results, actual_results):
 
 def generate_ai_comparison(project_name, query, expected_results, actual_results, project_description="", context=""):
     # Function to generate an AI comparison based on the user query, expected results, and actual results
+    # The expected and actual results share one budget, so a huge PDF or OCR dump cannot crowd out the other
+    inputs = fit_texts(
+        expected_results=expected_results,
+        actual_results=actual_results,
+        project_description=project_description,
+        context=context
+    )
+    expected_results, actual_results = inputs['expected_results'], inputs['actual_results']
+    project_description, context = inputs['project_description'], inputs['context']
     base_prompt = f"""
     # Software Test Analysis for {project_name}
 
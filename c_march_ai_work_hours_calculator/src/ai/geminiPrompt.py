@@ -1,12 +1,10 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
+import os
+import sys
 
-credentials, project_id = google.auth.default()
-
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client
 
 def generate_work_hours_summary(contracted_hours, work_hours_description):
     """Function to generate an AI summary based on the user query and relevant documents"""
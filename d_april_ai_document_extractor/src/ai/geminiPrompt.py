@@ -1,12 +1,10 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
 import os
-import google.auth
+import sys
 
-credentials, project_id = google.auth.default()
-
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import cached_client
 
 def generate_conversion_insights(file_content, config_options):
     """
@@ -53,14 +51,15 @@ def generate_conversion_insights(file_content, config_options):
     """
     
     try:
-        # Generate AI response using the new Google Gen AI SDK
-        response = client.models.generate_content(
+        # Generate AI response using the new Google Gen AI SDK, the config is passed as a plain
+        # dictionary so it also works with the offline backend
+        response = cached_client.models.generate_content(
             model="gemini-2.5-pro",
             contents=[prompt],
-            config=GenerateContentConfig(
-                max_output_tokens=2048,
-                temperature=0.7
-            )
+            config={
+                'max_output_tokens': 2048,
+                'temperature': 0.7
+            }
         )
         
         ai_summary = response.text
@@ -1,5 +1,5 @@
 from flask import Flask, request, render_template, jsonify, send_file
-from utils.document_processing import handle_document_upload, process_uploaded_file, get_uploaded_documents
+from utils.document_processing import handle_document_upload, process_uploaded_file, get_uploaded_documents, extract_text_within_budget, MAX_INFLIGHT_BYTES
 from utils.forms import ConfigOptionsForm
 from ai.geminiPrompt import generate_conversion_insights
 import os
@@ -109,8 +109,8 @@ def convert():
             if not document_path:
                 return jsonify({'error': 'Selected document not found'}), 404
             
-            # Extract text from the selected document
-            extracted_text = process_uploaded_file(document_path)
+            # Extract text from the selected document, only reading as much of a PDF as the AI insights need
+            extracted_text, ai_input_truncated = extract_text_within_budget(document_path, MAX_INFLIGHT_BYTES)
             
             # Generate AI insights
             ai_processed_info = generate_conversion_insights(extracted_text, config_options)
@@ -126,7 +126,12 @@ def convert():
                 'message': 'File converted successfully', 
                 'file_path': converted_file_path,
                 'ai_summary': ai_processed_info.get('full_summary', 'No AI summary available'),
-                'download_url': f'/download/{os.path.basename(converted_file_path)}'
+                'download_url': f'/download/{os.path.basename(converted_file_path)}',
+                'ai_input_truncated': ai_input_truncated,
+                'ai_input_note': (
+                    f"The AI analysis only covers the first {MAX_INFLIGHT_BYTES // 1024} KB of the document's text. "
+                    "The converted file includes the whole document."
+                ) if ai_input_truncated else None
             })
         except Exception as e:
             return jsonify({'error': f"Error converting file: {str(e)}"}), 500
@@ -4,6 +4,10 @@ import os
 
 search_index = {}
 
+# Upper bound on how much extracted text is held at once when streaming large documents
+MAX_INFLIGHT_BYTES = int(os.environ.get("MAX_INFLIGHT_BYTES", 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 def process_uploaded_file(file_path):
     # Function to process a document based on its file type
     file_type = file_path.split('.')[-1]
@@ -20,14 +24,76 @@ def process_uploaded_file(file_path):
         case _:
             print(f"Unsupported file type: {file_type}")
 
+def extract_text_within_budget(file_path, max_bytes=MAX_INFLIGHT_BYTES):
+    # Function to extract the text of a document for the AI, reading PDFs only as far as max_bytes
+    # Returns (text, truncated) so callers can tell the user when only the start of a PDF was used
+    if file_path.split('.')[-1] != 'pdf':
+        return process_uploaded_file(file_path), False
+    chunks = iter_pdf_chunks(file_path, max_bytes)
+    _, text = next(chunks, (0, ""))
+    truncated = next(chunks, None) is not None
+    return text, truncated
+
 def extract_text_from_pdf(pdf_path):
     # Function to extract text from a PDF file
+    return "".join(text for _, text in iter_pdf_pages(pdf_path))
+
+def iter_pdf_pages(pdf_path):
+    # Generator that extracts a PDF one page at a time, yielding (page_no, text)
     reader = PyPDF2.PdfReader(pdf_path)
-    text = ""
     for page_num in range(len(reader.pages)):
-        page = reader.pages[page_num]
-        text += page.extract_text()
-    return text
+        yield page_num, reader.pages[page_num].extract_text() or ""
+
+def iter_pdf_chunks(pdf_path, max_bytes=MAX_INFLIGHT_BYTES):
+    # Generator that groups PDF pages into chunks of at most max_bytes of text, yielding (first_page_no, text)
+    # Pages bigger than max_bytes on their own are split across several chunks
+    pages = []
+    first_page = 0
+    size = 0
+    for page_num, page_text in iter_pdf_pages(pdf_path):
+        for text in split_text(page_text, max_bytes):
+            text_size = len(text.encode('utf-8'))
+            if pages and size + text_size > max_bytes:
+                yield first_page, "".join(pages)
+                pages = []
+                size = 0
+            if not pages:
+                first_page = page_num
+            pages.append(text)
+            size += text_size
+    if pages:
+        yield first_page, "".join(pages)
+
+def split_text(text, max_bytes=MAX_INFLIGHT_BYTES):
+    # Generator that splits text into pieces of at most max_bytes of UTF-8, breaking on whitespace where it can
+    start = 0
+    while start < len(text):
+        # Every character is at least one byte, so max_bytes characters is the most that can fit
+        end = min(start + max_bytes, len(text))
+        size = len(text[start:end].encode('utf-8'))
+        while size > max_bytes and end - start > 1:
+            end = start + max(1, (end - start) * max_bytes // size)
+            size = len(text[start:end].encode('utf-8'))
+        if end < len(text):
+            split = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+            if split > start:
+                end = split + 1
+        yield text[start:end]
+        start = end
+
+def iter_pdf_paragraphs(pdf_path, max_bytes=MAX_INFLIGHT_BYTES):
+    # Generator that yields the blank-line separated paragraphs of a PDF, joining paragraphs that run
+    # across a chunk boundary so they are not cut in two (unless one paragraph is over max_bytes itself)
+    carry = ""
+    for _, text in iter_pdf_chunks(pdf_path, max_bytes):
+        paragraphs = (carry + text).split('\n\n')
+        carry = paragraphs.pop()
+        yield from paragraphs
+        if len(carry.encode('utf-8')) > max_bytes:
+            yield carry
+            carry = ""
+    if carry:
+        yield carry
 
 def extract_text_from_docx(docx_path):
     # Function to extract text from a DOCX file
@@ -63,41 +129,31 @@ def handle_document_upload(file):
     # Check if the file already exists in the docs folder
     if os.path.exists(file_path):
         print(f"File {file.filename} already exists. Overwriting...")
-    # Save the uploaded file to the docs folder
-    match fileType:
-        case 'pdf':
-            reader = PyPDF2.PdfReader(file)
-            # save the pdf file to the file path using PyPDF2
-            with open(file_path, 'wb') as f:
-                writer = PyPDF2.PdfWriter()
-                for page_num in range(len(reader.pages)):
-                    writer.add_page(reader.pages[page_num])
-                writer.write(f)
-        case 'docx':
-            template = docx.Document()
-            this_file = docx.Document(file)
-            for para in this_file.paragraphs:
-                template.add_paragraph(para.text)
-            for table in this_file.tables:
-                # Get the number of rows and columns from the table
-                rows = len(table.rows)
-                cols = len(table.columns)
-                # Add a table to the template with the same number of rows and columns
-                new_table = template.add_table(rows=rows, cols=cols)
-                # Copy the content of each cell
-                for i in range(rows):
-                    for j in range(cols):
-                        new_table.cell(i, j).text = table.cell(i, j).text
-            template.save(file_path)
-        case 'txt':
-            fileContents = file.readlines()
-            with open(file_path, 'w', encoding='utf-8') as f:
-                for line in fileContents:
-                    f.write(line.decode('utf-8'))
-        case _:
-            print(f"Unsupported file type: {fileType}")
+    # Stream the uploaded file straight to the docs folder, rather than re-building it page by page
+    if fileType not in ('pdf', 'docx', 'txt'):
+        print(f"Unsupported file type: {fileType}")
+        return file_path
+    save_upload_stream(file, file_path)
     return file_path
 
+def save_upload_stream(file, file_path):
+    """Copy an uploaded file to disk in fixed size chunks."""
+    partial_path = file_path + ".part"
+    try:
+        with open(partial_path, 'wb') as f:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+        # Only replace an existing file once the new copy has been fully written
+        os.replace(partial_path, file_path)
+    except Exception:
+        # Don't leave a half written copy behind
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
 def get_uploads_folder():
     """Get the uploads folder path."""
     file_path = os.path.dirname(__file__)
@@ -175,9 +231,11 @@ def convert_to_docx(input_path, output_path, config_dict, ai_info):
         # DOCX to DOCX conversion
         convert_docx_document(input_path, output_path, config_dict, ai_info)
     elif input_extension == '.pdf':
-        # PDF to DOCX conversion
-        text = extract_text_from_pdf(input_path)
-        create_docx_from_text(text, output_path, config_dict, ai_info)
+        # PDF to DOCX conversion, adding the paragraphs as the pages are extracted
+        doc = docx.Document()
+        for para_text in iter_pdf_paragraphs(input_path):
+            add_text_paragraphs(doc, para_text)
+        doc.save(output_path)
     elif input_extension == '.txt':
         # TXT to DOCX conversion
         text = extract_text_from_txt(input_path)
@@ -211,10 +269,10 @@ def convert_to_txt(input_path, output_path, config_dict, ai_info):
         import shutil
         shutil.copy2(input_path, output_path)
     elif input_extension == '.pdf':
-        # PDF to TXT conversion
-        text = extract_text_from_pdf(input_path)
+        # PDF to TXT conversion, writing the pages out as they are extracted
         with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(text)
+            for _, text in iter_pdf_chunks(input_path):
+                f.write(text)
     elif input_extension == '.docx':
         # DOCX to TXT conversion
         text = extract_text_from_docx(input_path)
@@ -226,12 +284,16 @@ def create_docx_from_text(text, output_path, config_dict, ai_info):
     doc = docx.Document()
     
     # Add text to document
+    add_text_paragraphs(doc, text)
+    
+    doc.save(output_path)
+
+def add_text_paragraphs(doc, text):
+    """Add each blank-line separated block of text to a DOCX document as a paragraph."""
     paragraphs = text.split('\n\n')
     for para_text in paragraphs:
         if para_text.strip():
             doc.add_paragraph(para_text.strip())
-    
-    doc.save(output_path)
 
 def convert_docx_document(input_path, output_path, config_dict, ai_info):
     """
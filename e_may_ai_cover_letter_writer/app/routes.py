@@ -4,6 +4,7 @@ from .forms import UploadForm, UserForm, CVForm, JobForm, CoverLetterForm
 from .models import create_connection, create_tables, add_user, add_skill, add_education, add_experience
 from .models import save_cover_letter, get_cover_letter, get_user_cover_letters, find_user_by_email, execute_query
 from .utils import extract_text_from_pdf, generate_cover_letter, refine_cover_letter, extract_cv_structure, model
+from structured_output import extract_json, json_config, StructuredOutputError
 import io
 from docx import Document
 import pdfkit
@@ -501,7 +502,7 @@ def process_text_section():
         print(f"Processing {section_type} with text: {text[:50]}...")
         
         # Process with AI
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, config=json_config())
         print(f"AI response (first 100 chars): {response.text[:100]}...")
         
         result = process_ai_response(response.text, result_key)
@@ -605,71 +606,23 @@ def generate_experience_prompt(text):
     """
 
 def process_ai_response(response_text, result_key):
-    """Process AI response to extract JSON data with enhanced error handling"""
+    """Process AI response to extract the list of items for a CV section"""
     try:
-        import json
-        import re
-        
         # Log the raw response for inspection
         print(f"Raw response to parse: {response_text[:100]}...")
         
-        # Clean up the response first - remove any markdown code blocks or explanations
-        cleaned_response = re.sub(r'```json|```|\n\s*```|\n\s*```json|\n\s*```|\n\s*```', '', response_text)
-        cleaned_response = re.sub(r'^.*?\[', '[', cleaned_response, flags=re.DOTALL)
-        cleaned_response = re.sub(r'\].*?$', ']', cleaned_response, flags=re.DOTALL)
-        
-        # Remove any non-JSON text before or after the JSON content
-        cleaned_response = cleaned_response.strip()
-        
-        # First attempt: direct JSON parsing
-        try:
-            print("Attempting direct JSON parsing")
-            if cleaned_response.startswith('[') and cleaned_response.endswith(']'):
-                return json.loads(cleaned_response)
-            elif cleaned_response.startswith('{') and cleaned_response.endswith('}'):
-                data = json.loads(cleaned_response)
-                if result_key in data:
-                    return data[result_key]
-                else:
-                    # For Gemini responses that contain JSON without the expected key
-                    # Try to intelligently extract the relevant array
-                    for key, value in data.items():
-                        if isinstance(value, list) and len(value) > 0:
-                            return value
-                    return data  # Return the whole object if no lists found
-        except json.JSONDecodeError as e:
-            print(f"Direct JSON parsing failed: {e}")
-            # Continue to regex approaches
-        
-        # Second attempt: find JSON array pattern using regex
-        print("Attempting regex extraction of JSON array")
-        array_pattern = r'\[\s*{.*?}\s*(,\s*{.*?}\s*)*\]'
-        array_match = re.search(array_pattern, cleaned_response, re.DOTALL)
-        if array_match:
-            try:
-                return json.loads(array_match.group(0))
-            except json.JSONDecodeError:
-                print("Array regex extraction failed")
-                # Continue to next approach
-        
-        # Third attempt: extract individual objects and build an array
-        print("Attempting to extract individual objects")
-        objects = re.findall(r'{.*?}', cleaned_response, re.DOTALL)
-        if objects:
-            try:
-                result_array = []
-                for obj_str in objects:
-                    obj = json.loads(obj_str)
-                    result_array.append(obj)
-                return result_array
-            except json.JSONDecodeError:
-                print("Individual object extraction failed")
-                # Continue to next approach
-        
-        print("All parsing attempts failed")
-        return None
-            
-    except Exception as e:
+        # A bare string or number is no use here, so it is rejected like a missing answer
+        data = extract_json(response_text, {'type': ['object', 'array']})
+        if isinstance(data, list):
+            return data
+        if result_key in data:
+            return data[result_key]
+        # For Gemini responses that contain JSON without the expected key, use the first list in it
+        for key, value in data.items():
+            if isinstance(value, list) and len(value) > 0:
+                return value
+        return data  # Return the whole object if no lists found
+    except StructuredOutputError as e:
         print(f"Error processing AI response: {str(e)}")
         return None
 
@@ -1,16 +1,26 @@
-import os
 import PyPDF2
 from PIL import Image
 import pytesseract
 
-import vertexai
-from vertexai.generative_models import GenerativeModel
-import google.auth
+import os
+import sys
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import GeminiModel
+from prompt_budget import fit_texts, fit_to_budget
+from structured_output import extract_json, json_config
 
-# Initialize Google Vertex AI
-credentials, project_id = google.auth.default()
-vertexai.init(project="generalpurposeai", location="us-central1")
-model = GenerativeModel(model_name="gemini-2.0-flash")
+model = GeminiModel("gemini-2.0-flash")
+# Parsing the same CV always gives the same structure, so those responses are cached
+parser_model = GeminiModel("gemini-2.0-flash", cache=True)
+
+CV_STRUCTURE_SCHEMA = {'type': 'object', 'properties': {
+    'skills': {'type': 'array', 'items': {'type': 'object', 'required': ['skill_name']}},
+    'education': {'type': 'array', 'items': {'type': 'object'}},
+    'experience': {'type': 'array', 'items': {'type': 'object'}},
+}}
 
 # Configure pytesseract for text extraction from images
 pytesseract.pytesseract.tesseract_cmd = f"{os.path.dirname(__file__)}\\bin\\tesseract"
@@ -48,6 +58,7 @@ def extract_text_from_image(image_file):
 
 def extract_cv_structure(cv_text):
     """Use Gemini AI to extract structured information from CV text"""
+    cv_text = fit_to_budget(cv_text, label="CV")
     prompt = f"""
     You are a CV parser. Extract structured information from the following CV and return ONLY valid JSON without any additional text, explanations, or markdown formatting:
     
@@ -81,38 +92,20 @@ def extract_cv_structure(cv_text):
     """
     
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
+        response = parser_model.generate_content(prompt, config=json_config())
         
         # Log the raw response for debugging
-        print(f"Raw Gemini response: {response_text[:100]}...")  # Print first 100 chars
-        
-        # Try to find JSON in the response
-        import json
-        import re
+        print(f"Raw Gemini response: {response.text[:100]}...")  # Print first 100 chars
         
-        # First, try direct JSON parsing
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            # If that fails, try to extract JSON using regex
-            json_match = re.search(r'({[\s\S]*})', response_text)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1))
-                except json.JSONDecodeError:
-                    # If regex extraction failed, try cleaning the response
-                    cleaned_text = re.sub(r'```json|```', '', response_text)
-                    return json.loads(cleaned_text)
-            else:
-                print("No JSON found in response")
-                return None
+        return extract_json(response.text, CV_STRUCTURE_SCHEMA)
     except Exception as e:
         print(f"Error in extract_cv_structure: {str(e)}")
         return None
 
 def generate_cover_letter(cv_text, job_description, tone="professional", focus_areas=None):
     """Generate a cover letter using Gemini AI based on CV and job description"""
+    inputs = fit_texts(cv=cv_text, job_description=job_description)
+    cv_text, job_description = inputs['cv'], inputs['job_description']
     prompt = f"""
     Generate a professional cover letter based on the following:
     
@@ -10,15 +10,25 @@ from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
 
-# Import Vertex AI libraries
-import vertexai
-from vertexai.generative_models import GenerativeModel
-import google.auth
+import sys
 
-# Initialize Google Vertex AI
-credentials, project_id = google.auth.default()
-vertexai.init(project="generalpurposeai", location="us-central1")
-model = GenerativeModel(model_name="gemini-2.0-flash")
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import GeminiModel
+from structured_output import extract_json, json_config
+
+model = GeminiModel("gemini-2.0-flash")
+# Analysing the same job description always gives the same answer, so those responses are cached
+analysis_model = GeminiModel("gemini-2.0-flash", cache=True)
+
+STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+JOB_DESCRIPTION_SCHEMA = {'type': 'object', 'properties': {
+    'role_title': {'type': 'string'},
+    'required_skills': STRING_LIST,
+    'preferred_skills': STRING_LIST,
+    'responsibilities': STRING_LIST,
+}}
 
 def extract_text_from_pdf(pdf_file):
     """Extract text content from an uploaded PDF file"""
@@ -162,29 +172,8 @@ def analyze_job_description(job_description_text):
     """
     
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # Try to find JSON in the response
-        import json
-        import re
-        
-        # First, try direct JSON parsing
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            # If that fails, try to extract JSON using regex
-            json_match = re.search(r'({[\s\S]*})', response_text)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1))
-                except json.JSONDecodeError:
-                    # If regex extraction failed, try cleaning the response
-                    cleaned_text = re.sub(r'```json|```', '', response_text)
-                    return json.loads(cleaned_text)
-            else:
-                print("No JSON found in response")
-                return None
+        response = analysis_model.generate_content(prompt, config=json_config())
+        return extract_json(response.text, JOB_DESCRIPTION_SCHEMA)
     except Exception as e:
         print(f"Error analyzing job description: {str(e)}")
         return None
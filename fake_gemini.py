@@ -0,0 +1,174 @@
+# An offline stand-in for the Gemini client, used when GEMINI_BACKEND=fake.
+# It answers with canned or templated text after a configurable delay, and can
+# fail a share of calls with errors or 429s, so the hub can be load tested and
+# each app's own overhead benchmarked without network access or credentials.
+
+import json
+import os
+import random
+import re
+import threading
+import time
+from string import Template
+
+FAKE_LATENCY_MS = float(os.environ.get("FAKE_GEMINI_LATENCY_MS", 300))
+FAKE_LATENCY_JITTER_MS = float(os.environ.get("FAKE_GEMINI_LATENCY_JITTER_MS", 100))
+# fixed, uniform, normal or lognormal
+FAKE_LATENCY_DISTRIBUTION = os.environ.get("FAKE_GEMINI_LATENCY_DISTRIBUTION", "normal")
+FAKE_ERROR_RATE = float(os.environ.get("FAKE_GEMINI_ERROR_RATE", 0.0))
+FAKE_RATE_LIMIT_RATE = float(os.environ.get("FAKE_GEMINI_RATE_LIMIT_RATE", 0.0))
+FAKE_RESPONSES_PATH = os.environ.get("FAKE_GEMINI_RESPONSES")
+FAKE_SEED = os.environ.get("FAKE_GEMINI_SEED")
+# Words per chunk when a response is streamed
+FAKE_STREAM_CHUNK_WORDS = int(os.environ.get("FAKE_GEMINI_STREAM_CHUNK_WORDS", 8))
+
+DEFAULT_TEMPLATE = "Offline response from $model to a prompt of $prompt_words words.\n\n$excerpt"
+
+
+class FakeAPIError(Exception):
+    """An injected failure, shaped like the SDK's APIError so callers handle it the same way"""
+
+    def __init__(self, code, status, message):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.message = message
+
+
+class FakeResponse:
+    """A response with .text, like a genai GenerateContentResponse"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def load_responses(path):
+    """
+    Load canned responses from a JSON file.
+
+    The file holds a list of {"match": regex, "response": template} objects, tried in order
+    against the prompt. Templates may use $model, $prompt, $prompt_chars, $prompt_words and $excerpt.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    return [(re.compile(entry.get('match', ''), re.IGNORECASE | re.DOTALL), entry['response']) for entry in entries]
+
+
+def prompt_text(contents):
+    """Join the text parts of a request, ignoring images and other parts"""
+    if isinstance(contents, str):
+        contents = [contents]
+    return "\n".join(part for part in contents if isinstance(part, str))
+
+
+class FakeModels:
+    """The models API of the fake client"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        self.backend.wait()
+        self.backend.maybe_fail()
+        return FakeResponse(self.backend.respond(model, contents))
+
+    def generate_content_stream(self, model, contents, config=None, **kwargs):
+        """Yield the response a few words at a time, spreading the latency across the chunks"""
+        self.backend.maybe_fail()
+        words = self.backend.respond(model, contents).split(" ")
+        chunks = [
+            " ".join(words[i:i + FAKE_STREAM_CHUNK_WORDS]) + ("" if i + FAKE_STREAM_CHUNK_WORDS >= len(words) else " ")
+            for i in range(0, len(words), FAKE_STREAM_CHUNK_WORDS)
+        ]
+        for chunk in chunks:
+            self.backend.wait(len(chunks))
+            yield FakeResponse(chunk)
+
+    def get(self, model):
+        return FakeModel(self, model)
+
+
+class FakeModel:
+    """A single named model, as returned by client.models.get"""
+
+    def __init__(self, models, model):
+        self.models = models
+        self.model = model
+
+    def generate_content(self, contents, **kwargs):
+        return self.models.generate_content(model=self.model, contents=contents, **kwargs)
+
+
+class FakeClient:
+    """
+    Stand-in for genai.Client with the same models API, for load tests and offline benchmarks.
+
+    Parameters:
+    latency_ms (float): Mean delay of a call in milliseconds.
+    jitter_ms (float): Spread of the delay, the half range, standard deviation or lognormal spread.
+    distribution (str): fixed, uniform, normal or lognormal.
+    error_rate (float): Share of calls that fail with a 500 error.
+    rate_limit_rate (float): Share of calls that fail with a 429 RESOURCE_EXHAUSTED error.
+    responses (list): Canned (compiled regex, template) pairs, tried in order.
+    seed: Seed for the delays and failures, so runs can be repeated.
+    """
+
+    def __init__(self, latency_ms=FAKE_LATENCY_MS, jitter_ms=FAKE_LATENCY_JITTER_MS,
+                 distribution=FAKE_LATENCY_DISTRIBUTION, error_rate=FAKE_ERROR_RATE,
+                 rate_limit_rate=FAKE_RATE_LIMIT_RATE, responses=None, seed=FAKE_SEED):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        if responses is None:
+            responses = load_responses(FAKE_RESPONSES_PATH) if FAKE_RESPONSES_PATH else []
+        self.responses = responses
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.models = FakeModels(self)
+
+    def delay(self):
+        """Draw the delay of one call in seconds from the configured distribution"""
+        with self.lock:
+            if self.distribution == "fixed":
+                delay = self.latency_ms
+            elif self.distribution == "uniform":
+                delay = self.random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+            elif self.distribution == "lognormal":
+                # Median at latency_ms with a long tail, jitter_ms relative to the median sets its spread
+                sigma = self.jitter_ms / self.latency_ms if self.latency_ms else 0.0
+                delay = self.latency_ms * self.random.lognormvariate(0, sigma)
+            else:
+                delay = self.random.gauss(self.latency_ms, self.jitter_ms)
+        return max(0.0, delay) / 1000
+
+    def wait(self, parts=1):
+        time.sleep(self.delay() / parts)
+
+    def maybe_fail(self):
+        """Raise an injected error for the configured share of calls"""
+        with self.lock:
+            self.calls += 1
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED", "Injected rate limit error from the offline Gemini backend")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeAPIError(500, "INTERNAL", "Injected error from the offline Gemini backend")
+
+    def respond(self, model, contents):
+        """Pick the first canned response whose pattern matches the prompt, or the default template"""
+        prompt = prompt_text(contents)
+        template = DEFAULT_TEMPLATE
+        for pattern, response in self.responses:
+            if pattern.search(prompt):
+                template = response
+                break
+        return Template(template).safe_substitute(
+            model=model,
+            prompt=prompt,
+            prompt_chars=len(prompt),
+            prompt_words=len(prompt.split()),
+            excerpt=" ".join(prompt.split()[:40]),
+        )
@@ -1,15 +1,13 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
+import os
+import sys
 
-credentials, project_id = google.auth.default()
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client, iter_text
 
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
-
-def generate_transcript_summary(transcript, summary_type):
-    """Generate an AI summary of the transcript based on type"""
+def build_transcript_summary_prompt(transcript, summary_type):
+    """Build the summary prompt for a transcript based on type"""
     
     if summary_type == "meeting":
         prompt = f"""
@@ -92,6 +90,11 @@ def generate_transcript_summary(transcript, summary_type):
         
         Include the main topics, key points, and any important conclusions.
         """
+    return prompt
+
+def generate_transcript_summary(transcript, summary_type):
+    """Generate an AI summary of the transcript based on type"""
+    prompt = build_transcript_summary_prompt(transcript, summary_type)
     
     try:
         response = client.models.generate_content(
@@ -102,6 +105,18 @@ def generate_transcript_summary(transcript, summary_type):
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
+def stream_transcript_summary(transcript, summary_type):
+    """Generate an AI summary of the transcript, yielding the text as it arrives"""
+    prompt = build_transcript_summary_prompt(transcript, summary_type)
+    
+    try:
+        yield from iter_text(client.models.generate_content_stream(
+            model="gemini-2.0-flash",
+            contents=[prompt]
+        ))
+    except Exception as e:
+        yield f"Error generating summary: {str(e)}"
+
 def generate_voice_command_response(command):
     """Generate AI response to voice commands"""
     
@@ -1,11 +1,12 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import os
 import json
 from datetime import datetime
 from utils.voice_methods import VoiceMethods
 from utils.forms import SpeechToTextForm
-from ai.geminiPrompt import generate_transcript_summary, generate_voice_command_response
+from ai.geminiPrompt import generate_transcript_summary, stream_transcript_summary, generate_voice_command_response
+from gemini_client import sse_event
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
@@ -406,6 +407,32 @@ def upload_audio():
         traceback.print_exc()
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/summarize-transcript', methods=['POST'])
+def summarize_transcript():
+    """Stream a summary of a saved transcript as Server-Sent Events"""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+    summary_type = data.get('summary_type', 'conversation')
+    
+    if session_id not in transcript_sessions:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    session_data = transcript_sessions[session_id]
+    
+    def generate():
+        parts = []
+        for text in stream_transcript_summary(session_data['transcript'], summary_type):
+            parts.append(text)
+            yield sse_event({'text': text})
+        session_data['summary'] = "".join(parts)
+        yield sse_event({'success': True, 'session_id': session_id}, event='done')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/get-session/<session_id>', methods=['GET'])
 def get_session(session_id):
     """Get specific session data"""
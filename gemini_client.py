@@ -0,0 +1,302 @@
+# A shared, lazily created Gemini client for every app in the hub.
+# Nothing is imported from Google and no credentials are looked up until the
+# first real AI call or availability check, so importing an app module stays cheap.
+# Set GEMINI_BACKEND=fake to use the offline stand-in in fake_gemini.py instead.
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_metrics import get_metrics, find_caller, usage_tokens, CACHE_HIT, CACHE_MISS, UNCACHED
+from ai_scheduler import get_scheduler, estimate_prompt_tokens, INTERACTIVE, NORMAL, BATCH
+from llm_cache import get_response_cache, CachedResponse
+from model_router import get_router
+
+GEMINI_PROJECT = os.environ.get("GEMINI_PROJECT", "generalpurposeai")
+GEMINI_LOCATION = os.environ.get("GEMINI_LOCATION", "us-central1")
+# vertex for the real API, fake for canned offline responses
+GEMINI_BACKEND = os.environ.get("GEMINI_BACKEND", "vertex")
+# Most model calls that can be in flight at once from one process
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", 8))
+GATEWAY_THREAD_PREFIX = "gemini-gateway"
+
+_client = None
+_client_lock = threading.Lock()
+_available = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def create_vertex_client():
+    import google.auth
+    from google import genai
+
+    google.auth.default()
+    return genai.Client(vertexai=True, project=GEMINI_PROJECT, location=GEMINI_LOCATION)
+
+
+def create_fake_client():
+    from fake_gemini import FakeClient
+
+    return FakeClient()
+
+
+BACKENDS = {
+    'vertex': create_vertex_client,
+    'fake': create_fake_client,
+}
+
+
+def get_client():
+    """Return the process wide client for the configured backend, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if GEMINI_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown GEMINI_BACKEND {GEMINI_BACKEND!r}, expected one of {', '.join(BACKENDS)}")
+                _client = BACKENDS[GEMINI_BACKEND]()
+    return _client
+
+
+def set_client(new_client):
+    """Replace the shared client, e.g. with a FakeClient configured by a load test"""
+    global _client, _available
+    with _client_lock:
+        _client = new_client
+        _available = None
+
+
+def gemini_available():
+    """
+    Check whether AI calls can be made, by creating the shared client the first time this is asked.
+    That looks up the credentials as well as the SDK, and the answer is remembered, so only the
+    first check does any work.
+    """
+    global _available
+    if _available is None:
+        try:
+            get_client()
+            _available = True
+        except Exception as e:
+            print(f"Gemini is not available: {str(e)}")
+            _available = False
+    return _available
+
+
+class ScheduledModels:
+    """
+    The models API of the shared client, with every generate_content call routed to a model by the
+    model router, admitted by the scheduler and recorded in the shared metrics.
+
+    generate_content takes three extra keyword arguments: priority (INTERACTIVE, NORMAL or BATCH),
+    deadline (a time.monotonic() value by which the call has to start) and slo_ms (a latency target
+    the router uses to pick the model).
+    """
+
+    def __init__(self, models):
+        self.models = models
+
+    def generate_content(self, model, contents, priority=None, deadline=None, slo_ms=None,
+                         cache_status=UNCACHED, routed=False, **kwargs):
+        app, caller = find_caller()
+        if not routed:
+            model, priority = route_call(model, contents, app, caller, priority, slo_ms)
+        start = time.perf_counter()
+        try:
+            response = get_scheduler().call(
+                model,
+                lambda: self.models.generate_content(model=model, contents=contents, **kwargs),
+                self._estimate_tokens(contents, kwargs), priority, deadline,
+            )
+        except Exception as e:
+            record_call(app, caller, model, contents, None, start, cache_status, error=e)
+            raise
+        record_call(app, caller, model, contents, response, start, cache_status)
+        return response
+
+    def generate_content_stream(self, model, contents, priority=None, deadline=None, slo_ms=None,
+                                cache_status=UNCACHED, routed=False, **kwargs):
+        """
+        Stream a response chunk by chunk once the scheduler admits the call.
+
+        The first chunk is fetched inside the scheduler, so a rate limit error when the stream opens
+        is retried like any other call. Nothing is retried once text has been sent on.
+        """
+        app, caller = find_caller()
+        if not routed:
+            model, priority = route_call(model, contents, app, caller, priority, slo_ms, streaming=True)
+        start = time.perf_counter()
+
+        def open_stream():
+            stream = iter(self.models.generate_content_stream(model=model, contents=contents, **kwargs))
+            return stream, next(stream, None)
+
+        parts = []
+        last_chunk = None
+        try:
+            stream, first_chunk = get_scheduler().call(
+                model, open_stream, self._estimate_tokens(contents, kwargs), priority, deadline,
+            )
+            if first_chunk is not None:
+                for chunk in itertools.chain([first_chunk], stream):
+                    parts.append(getattr(chunk, "text", None) or "")
+                    last_chunk = chunk
+                    yield chunk
+        except Exception as e:
+            record_call(app, caller, model, contents, last_chunk, start, cache_status, "".join(parts), error=e)
+            raise
+        # The last chunk carries the usage metadata for the whole response
+        record_call(app, caller, model, contents, last_chunk, start, cache_status, "".join(parts))
+
+    def _estimate_tokens(self, contents, kwargs):
+        config = kwargs.get('config')
+        if isinstance(config, dict):
+            max_output_tokens = config.get('max_output_tokens')
+        else:
+            max_output_tokens = getattr(config, 'max_output_tokens', None)
+        return estimate_prompt_tokens(contents) + (max_output_tokens or 0)
+
+    def __getattr__(self, name):
+        return getattr(self.models, name)
+
+
+class LazyClient:
+    """Stand-in for a genai.Client that creates the shared client the first time it is used"""
+
+    def __getattr__(self, name):
+        if name == "models":
+            return ScheduledModels(get_client().models)
+        return getattr(get_client(), name)
+
+
+def route_call(model, contents, app, caller, priority=None, slo_ms=None, streaming=False):
+    """Return the model and priority the router picks for a call"""
+    return get_router().route(model, app, caller, priority, estimate_prompt_tokens(contents), slo_ms, streaming)
+
+
+def record_call(app, caller, model, contents, response, start, cache_status, output_text=None, error=None):
+    """Record a model call in the shared metrics, start being its time.perf_counter() start time"""
+    input_tokens, output_tokens = usage_tokens(response, contents, output_text)
+    get_metrics().record(
+        app, caller, model, input_tokens, output_tokens,
+        (time.perf_counter() - start) * 1000, cache_status, error,
+    )
+
+
+class CachedModels:
+    """The models API of the shared client, answering generate_content from the response cache when it can"""
+
+    def generate_content(self, model, contents, config=None, priority=None, slo_ms=None, **kwargs):
+        app, caller = find_caller()
+        # Routed before the lookup, so responses are cached against the model that gave them
+        model, priority = route_call(model, contents, app, caller, priority, slo_ms)
+        start = time.perf_counter()
+        # The lazy client is passed so a cache hit never has to create the real one, and a miss is
+        # recorded as such when the scheduled call is made
+        response = get_response_cache().generate_content(
+            client, model, contents, config, priority=priority, cache_status=CACHE_MISS, routed=True, **kwargs
+        )
+        if isinstance(response, CachedResponse):
+            record_call(app, caller, model, contents, response, start, CACHE_HIT)
+        return response
+
+    def generate_content_stream(self, model, contents, config=None, priority=None, slo_ms=None, **kwargs):
+        app, caller = find_caller()
+        model, priority = route_call(model, contents, app, caller, priority, slo_ms, streaming=True)
+        start = time.perf_counter()
+        for chunk in get_response_cache().generate_content_stream(
+            client, model, contents, config, priority=priority, cache_status=CACHE_MISS, routed=True, **kwargs
+        ):
+            if isinstance(chunk, CachedResponse):
+                record_call(app, caller, model, contents, chunk, start, CACHE_HIT)
+            yield chunk
+
+
+class CachedClient(LazyClient):
+    """
+    Like LazyClient, but repeated text prompts with the same model and config are served from the
+    shared response cache. Only use it for calls where the same input should give the same answer.
+    """
+
+    models = CachedModels()
+
+
+class GeminiModel:
+    """
+    A named Gemini model on the shared client, for code written against vertexai's GenerativeModel.
+
+    Only generate_content is needed by the apps, and it returns a response with .text like before.
+    With cache=True responses come from the shared response cache when the same prompt is repeated.
+    """
+
+    def __init__(self, model_name, cache=False):
+        self.model_name = model_name
+        self.client = cached_client if cache else client
+
+    def generate_content(self, contents, **kwargs):
+        if not isinstance(contents, list):
+            contents = [contents]
+        return self.client.models.generate_content(model=self.model_name, contents=contents, **kwargs)
+
+
+def get_executor():
+    """Return the thread pool model calls are fanned out on, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix=GATEWAY_THREAD_PREFIX)
+        return _executor
+
+
+def _in_gateway_thread():
+    return threading.current_thread().name.startswith(GATEWAY_THREAD_PREFIX)
+
+
+def run_concurrently(*calls):
+    """
+    Run independent model calls at the same time and return their results in order.
+
+    Each call is a function that takes no arguments, e.g. functools.partial(generate_summary, text).
+    The calls spend nearly all of their time waiting on the network, so threads are enough to make
+    the total time close to that of the slowest call. If a call raises, the exception is re-raised
+    once every call has finished.
+
+    Calls made from inside the pool run one after another, so nested fan-outs cannot deadlock it.
+    """
+    if len(calls) <= 1 or _in_gateway_thread():
+        return [call() for call in calls]
+    futures = [get_executor().submit(call) for call in calls]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [future.result() for future in futures]
+
+
+async def gather_async(*calls):
+    """Async version of run_concurrently, for code already running in an event loop"""
+    loop = asyncio.get_running_loop()
+    return list(await asyncio.gather(*(loop.run_in_executor(get_executor(), call) for call in calls)))
+
+
+def iter_text(stream):
+    """Yield the text of each chunk of a streamed response, skipping chunks without any"""
+    for chunk in stream:
+        text = getattr(chunk, "text", None)
+        if text:
+            yield text
+
+
+def sse_event(data, event=None):
+    """Format data (anything JSON serialisable) as a Server-Sent Events message"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+client = LazyClient()
+cached_client = CachedClient()
@@ -1,14 +1,32 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
 import json
-import re
 from datetime import datetime, timedelta
+import os
+import sys
 
-# Initialize Google Auth and Client
-credentials, project_id = google.auth.default()
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client
+from structured_output import extract_json, json_config
+
+# Shapes of the JSON answers, checked before they are used
+EMAIL_REQUEST_SCHEMA = {'type': 'object', 'required': ['action'], 'properties': {
+    'action': {'type': 'string'},
+    'attendees': {'type': 'array', 'items': {'type': 'string'}},
+    'confidence': {'type': 'number'},
+}}
+COMMAND_SCHEMA = {'type': 'object', 'required': ['intent'], 'properties': {
+    'intent': {'type': 'string'},
+    'confidence': {'type': 'number'},
+}}
+SUGGESTIONS_SCHEMA = {'type': 'object', 'required': ['suggestions'], 'properties': {
+    'suggestions': {'type': 'array', 'items': {'type': 'object'}},
+}}
+CONFLICTS_SCHEMA = {'type': 'object', 'required': ['has_conflicts'], 'properties': {
+    'has_conflicts': {'type': 'boolean'},
+    'conflicts': {'type': 'array', 'items': {'type': 'object'}},
+    'suggestions': {'type': 'array', 'items': {'type': 'object'}},
+}}
 
 class AICommandParser:
     def __init__(self):
@@ -44,11 +62,10 @@ class AICommandParser:
         try:
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                config=json_config()
             )
-            # Clean and parse JSON response
-            json_text = self._extract_json(response.text)
-            return json.loads(json_text)
+            return extract_json(response.text, EMAIL_REQUEST_SCHEMA)
         except Exception as e:
             print(f"Error parsing email: {str(e)}")
             return {"action": "unknown", "confidence": 0.0}
@@ -79,10 +96,10 @@ class AICommandParser:
         try:
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                config=json_config()
             )
-            json_text = self._extract_json(response.text)
-            return json.loads(json_text)
+            return extract_json(response.text, COMMAND_SCHEMA)
         except Exception as e:
             print(f"Error parsing voice command: {str(e)}")
             return {"intent": "unknown", "confidence": 0.0}
@@ -116,10 +133,10 @@ class AICommandParser:
         try:
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                config=json_config()
             )
-            json_text = self._extract_json(response.text)
-            return json.loads(json_text)
+            return extract_json(response.text, SUGGESTIONS_SCHEMA)
         except Exception as e:
             print(f"Error suggesting meeting times: {str(e)}")
             return {"suggestions": []}
@@ -205,10 +222,10 @@ class AICommandParser:
         try:
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                config=json_config()
             )
-            json_text = self._extract_json(response.text)
-            return json.loads(json_text)
+            return extract_json(response.text, COMMAND_SCHEMA)
         except Exception as e:
             print(f"Error parsing natural language: {str(e)}")
             return {"intent": "unknown", "confidence": 0.0}
@@ -276,25 +293,14 @@ class AICommandParser:
         try:
             response = self.client.models.generate_content(
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                config=json_config()
             )
-            json_text = self._extract_json(response.text)
-            return json.loads(json_text)
+            return extract_json(response.text, CONFLICTS_SCHEMA)
         except Exception as e:
             print(f"Error analyzing conflicts: {str(e)}")
             return {"has_conflicts": False, "conflicts": [], "suggestions": []}
     
-    def _extract_json(self, text):
-        """Extract JSON from AI response"""
-        # Try to find JSON in the response
-        json_match = re.search(r'({[\s\S]*})', text)
-        if json_match:
-            return json_match.group(1)
-        else:
-            # If no JSON found, try cleaning the response
-            cleaned = re.sub(r'```json|```', '', text).strip()
-            return cleaned
-
 # Additional utility functions for calendar AI features
 def format_ai_response_for_user(ai_response, response_type="general"):
     """Format AI responses for better user presentation"""
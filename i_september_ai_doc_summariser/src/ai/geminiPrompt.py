@@ -1,15 +1,16 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
+import os
+import sys
 
-credentials, project_id = google.auth.default()
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client, cached_client, iter_text
+from prompt_budget import fit_to_budget, fit_texts
 
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
-
-def generate_document_summary(document_text, summary_type, summary_length, summary_tone):
-    """Generate an AI summary of the document based on specifications"""
+def build_summary_prompt(document_text, summary_type, summary_length, summary_tone):
+    """Build the summary prompt for a document based on specifications"""
+    # Very long documents are sampled or summarised in parts first, so the prompt stays within budget
+    document_text = fit_to_budget(document_text)
     
     # Build the prompt based on summary type
     if summary_type == "academic":
@@ -151,9 +152,14 @@ def generate_document_summary(document_text, summary_type, summary_length, summa
     
     Ensure the summary captures the essence of the document while being {summary_tone} in tone and {summary_length} in length.
     """
+    return full_prompt
+
+def generate_document_summary(document_text, summary_type, summary_length, summary_tone):
+    """Generate an AI summary of the document based on specifications"""
+    full_prompt = build_summary_prompt(document_text, summary_type, summary_length, summary_tone)
     
     try:
-        response = client.models.generate_content(
+        response = cached_client.models.generate_content(
             model="gemini-2.0-flash",
             contents=[full_prompt]
         )
@@ -161,8 +167,21 @@ def generate_document_summary(document_text, summary_type, summary_length, summa
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
+def stream_document_summary(document_text, summary_type, summary_length, summary_tone):
+    """Generate an AI summary of the document, yielding the text as it arrives"""
+    full_prompt = build_summary_prompt(document_text, summary_type, summary_length, summary_tone)
+    
+    try:
+        yield from iter_text(cached_client.models.generate_content_stream(
+            model="gemini-2.0-flash",
+            contents=[full_prompt]
+        ))
+    except Exception as e:
+        yield f"Error generating summary: {str(e)}"
+
 def analyze_document_content(document_text):
     """Analyze document content for deeper insights"""
+    document_text = fit_to_budget(document_text)
     
     prompt = f"""
     Please analyze the following document and provide detailed insights:
@@ -183,7 +202,7 @@ def analyze_document_content(document_text):
     """
     
     try:
-        response = client.models.generate_content(
+        response = cached_client.models.generate_content(
             model="gemini-2.0-flash",
             contents=[prompt]
         )
@@ -193,6 +212,7 @@ def analyze_document_content(document_text):
 
 def extract_key_information(document_text, focus_areas=None):
     """Extract specific information based on focus areas"""
+    document_text = fit_to_budget(document_text)
     
     if focus_areas:
         prompt = f"""
@@ -228,6 +248,8 @@ def extract_key_information(document_text, focus_areas=None):
 
 def generate_comparative_analysis(doc1_text, doc2_text):
     """Compare two documents and highlight differences/similarities"""
+    documents = fit_texts(doc1=doc1_text, doc2=doc2_text)
+    doc1_text, doc2_text = documents['doc1'], documents['doc2']
     
     prompt = f"""
     Please compare and analyze the following two documents:
@@ -258,6 +280,7 @@ def generate_comparative_analysis(doc1_text, doc2_text):
 
 def generate_questions_from_document(document_text):
     """Generate relevant questions that the document answers or raises"""
+    document_text = fit_to_budget(document_text)
     
     prompt = f"""
     Based on the following document, please generate:
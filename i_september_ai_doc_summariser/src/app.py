@@ -1,11 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import os
 import json
 from datetime import datetime
 from utils.document_processor import DocumentProcessor
 from utils.forms import DocumentSummaryForm
-from ai.geminiPrompt import generate_document_summary, analyze_document_content
+from ai.geminiPrompt import generate_document_summary, stream_document_summary, analyze_document_content
+from gemini_client import run_concurrently, sse_event
+from prompt_budget import fit_to_budget
+from functools import partial
 import markdown
 
 app = Flask(__name__)
@@ -172,6 +175,28 @@ def regenerate_summary():
         
         session_data = document_sessions[session_id]
         document_text = session_data['document_text']
+        settings = {
+            'type': summary_type,
+            'length': summary_length,
+            'tone': summary_tone
+        }
+        
+        if data.get('stream'):
+            # Send the summary as Server-Sent Events while it is being written
+            def generate():
+                parts = []
+                for text in stream_document_summary(document_text, summary_type, summary_length, summary_tone):
+                    parts.append(text)
+                    yield sse_event({'text': text})
+                session_data['summary'] = "".join(parts)
+                session_data['summary_settings'] = settings
+                yield sse_event({'success': True, 'settings': settings}, event='done')
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
         
         # Generate new summary
         new_summary = generate_document_summary(document_text, summary_type, summary_length, summary_tone)
@@ -230,21 +255,25 @@ def compare_summaries():
             return jsonify({'error': 'Session not found'}), 404
         
         session_data = document_sessions[session_id]
-        document_text = session_data['document_text']
-        
-        # Generate two different summaries
-        summary1 = generate_document_summary(
-            document_text,
-            settings1.get('type', 'general'),
-            settings1.get('length', 'medium'),
-            settings1.get('tone', 'neutral')
-        )
-        
-        summary2 = generate_document_summary(
-            document_text,
-            settings2.get('type', 'academic'),
-            settings2.get('length', 'long'),
-            settings2.get('tone', 'formal')
+        # Fitted once here, so the two summaries below don't each summarise a long document
+        document_text = fit_to_budget(session_data['document_text'])
+        
+        # Generate two different summaries at the same time
+        summary1, summary2 = run_concurrently(
+            partial(
+                generate_document_summary,
+                document_text,
+                settings1.get('type', 'general'),
+                settings1.get('length', 'medium'),
+                settings1.get('tone', 'neutral')
+            ),
+            partial(
+                generate_document_summary,
+                document_text,
+                settings2.get('type', 'academic'),
+                settings2.get('length', 'long'),
+                settings2.get('tone', 'formal')
+            )
         )
         
         return jsonify({
@@ -710,48 +710,17 @@ def register_routes(app):
                 return redirect(url_for('logs_page'))
             
             search_logger = general_logger(log_file_path)
-            results = []
-            
-            # Perform search based on log type
-            if log_type == 'output':
-                results = search_logger.searchForLogs(search_term)
-            elif log_type == 'error':
-                results = search_logger.searchForErrors(search_term)
-            elif log_type == 'input':
-                results = search_logger.searchForInputs(search_term)
-            else:  # all types
-                # Search all types and combine results
-                output_results = search_logger.searchForLogs(search_term)
-                error_results = search_logger.searchForErrors(search_term)
-                input_results = search_logger.searchForInputs(search_term)
-                
-                results = []
-                if output_results:
-                    results.extend([{'type': 'Output', 'content': r} for r in output_results])
-                if error_results:
-                    results.extend([{'type': 'Error', 'content': r} for r in error_results])
-                if input_results:
-                    results.extend([{'type': 'Input', 'content': r} for r in input_results])
-            
-            # If narrow_search is provided, filter results further
-            if narrow_search and results:
-                if isinstance(results[0], dict):  # Combined results format
-                    filtered_results = []
-                    for result in results:
-                        if narrow_search.lower() in result['content'].lower():
-                            filtered_results.append(result)
-                    results = filtered_results
-                else:  # Single type results format
-                    filtered_results = []
-                    for result in results:
-                        if narrow_search.lower() in result.lower():
-                            filtered_results.append(result)
-                    results = filtered_results
-            
-            # Format results for display
-            if results and not isinstance(results[0], dict):
-                # Convert to uniform format
-                results = [{'type': log_type.title(), 'content': r} for r in results]
+            
+            # One lookup in the log's full-text index covers the type filter and narrow search
+            type_labels = {'output': 'Output', 'error': 'Error', 'input': 'Input'}
+            results = [
+                {'type': type_labels[result['type']], 'content': result['content']}
+                for result in search_logger.searchLogs(
+                    search_term,
+                    log_type if log_type in type_labels else None,
+                    narrow_search or None
+                )
+            ]
             
             logger.addToLogs(f"Log search completed: {len(results)} results found for '{search_term}' in {log_file}")
             
@@ -1,10 +1,13 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
 import json
-import os
 import datetime
+import os
+import sys
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client, gemini_available, BATCH
+from prompt_budget import fit_texts
 
 # Remove the autoLogger import section and replace with:
 try:
@@ -22,16 +25,6 @@ except ImportError:
         def addToInputLogs(self, prompt, msg): print(f"[INPUT] {prompt}: {msg}")
     general_logger = DummyLogger
 
-# Initialize Google Auth and Client
-try:
-    credentials, project_id = google.auth.default()
-    client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
-    AI_AVAILABLE = True
-except Exception as e:
-    print(f"AI services not available: {e}")
-    AI_AVAILABLE = False
-    client = None
-
 class AISummarizer:
     def __init__(self):
         # Initialize logger
@@ -39,9 +32,10 @@ class AISummarizer:
         os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
         self.logger = general_logger(log_file_path)
         
-        self.client = client
+        # Creating the shared client checks the SDK and credentials, without them we fall back to basic insights
+        self.ai_available = gemini_available()
+        self.client = client if self.ai_available else None
         self.model_name = "gemini-2.0-flash"
-        self.ai_available = AI_AVAILABLE
         
         if self.ai_available:
             self.logger.addToLogs("AISummarizer initialized with Google GenAI")
@@ -126,6 +120,7 @@ class AISummarizer:
         try:
             self.logger.addToLogs("Sending request to Google GenAI")
             response = self.client.models.generate_content(
+                priority=BATCH,
                 model=self.model_name,
                 contents=[prompt]
             )
@@ -165,6 +160,7 @@ class AISummarizer:
         try:
             self.logger.addToLogs("Generating template matching summary with AI")
             response = self.client.models.generate_content(
+                priority=BATCH,
                 model=self.model_name,
                 contents=[prompt]
             )
@@ -204,6 +200,7 @@ class AISummarizer:
         
         try:
             response = self.client.models.generate_content(
+                priority=BATCH,
                 model=self.model_name,
                 contents=[prompt]
             )
@@ -246,6 +243,7 @@ class AISummarizer:
         
         try:
             response = self.client.models.generate_content(
+                priority=BATCH,
                 model=self.model_name,
                 contents=[prompt]
             )
@@ -422,6 +420,15 @@ class AISummarizer:
         # Prepare template analysis summary for AI
         template_summary = self._prepare_template_summary(template_analysis, template_statistics)
         
+        # These grow with the size of the directory, so they share one budget and are sampled if too large
+        sections = fit_texts(
+            summarise=False,
+            file_types=json.dumps(analysis_result.get('file_type_categories', {}), indent=2),
+            content_by_type=json.dumps(content_analysis.get('content_by_type', {}), indent=2),
+            template_summary=template_summary
+        )
+        template_summary = sections['template_summary']
+        
         prompt = f"""
         Analyze this directory comprehensively, focusing on CONTENT, FILES, ORGANIZATION, and TEMPLATE USAGE:
         
@@ -429,13 +436,13 @@ class AISummarizer:
         **File Inventory:**
         - Total Files: {total_files}
         - Total Size: {self._format_size(total_size)}
-        - File Types: {json.dumps(analysis_result.get('file_type_categories', {}), indent=2)}
+        - File Types: {sections['file_types']}
         
         **Content Analysis:**
         - Total Words: {content_analysis.get('total_word_count', 0):,}
         - Total Characters: {content_analysis.get('total_character_count', 0):,}
         - Supported Files for Analysis: {content_analysis.get('supported_files', 0)}
-        - Content by File Type: {json.dumps(content_analysis.get('content_by_type', {}), indent=2)}
+        - Content by File Type: {sections['content_by_type']}
         
         ## TEMPLATE ANALYSIS & STANDARDIZATION
         **Template Statistics:**
@@ -489,6 +496,7 @@ class AISummarizer:
         try:
             self.logger.addToLogs("Sending comprehensive analysis request to Google GenAI")
             response = self.client.models.generate_content(
+                priority=BATCH,
                 model=self.model_name,
                 contents=[prompt]
             )
@@ -1,12 +1,14 @@
-from google import genai
-from google.genai.types import GenerateContentConfig
-from google.genai import Client
-import google.auth
+import os
+import sys
 
-credentials, project_id = google.auth.default()
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client
+from structured_output import extract_json, json_config, StructuredOutputError
 
-# Initialize the new client
-client = genai.Client(vertexai=True, project="generalpurposeai", location="us-central1")
+# Completions missing a label or insertText are dropped one by one below, so only the overall shape is checked
+COMPLETIONS_SCHEMA = {'type': 'array'}
 
 def generate_code_suggestion(code_content, language, context=""):
     """Generate AI code suggestions and improvements"""
@@ -375,18 +377,15 @@ def generate_code_completions(code, language, context="", line=1, column=1, curr
         prompt = "\n".join(prompt_parts)
         
         # Use your existing Gemini API call
-        model = client.models.get("gemini-2.5-pro")
-        response = model.generate_content(prompt)
+        response = client.models.generate_content(
+            model="gemini-2.5-pro",
+            contents=[prompt],
+            config=json_config()
+        )
         
         try:
-            # Try to parse as JSON
-            import json
-            completions_data = json.loads(response.text)
+            completions_data = extract_json(response.text, COMPLETIONS_SCHEMA)
             
-            # Ensure it's a list
-            if not isinstance(completions_data, list):
-                completions_data = []
-                
             # Validate and clean completions
             valid_completions = []
             for comp in completions_data[:10]:  # Limit to 10 completions
@@ -400,7 +399,7 @@ def generate_code_completions(code, language, context="", line=1, column=1, curr
             
             return valid_completions
             
-        except json.JSONDecodeError:
+        except StructuredOutputError:
             # Fallback: parse text response and create simple completions
             return [
                 {
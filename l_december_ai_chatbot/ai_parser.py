@@ -1,63 +1,72 @@
 import os
+import sys
 import json
-from google import genai
-from google.genai import types
-import google.auth
-import time
-import random
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+from gemini_client import client, gemini_available, iter_text, INTERACTIVE
+from ai_scheduler import RequestRejected, is_rate_limit_error
 
 class AIIntegrationService:
     """Service for AI integration using Google's Gemini API"""
     
     def __init__(self):
-        """Initialize the AI service with Gemini client"""
-        try:
-            # Get credentials
-            credentials, project_id = google.auth.default()
-            
-            # Initialize the Gemini client
-            self.client = genai.Client(
-                vertexai=True,
-                project="generalpurposeai",
-                location="us-central1"
-            )
-            
-            self.model_id = "gemini-2.0-flash-exp"
-            self.max_retries = 3
-            self.retry_delay = 2  # seconds
-            print(f"✓ AIIntegrationService initialized with model: {self.model_id}")
-            
-        except Exception as e:
-            print(f"✗ AIIntegrationService initialization failed: {e}")
-            self.client = None
-            self.model_id = None
-            self.max_retries = 0
-            self.retry_delay = 0
+        """Initialize the AI service with the shared Gemini client, which connects on the first call"""
+        self.model_id = "gemini-2.0-flash-exp"
+        print(f"✓ AIIntegrationService initialized with model: {self.model_id}")
+    
+    @property
+    def client(self):
+        """The shared client, or None when Gemini can't be used (no SDK or no credentials)"""
+        return client if gemini_available() else None
+    
+    def _build_chat_prompt(self, user_message, system_prompt, conversation_history=None, available_apps=None):
+        """Build the full chat prompt with apps and conversation history context"""
+        full_prompt = f"{system_prompt}\n\n"
+        
+        # Add available apps context if provided
+        if available_apps:
+            apps_list = "\n".join([
+                f"- {app['name']} ({app['icon']}): {app['description']} - {'Available' if app['available'] else 'Not Available'}"
+                for app in available_apps.values()
+            ])
+            full_prompt += f"Available Apps:\n{apps_list}\n\n"
+        
+        # Add conversation history if provided
+        if conversation_history:
+            history_text = "\n".join([
+                f"User: {msg['user_message']}\nAssistant: {msg['ai_response']}"
+                for msg in conversation_history[-5:]  # Last 5 messages
+            ])
+            full_prompt += f"Conversation History:\n{history_text}\n\n"
+        
+        # Add current user message
+        full_prompt += f"User: {user_message}\n\nAssistant:"
+        return full_prompt
     
-    def _exponential_backoff_retry(self, func, *args, **kwargs):
-        """Retry function with exponential backoff"""
-        for attempt in range(self.max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                error_str = str(e)
-                
-                # Check if it's a rate limit error
-                if '429' in error_str or 'RESOURCE_EXHAUSTED' in error_str:
-                    if attempt < self.max_retries - 1:
-                        # Exponential backoff with jitter
-                        wait_time = (2 ** attempt) * self.retry_delay + random.uniform(0, 1)
-                        print(f"Rate limit hit. Retrying in {wait_time:.2f} seconds... (Attempt {attempt + 1}/{self.max_retries})")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"Max retries reached. Rate limit still active.")
-                        raise Exception("API rate limit exceeded. Please try again in a few minutes.")
-                else:
-                    # Not a rate limit error, raise immediately
-                    raise
+    def _chat_config(self):
+        # A plain dictionary is accepted as a GenerateContentConfig, and works with the offline backend too
+        return {
+            'temperature': 0.7,
+            'top_p': 0.95,
+            'top_k': 40,
+            'max_output_tokens': 2048,
+        }
+    
+    def _error_message(self, e):
+        """Turn an exception from a chat call into a user-friendly message"""
+        error_message = str(e)
+        print(f"Error generating AI response: {error_message}")
+        import traceback
+        print(traceback.format_exc())
         
-        raise Exception("Failed after maximum retries")
+        if isinstance(e, RequestRejected) or is_rate_limit_error(e):
+            return "⚠️ I'm currently experiencing high demand. Please try again in a few minutes, or rephrase your question to use fewer resources."
+        elif 'quota' in error_message.lower():
+            return "⚠️ The daily API quota has been reached. Please try again tomorrow or contact the administrator."
+        else:
+            return f"I encountered an error while processing your request. Please try again or rephrase your question."
     
     def generate_response(self, user_message, system_prompt, conversation_history=None, available_apps=None):
         """Generate AI response using Gemini with retry logic"""
@@ -65,43 +74,15 @@ class AIIntegrationService:
             if not self.client:
                 return "AI service is not available. Please check configuration."
             
-            # Build the full prompt with context
-            full_prompt = f"{system_prompt}\n\n"
-            
-            # Add available apps context if provided
-            if available_apps:
-                apps_list = "\n".join([
-                    f"- {app['name']} ({app['icon']}): {app['description']} - {'Available' if app['available'] else 'Not Available'}"
-                    for app in available_apps.values()
-                ])
-                full_prompt += f"Available Apps:\n{apps_list}\n\n"
-            
-            # Add conversation history if provided
-            if conversation_history:
-                history_text = "\n".join([
-                    f"User: {msg['user_message']}\nAssistant: {msg['ai_response']}"
-                    for msg in conversation_history[-5:]  # Last 5 messages
-                ])
-                full_prompt += f"Conversation History:\n{history_text}\n\n"
-            
-            # Add current user message
-            full_prompt += f"User: {user_message}\n\nAssistant:"
-            
-            # Define the API call function
-            def make_api_call():
-                return self.client.models.generate_content(
-                    model=self.model_id,
-                    contents=full_prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.7,
-                        top_p=0.95,
-                        top_k=40,
-                        max_output_tokens=2048,
-                    )
-                )
+            full_prompt = self._build_chat_prompt(user_message, system_prompt, conversation_history, available_apps)
             
-            # Call with retry logic
-            response = self._exponential_backoff_retry(make_api_call)
+            # The shared scheduler handles rate limits and retries, chat requests go to the front of its queue
+            response = self.client.models.generate_content(
+                priority=INTERACTIVE,
+                model=self.model_id,
+                contents=full_prompt,
+                config=self._chat_config()
+            )
             
             # Extract response text
             if response and response.text:
@@ -110,18 +91,30 @@ class AIIntegrationService:
                 return "I couldn't generate a response. Please try again."
             
         except Exception as e:
-            error_message = str(e)
-            print(f"Error generating AI response: {error_message}")
-            import traceback
-            print(traceback.format_exc())
-            
-            # Return user-friendly error message
-            if '429' in error_message or 'RESOURCE_EXHAUSTED' in error_message:
-                return "⚠️ I'm currently experiencing high demand. Please try again in a few minutes, or rephrase your question to use fewer resources."
-            elif 'quota' in error_message.lower():
-                return "⚠️ The daily API quota has been reached. Please try again tomorrow or contact the administrator."
-            else:
-                return f"I encountered an error while processing your request. Please try again or rephrase your question."
+            return self._error_message(e)
+    
+    def generate_response_stream(self, user_message, system_prompt, conversation_history=None, available_apps=None):
+        """Generate AI response using Gemini, yielding the text as it arrives"""
+        if not self.client:
+            yield "AI service is not available. Please check configuration."
+            return
+        
+        full_prompt = self._build_chat_prompt(user_message, system_prompt, conversation_history, available_apps)
+        sent_text = False
+        try:
+            for text in iter_text(self.client.models.generate_content_stream(
+                priority=INTERACTIVE,
+                model=self.model_id,
+                contents=full_prompt,
+                config=self._chat_config()
+            )):
+                sent_text = True
+                yield text
+            
+            if not sent_text:
+                yield "I couldn't generate a response. Please try again."
+        except Exception as e:
+            yield ("\n\n" if sent_text else "") + self._error_message(e)
     
     def detect_app_intent(self, message, available_apps):
         """Use AI to detect which app the user wants to use"""
@@ -148,15 +141,16 @@ Do not include any explanation, just the app_id or 'none'."""
 
             def make_api_call():
                 return self.client.models.generate_content(
+                    priority=INTERACTIVE,
                     model=self.model_id,
                     contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.3,
-                        max_output_tokens=50,
-                    )
+                    config={
+                        'temperature': 0.3,
+                        'max_output_tokens': 50,
+                    }
                 )
             
-            response = self._exponential_backoff_retry(make_api_call)
+            response = make_api_call()
             
             if response and response.text:
                 app_id = response.text.strip().lower()
@@ -193,15 +187,16 @@ Provide only the enhanced message, no explanation."""
 
             def make_api_call():
                 return self.client.models.generate_content(
+                    priority=INTERACTIVE,
                     model=self.model_id,
                     contents=prompt,
-                    config=types.GenerateContentConfig(
-                        temperature=0.5,
-                        max_output_tokens=200,
-                    )
+                    config={
+                        'temperature': 0.5,
+                        'max_output_tokens': 200,
+                    }
                 )
             
-            response = self._exponential_backoff_retry(make_api_call)
+            response = make_api_call()
             
             if response and response.text:
                 return response.text.strip()
@@ -0,0 +1,211 @@
+# A content-addressed cache of Gemini responses shared by every app in the hub.
+# Responses are keyed on the model, a hash of the normalised prompt and the
+# generation config, and stored in SQLite with a time to live and LRU eviction.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_responses.db")
+)
+DEFAULT_TTL = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 60 * 60))
+DEFAULT_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def normalise_prompt(text):
+    """Strip surrounding whitespace from every line so indentation changes in prompt templates still hit"""
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+
+def config_to_dict(config):
+    """Turn a generation config (a GenerateContentConfig, a dictionary or None) into plain data"""
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(exclude_none=True, mode="json")
+    if isinstance(config, dict):
+        return config
+    return repr(config)
+
+
+def cache_key(model, contents, config=None):
+    """
+    Build the cache key for a request, or return None if it cannot be cached.
+
+    Only text prompts are cached, requests with images or other parts always go to the model.
+    """
+    if isinstance(contents, str):
+        contents = [contents]
+    if not all(isinstance(part, str) for part in contents):
+        return None
+    payload = json.dumps(
+        {
+            'model': model,
+            'contents': [normalise_prompt(part) for part in contents],
+            'config': config_to_dict(config),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """A response read back from the cache, exposing .text like a genai response"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class ResponseCache:
+    """
+    SQLite backed cache of model responses.
+
+    Entries older than ttl seconds are treated as missing, and the least recently used entries
+    are evicted once the stored text grows past max_bytes. Hit and miss counters are kept so the
+    hit rate can be reported.
+    """
+
+    def __init__(self, db_path=CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.lock, self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    stored_bytes INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+
+    def get(self, key):
+        """Return the cached text for a key, or None if it is missing or has expired"""
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT content, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key, model, text):
+        """Store the text of a response, evicting old entries if the cache is over its size limit"""
+        content = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, stored_bytes, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, len(content), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, stored_bytes in self.connection.execute(
+            "SELECT key, stored_bytes FROM responses ORDER BY last_used"
+        ).fetchall():
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= stored_bytes
+            if total <= self.max_bytes:
+                break
+
+    def generate_content(self, client, model, contents, config=None, **kwargs):
+        """
+        Return a cached response for a request, calling client.models.generate_content on a miss.
+
+        Only responses with text are stored, so errors and empty replies are retried next time.
+        """
+        key = cache_key(model, contents, config)
+        if key is not None:
+            text = self.get(key)
+            if text is not None:
+                return CachedResponse(text)
+
+        if config is not None:
+            kwargs['config'] = config
+        response = client.models.generate_content(model=model, contents=contents, **kwargs)
+        if key is not None and getattr(response, "text", None):
+            self.put(key, model, response.text)
+        return response
+
+    def generate_content_stream(self, client, model, contents, config=None, **kwargs):
+        """
+        Stream a response, replaying a cached one as a single chunk if there is one.
+
+        The full text of a new response is stored once the stream has been read to the end.
+        """
+        key = cache_key(model, contents, config)
+        if key is not None:
+            text = self.get(key)
+            if text is not None:
+                yield CachedResponse(text)
+                return
+
+        if config is not None:
+            kwargs['config'] = config
+        parts = []
+        for chunk in client.models.generate_content_stream(model=model, contents=contents, **kwargs):
+            parts.append(getattr(chunk, "text", None) or "")
+            yield chunk
+        if key is not None and any(parts):
+            self.put(key, model, "".join(parts))
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Return hit rate and size figures for monitoring"""
+        with self.lock:
+            entries, stored_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'stored_bytes': stored_bytes,
+            }
+
+
+def get_response_cache():
+    """Return the process wide response cache, opening it on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
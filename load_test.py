@@ -0,0 +1,128 @@
+"""
+Load test for the hub, run in process against the offline Gemini backend.
+
+Each worker thread gets its own Flask test client and sends a mix of requests, so the numbers show
+the hub's own overhead (routing, prompt building, scheduling, logging) on top of the fake model
+latency, with no network access or credentials needed. The fake backend is configured with the
+FAKE_GEMINI_* environment variables, see fake_gemini.py.
+
+    python load_test.py --requests 500 --concurrency 16 --output load_test.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Must be set before anything imports gemini_client or llm_cache
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="hub-load-test-"), "llm_responses.db"))
+
+SCENARIOS = {
+    'chat': ('/chat', lambda n: {'message': f"What can the document search app do? (request {n})", 'mode': 'general'}),
+    'chat_stream': ('/chat', lambda n: {'message': f"Summarise what the hub offers (request {n})", 'mode': 'general', 'stream': True}),
+    'summarize': ('/api/summarize-document', lambda n: {'document_content': f"Quarterly report {n}. " + "Revenue grew and costs fell. " * 50}),
+    'health': ('/api/health', None),
+}
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def run_load_test(scenarios, total_requests, concurrency):
+    """
+    Send total_requests requests, cycling through scenarios, from concurrency threads.
+
+    Returns:
+    dict: Latency percentiles in milliseconds and status code counts for each scenario.
+    """
+    from __init__ import create_app
+
+    app = create_app()
+    latencies = {name: [] for name in scenarios}
+    statuses = {name: Counter() for name in scenarios}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        test_client = app.test_client()
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            name = scenarios[number % len(scenarios)]
+            path, make_body = SCENARIOS[name]
+            start = time.perf_counter()
+            if make_body is None:
+                response = test_client.get(path)
+            else:
+                response = test_client.post(path, json=make_body(number))
+            # Read the whole body so streamed responses are timed to their last chunk
+            response.get_data()
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies[name].append(elapsed)
+                statuses[name][response.status_code] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'wall_seconds': wall_seconds,
+        'throughput_rps': total_requests / wall_seconds if wall_seconds else None,
+        'scenarios': {
+            name: {
+                'requests': len(latencies[name]),
+                'p50_ms': percentile(latencies[name], 0.50),
+                'p99_ms': percentile(latencies[name], 0.99),
+                'max_ms': max(latencies[name], default=None),
+                'statuses': {str(code): count for code, count in statuses[name].items()},
+            }
+            for name in scenarios
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the hub against the offline Gemini backend")
+    parser.add_argument("--requests", type=int, default=200, help="total number of requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--output", help="where to write the JSON results (printed if not given)")
+    args = parser.parse_args(argv)
+
+    if os.environ["GEMINI_BACKEND"] != "fake":
+        print("Warning: GEMINI_BACKEND is not 'fake', requests will go to the real API", file=sys.stderr)
+
+    report = run_load_test(args.scenarios, args.requests, args.concurrency)
+    report['backend'] = os.environ["GEMINI_BACKEND"]
+    report['timestamp'] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Picks the model for each call from the shared client.
+# Calls are classed as interactive, normal or batch (from the priority they ask
+# for, whether they stream, or the route table below), and the class, the size
+# of the prompt and any latency target decide between the fast and pro tiers.
+# Apps keep naming the model they were written against, the router only swaps
+# it when the policy says so, and routes can be pinned in GEMINI_MODEL_ROUTES.
+
+import os
+import threading
+
+from ai_scheduler import INTERACTIVE, NORMAL, BATCH, PRIORITY_NAMES
+
+FAST_MODEL = os.environ.get("GEMINI_FAST_MODEL", "gemini-2.0-flash")
+PRO_MODEL = os.environ.get("GEMINI_PRO_MODEL", "gemini-2.5-pro")
+# Latency targets below this (in milliseconds) are only met by the fast tier
+PRO_MIN_SLO_MS = float(os.environ.get("MODEL_ROUTER_PRO_MIN_SLO_MS", 10000))
+# Batch calls with prompts at least this large go to the pro tier
+HEAVY_INPUT_TOKENS = int(os.environ.get("MODEL_ROUTER_HEAVY_INPUT_TOKENS", 20000))
+
+TIERS = {'fast': FAST_MODEL, 'pro': PRO_MODEL}
+CALL_CLASSES = {name: priority for priority, name in PRIORITY_NAMES.items()}
+
+# Routes are "app:function" or just "app", and map to a call class, a tier or a model name
+DEFAULT_ROUTES = {
+    # Run on every keystroke or hover in the editor
+    'k_november_ai_coding_assistant:generate_code_completions': 'interactive',
+    'k_november_ai_coding_assistant:generate_hover_info': 'interactive',
+    # Shown alongside the search results
+    'a_january_ai_document_search:generate_ai_summary': 'interactive',
+}
+
+_shared_router = None
+_shared_router_lock = threading.Lock()
+
+
+def is_fast(model):
+    return "flash" in model
+
+
+def is_pro(model):
+    return "pro" in model
+
+
+def parse_routes(value):
+    """Parse GEMINI_MODEL_ROUTES, e.g. "k_november_ai_coding_assistant:complete_code=fast,b_february_ai_testing_agent=batch" """
+    routes = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        route, target = item.split("=", 1)
+        routes[route.strip()] = target.strip()
+    return routes
+
+
+class ModelRouter:
+    """
+    Chooses the model and priority for a call.
+
+    The route table is checked first: a call class sets the priority and leaves the model to the
+    policy, a tier or model name pins the model. Then, in order, a latency target under
+    PRO_MIN_SLO_MS or an interactive call gets the fast tier, a batch call with a prompt of
+    HEAVY_INPUT_TOKENS or more gets the pro tier, and anything else keeps the model it asked for.
+    A call that already asks for a model in the chosen tier keeps it. Streaming raises a call's
+    priority but not its tier, so a streamed reply comes from the same model as the same call made
+    without streaming.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(routes if routes is not None else parse_routes(os.environ.get("GEMINI_MODEL_ROUTES")))
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def set_route(self, route, target):
+        """Set the call class, tier or model for a route ("app:function" or "app")"""
+        with self.lock:
+            self.routes[route] = target
+
+    def lookup(self, app, caller):
+        function = caller.rsplit(":", 1)[-1]
+        return self.routes.get(f"{app}:{function}", self.routes.get(app))
+
+    def route(self, model, app, caller, priority=None, input_tokens=0, slo_ms=None, streaming=False):
+        """
+        Work out the model and priority for a call.
+
+        Parameters:
+        model (str): The model the app asked for.
+        app (str), caller (str): Who is making the call, as returned by ai_metrics.find_caller.
+        priority (int): The priority the app asked for, or None if it did not.
+        input_tokens (int): Estimated size of the prompt.
+        slo_ms (float): Latency target for the call in milliseconds (optional).
+        streaming (bool): Whether the response is streamed to a user, which only affects the priority.
+
+        Returns:
+        tuple: The model to call and the priority to schedule it with.
+        """
+        target = self.lookup(app, caller)
+        pinned = None
+        if target in CALL_CLASSES:
+            if priority is None:
+                priority = CALL_CLASSES[target]
+        elif target is not None:
+            pinned = TIERS.get(target, target)
+        interactive = priority == INTERACTIVE
+        if priority is None:
+            priority = INTERACTIVE if streaming else NORMAL
+
+        if pinned is not None:
+            chosen = pinned
+        elif (slo_ms is not None and slo_ms < PRO_MIN_SLO_MS) or interactive:
+            chosen = model if is_fast(model) else FAST_MODEL
+        elif priority == BATCH and input_tokens >= HEAVY_INPUT_TOKENS:
+            chosen = model if is_pro(model) else PRO_MODEL
+        else:
+            chosen = model
+
+        with self.lock:
+            key = f"{model} -> {chosen}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+        return chosen, priority
+
+    def stats(self):
+        """Return how often each requested model was sent to each chosen model"""
+        with self.lock:
+            return {'routes': dict(self.routes), 'decisions': dict(self.counts)}
+
+
+def get_router():
+    """Return the process wide model router, creating it on first use"""
+    global _shared_router
+    with _shared_router_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter()
+        return _shared_router
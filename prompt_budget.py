@@ -0,0 +1,207 @@
+# Keeps user content in prompts within a token budget.
+# Inputs that fit are left alone, inputs a little over the budget are sampled
+# down to evenly spaced excerpts, and very large inputs are summarised chunk by
+# chunk (map) and the summaries combined (reduce), with the number of chunks and
+# levels capped so the time taken stays bounded whatever the input size.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_metrics import calling_as, find_caller
+from ai_scheduler import estimate_prompt_tokens
+from gemini_client import cached_client
+
+# Tokens of user content a single prompt may carry, by default
+DEFAULT_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 30000))
+# Inputs up to this many times their budget are sampled, larger ones are summarised
+SUMMARISE_RATIO = float(os.environ.get("PROMPT_SUMMARISE_RATIO", 3.0))
+# Size of each chunk summarised in the map step
+CHUNK_TOKENS = int(os.environ.get("PROMPT_CHUNK_TOKENS", 8000))
+# Most chunks summarised in one map step, larger inputs are sampled down to this first
+MAX_MAP_CHUNKS = int(os.environ.get("PROMPT_MAX_MAP_CHUNKS", 16))
+# Most rounds of summarising summaries before falling back to sampling
+MAX_REDUCE_LEVELS = int(os.environ.get("PROMPT_MAX_REDUCE_LEVELS", 2))
+SUMMARY_MODEL = os.environ.get("PROMPT_SUMMARY_MODEL", "gemini-2.0-flash")
+
+CHARS_PER_TOKEN = 4
+# How many evenly spaced excerpts an over-budget input is sampled down to
+SAMPLE_EXCERPTS = 8
+MAP_THREAD_PREFIX = "prompt-budget-map"
+
+
+def estimate_tokens(text):
+    """Rough token count of a piece of text"""
+    return estimate_prompt_tokens(text or "")
+
+
+def truncate_to_budget(text, max_tokens):
+    """Keep the start and end of text within max_tokens, marking how much was cut from the middle"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n\n[... {omitted:,} characters omitted ...]\n\n{text[len(text) - tail:]}"
+
+
+def sample_to_budget(text, max_tokens, excerpts=SAMPLE_EXCERPTS):
+    """
+    Fit text within max_tokens by keeping evenly spaced excerpts from across it.
+
+    Unlike truncate_to_budget this keeps some of the middle of the document, which matters for
+    summaries. Excerpts start and end on line breaks where there is one nearby.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    marker = "\n\n[...]\n\n"
+    excerpt_chars = max(1, (max_chars - len(marker) * (excerpts - 1)) // excerpts)
+    stride = (len(text) - excerpt_chars) / max(1, excerpts - 1)
+    parts = []
+    for number in range(excerpts):
+        start = int(number * stride)
+        end = start + excerpt_chars
+        if number:
+            newline = text.find("\n", start, start + excerpt_chars // 4)
+            if newline != -1:
+                start = newline + 1
+        newline = text.rfind("\n", end - excerpt_chars // 4, end)
+        if newline > start:
+            end = newline
+        parts.append(text[start:end].strip())
+    return marker.join(part for part in parts if part)
+
+
+def split_into_chunks(text, chunk_tokens=CHUNK_TOKENS):
+    """Split text into chunks of about chunk_tokens, breaking on paragraphs where it can"""
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            paragraph = text.rfind("\n\n", start + chunk_chars // 2, end)
+            if paragraph != -1:
+                end = paragraph
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def summarise_chunk(chunk, label, target_tokens, priority=None):
+    """Summarise one chunk of a larger input, keeping the facts the final prompt may need"""
+    prompt = f"""
+    The following is one part of a larger {label}. Summarise it in at most {target_tokens * 3 // 4} words,
+    keeping names, figures, dates, requirements and conclusions. Do not add anything that is not in the text.
+
+    {chunk}
+    """
+    response = cached_client.models.generate_content(
+        model=SUMMARY_MODEL,
+        contents=[prompt],
+        config={'max_output_tokens': target_tokens},
+        priority=priority,
+    )
+    return (response.text or "").strip()
+
+
+def summarise_chunks(chunks, label, target_tokens, priority=None):
+    """
+    Summarise the chunks of one map step at the same time and return the summaries in order.
+
+    The calls run on threads of their own rather than the shared gateway pool, so the map still fans
+    out when it is itself running in that pool (e.g. one of September's compared summaries). Each
+    call goes through the scheduler, which bounds how many are in flight per model, and is recorded
+    and routed as a call from the app that asked for the summary.
+    """
+    app, caller = find_caller()
+
+    def summarise(chunk):
+        with calling_as(app, caller):
+            return summarise_chunk(chunk, label, target_tokens, priority)
+
+    if len(chunks) <= 1:
+        return [summarise(chunk) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix=MAP_THREAD_PREFIX) as pool:
+        return list(pool.map(summarise, chunks))
+
+
+def summarise_to_budget(text, max_tokens, label="document", priority=None):
+    """
+    Shrink text to max_tokens with a hierarchical map-reduce summary.
+
+    The text is split into chunks which are summarised concurrently, and the joined summaries are
+    summarised again if they are still over budget. Inputs with more than MAX_MAP_CHUNKS chunks are
+    sampled down first and at most MAX_REDUCE_LEVELS rounds are run, so the number of model calls
+    and their rounds are bounded. Whatever is left over budget at the end is sampled. The summary
+    calls are made with the given priority, or the one the router gives the calling app.
+    """
+    for _ in range(MAX_REDUCE_LEVELS):
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        text = sample_to_budget(text, CHUNK_TOKENS * MAX_MAP_CHUNKS, excerpts=MAX_MAP_CHUNKS)
+        chunks = split_into_chunks(text)
+        target_tokens = max(200, max_tokens // len(chunks))
+        summaries = summarise_chunks(chunks, label, target_tokens, priority)
+        text = "\n\n".join(f"[Part {number} of {len(chunks)}]\n{summary}" for number, summary in enumerate(summaries, 1))
+    return sample_to_budget(text, max_tokens)
+
+
+def fit_to_budget(text, max_tokens=DEFAULT_BUDGET, label="document", summarise=True, priority=None):
+    """
+    Return text cut down to fit within max_tokens.
+
+    Text that fits is returned unchanged. Text up to SUMMARISE_RATIO times the budget is sampled,
+    and anything larger is summarised if summarise is set (and sampled otherwise). If a summary
+    call fails the text is sampled instead, so a prompt is always produced.
+    """
+    text = text or ""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if summarise and tokens > max_tokens * SUMMARISE_RATIO:
+        try:
+            return summarise_to_budget(text, max_tokens, label, priority)
+        except Exception as e:
+            print(f"Could not summarise {label} to fit the prompt budget, sampling instead: {str(e)}")
+    return sample_to_budget(text, max_tokens)
+
+
+def share_budget(sizes, budget):
+    """
+    Split a budget between inputs of the given token sizes.
+
+    Inputs smaller than an even share keep their full size and what they do not use is shared
+    between the larger ones.
+    """
+    shares = {}
+    remaining = dict(sizes)
+    while remaining:
+        share = budget // len(remaining)
+        small = {name: size for name, size in remaining.items() if size <= share}
+        if not small:
+            shares.update({name: share for name in remaining})
+            break
+        for name, size in small.items():
+            shares[name] = size
+            budget -= size
+            del remaining[name]
+    return shares
+
+
+def fit_texts(budget=DEFAULT_BUDGET, summarise=True, priority=None, **texts):
+    """
+    Fit several inputs to one prompt into a shared budget, e.g.
+    fit_texts(20000, cv=cv_text, job_description=job_description).
+
+    Returns:
+    dict: The inputs by name, each cut down to its share of the budget.
+    """
+    texts = {name: text or "" for name, text in texts.items()}
+    shares = share_budget({name: estimate_tokens(text) for name, text in texts.items()}, budget)
+    # One at a time, so the map steps of several large inputs do not compete for the same rate limits
+    return {
+        name: fit_to_budget(text, shares[name], name.replace("_", " "), summarise, priority)
+        for name, text in texts.items()
+    }
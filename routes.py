@@ -1,8 +1,16 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, make_response
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, make_response, Response, stream_with_context
 import os
 import sys
 from datetime import datetime
 import sqlite3
+from llm_cache import get_response_cache
+from ai_scheduler import get_scheduler
+from ai_metrics import get_metrics
+from model_router import get_router
+from gemini_client import sse_event
+
+# Most recent log entries shown on a log page, more are loaded with ?limit= or /api/logs/recent
+LOG_PAGE_SIZE = int(os.environ.get("LOG_PAGE_SIZE", 200))
 
 # Add project directories to Python path - FIX FOR IMPORTS
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -220,6 +228,7 @@ try:
     from i_september_ai_doc_summariser.src.utils.document_processor import DocumentProcessor as september_document_processor
     from i_september_ai_doc_summariser.src.ai.geminiPrompt import (
         generate_document_summary as september_generate_summary,
+        stream_document_summary as september_stream_summary,
         analyze_document_content as september_analyze_content
     )
     print("✓ September AI Doc Summariser imported")
@@ -227,6 +236,7 @@ except ImportError as e:
     print(f"✗ September import failed: {e}")
     september_document_processor = None
     september_generate_summary = None
+    september_stream_summary = None
     september_analyze_content = None
 
 try:
@@ -427,6 +437,12 @@ def register_routes(app):
             # Get available apps for context
             available_apps = get_available_apps()
             
+            # Messages that ask for one of the apps go through the engine so they get an app suggestion,
+            # only plain chat replies are streamed
+            app_suggestion = detect_app_intent(user_message)
+            if request.json.get('stream') and ai_service is not None and not app_suggestion:
+                return stream_chat_response(user_message, prompt_mode, session.get('user_id'), available_apps)
+            
             # Modify ChatbotEngine to accept available_apps
             class ChatbotEngineWithApps(ChatbotEngine):
                 def process_message(self, message, mode, user_id, available_apps=None):
@@ -486,7 +502,6 @@ def register_routes(app):
             )
             
             # Check if message should route to specific app
-            app_suggestion = detect_app_intent(user_message)
             if app_suggestion:
                 response['app_suggestion'] = app_suggestion
                 chatbot_logger.addToLogs(f"App suggestion made: {app_suggestion['app_name']}")
@@ -497,6 +512,35 @@ def register_routes(app):
             error_logger.addToErrorLogs(f"Chat processing failed: {str(e)}")
             return jsonify({'error': f'Chat processing failed: {str(e)}'}), 500
 
+    def stream_chat_response(user_message, prompt_mode, user_id, available_apps):
+        """Stream a chat reply as Server-Sent Events, one 'data' event per chunk and a final 'done' event"""
+        mode_config = prompt_manager.get_mode(prompt_mode)
+        system_prompt = mode_config.get('system_prompt', 'You are a helpful AI assistant.')
+        history = chatbot_engine.conversation_history.setdefault(user_id, [])
+        
+        def generate():
+            parts = []
+            for text in ai_service.generate_response_stream(user_message, system_prompt, history, available_apps):
+                parts.append(text)
+                yield sse_event({'text': text})
+            
+            response_text = "".join(parts).strip()
+            history.append({
+                'user_message': user_message,
+                'ai_response': response_text,
+                'timestamp': datetime.now().isoformat()
+            })
+            del history[:-10]
+            chatbot_logger.addToLogs(f"Streamed response for user {user_id}: {len(response_text)} characters")
+            
+            yield sse_event({
+                'mode': prompt_mode,
+                'timestamp': datetime.now().isoformat(),
+                'success': True
+            }, event='done')
+        
+        return event_stream(generate())
+    
     # Direct app integration routes
     @app.route('/api/search-documents', methods=['POST'])
     def api_search_documents():
@@ -509,6 +553,9 @@ def register_routes(app):
             
             query = request.json.get('query', '')
             directory = request.json.get('directory', 'default')
+            offset = max(0, int(request.json.get('offset', 0)))
+            limit = request.json.get('limit')
+            limit = None if limit is None else max(0, int(limit))
             
             api_logger.addToInputLogs("Document search", f"Query: {query}, Directory: {directory}")
             
@@ -517,13 +564,15 @@ def register_routes(app):
             
             # Use January project functions
             documents = january_handle_documents(directory)
-            results = january_search_documents(query, documents)
-            ai_summary = january_generate_summary(query, results, documents)
+            results = january_search_documents(query, documents, directory, offset, limit)
+            ai_summary = january_generate_summary(query, results, documents, directory)
             
             api_logger.addToLogs(f"Document search completed: {len(results)} results")
             
             return jsonify({
-                'results': results, 
+                'results': [result.to_dict(documents) for result in results],
+                'offset': offset,
+                'limit': limit,
                 'ai_summary': ai_summary,
                 'success': True
             })
@@ -595,6 +644,13 @@ def register_routes(app):
             if not document_text:
                 return jsonify({'error': 'No document content provided'}), 400
             
+            if request.json.get('stream') and september_stream_summary:
+                def generate():
+                    for text in september_stream_summary(document_text, 'general', 'medium', 'neutral'):
+                        yield sse_event({'text': text})
+                    yield sse_event({'success': True}, event='done')
+                return event_stream(generate())
+            
             summary = september_generate_summary(document_text, 'general', 'medium', 'neutral')
             
             return jsonify({
@@ -1047,15 +1103,17 @@ def register_routes(app):
             return redirect(url_for('get_login'))
         
         try:
-            # Get logs from logger
-            logs = chatbot_logger.getLogs()
-            api_logs = api_logger.getLogs()
-            error_logs = error_logger.getLogs()
+            # Get the most recent logs, which only reads the archives if the live logs are shorter
+            limit = log_page_limit()
+            logs = chatbot_logger.getLogs(limit)
+            api_logs = api_logger.getLogs(limit)
+            error_logs = error_logger.getLogs(limit)
             
             return render_template('logs.html', 
                                     logs=logs, 
                                     api_logs=api_logs, 
-                                    error_logs=error_logs)
+                                    error_logs=error_logs,
+                                    limit=limit)
         except Exception as e:
             error_logger.addToErrorLogs(f"Error viewing logs: {str(e)}")
             flash('Error loading logs', 'error')
@@ -1068,8 +1126,9 @@ def register_routes(app):
             return redirect(url_for('get_login'))
         
         try:
-            logs = chatbot_logger.getLogs()
-            return render_template('chatbot_logs.html', logs=logs)
+            limit = log_page_limit()
+            logs = chatbot_logger.getLogs(limit)
+            return render_template('chatbot_logs.html', logs=logs, limit=limit)
         except Exception as e:
             error_logger.addToErrorLogs(f"Error viewing chatbot logs: {str(e)}")
             return jsonify({'error': str(e)}), 500
@@ -1081,8 +1140,9 @@ def register_routes(app):
             return redirect(url_for('get_login'))
         
         try:
-            logs = api_logger.getLogs()
-            return render_template('api_logs.html', logs=logs)
+            limit = log_page_limit()
+            logs = api_logger.getLogs(limit)
+            return render_template('api_logs.html', logs=logs, limit=limit)
         except Exception as e:
             error_logger.addToErrorLogs(f"Error viewing API logs: {str(e)}")
             return jsonify({'error': str(e)}), 500
@@ -1094,8 +1154,9 @@ def register_routes(app):
             return redirect(url_for('get_login'))
         
         try:
-            logs = error_logger.getLogs()
-            return render_template('error_logs.html', logs=logs)
+            limit = log_page_limit()
+            logs = error_logger.getLogs(limit)
+            return render_template('error_logs.html', logs=logs, limit=limit)
         except Exception as e:
             flash('Error loading error logs', 'error')
             return redirect(url_for('chatbot_home'))
@@ -1108,33 +1169,36 @@ def register_routes(app):
         
         try:
             log_type = request.json.get('log_type', 'all')
+            # Only delete the rotated, compressed segments and keep the live log
+            archives_only = bool(request.json.get('archives_only', False))
             
             if log_type == 'all' or log_type == 'chatbot':
-                chatbot_logger.clearLogs()
+                chatbot_logger.clearLogs(archives_only)
             if log_type == 'all' or log_type == 'api':
-                api_logger.clearLogs()
+                api_logger.clearLogs(archives_only)
             if log_type == 'all' or log_type == 'error':
-                error_logger.clearLogs()
+                error_logger.clearLogs(archives_only)
             
-            chatbot_logger.addToLogs(f"Logs cleared: {log_type}")
-            return jsonify({'success': True, 'message': f'{log_type} logs cleared'})
+            cleared = f"{log_type} archived logs" if archives_only else f"{log_type} logs"
+            chatbot_logger.addToLogs(f"Logs cleared: {cleared}")
+            return jsonify({'success': True, 'message': f'{cleared} cleared'})
         except Exception as e:
             error_logger.addToErrorLogs(f"Error clearing logs: {str(e)}")
             return jsonify({'error': str(e)}), 500
     
     @app.route('/logs/download/<log_type>')
     def download_logs(log_type):
-        """Download logs as text file"""
+        """Download logs as text file, including the archived segments"""
         if not session.get('authenticated'):
             return redirect(url_for('get_login'))
         
         try:
             if log_type == 'chatbot':
-                logs = chatbot_logger.getLogs()
+                logs = chatbot_logger.getLogs(include_archives=True)
             elif log_type == 'api':
-                logs = api_logger.getLogs()
+                logs = api_logger.getLogs(include_archives=True)
             elif log_type == 'error':
-                logs = error_logger.getLogs()
+                logs = error_logger.getLogs(include_archives=True)
             else:
                 return jsonify({'error': 'Invalid log type'}), 400
             
@@ -1165,11 +1229,11 @@ def register_routes(app):
             logs_data = {}
             
             if log_type == 'all' or log_type == 'chatbot':
-                logs_data['chatbot'] = chatbot_logger.getLogs()[-limit:]
+                logs_data['chatbot'] = chatbot_logger.getLogs(limit)
             if log_type == 'all' or log_type == 'api':
-                logs_data['api'] = api_logger.getLogs()[-limit:]
+                logs_data['api'] = api_logger.getLogs(limit)
             if log_type == 'all' or log_type == 'error':
-                logs_data['error'] = error_logger.getLogs()[-limit:]
+                logs_data['error'] = error_logger.getLogs(limit)
             
             return jsonify({
                 'logs': logs_data,
@@ -1180,6 +1244,39 @@ def register_routes(app):
             error_logger.addToErrorLogs(f"Error getting recent logs: {str(e)}")
             return jsonify({'error': str(e), 'success': False}), 500
     
+    @app.route('/api/logs/search')
+    def search_recent_logs():
+        """Search the hub logs through their full-text indexes"""
+        if not session.get('authenticated'):
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        try:
+            search_term = request.args.get('q', '').strip()
+            narrow_search = request.args.get('narrow', '').strip()
+            entry_type = request.args.get('entry_type')  # output, error or input
+            log_type = request.args.get('type', 'all')
+            limit = request.args.get('limit', 100, type=int)
+            
+            if not search_term:
+                return jsonify({'error': 'No search term provided', 'success': False}), 400
+            if entry_type not in (None, 'output', 'error', 'input'):
+                return jsonify({'error': 'Invalid entry type', 'success': False}), 400
+            
+            loggers = {'chatbot': chatbot_logger, 'api': api_logger, 'error': error_logger}
+            results = {}
+            for name, log in loggers.items():
+                if log_type == 'all' or log_type == name:
+                    results[name] = log.searchLogs(search_term, entry_type, narrow_search or None, limit)
+            
+            return jsonify({
+                'results': results,
+                'total': sum(len(matches) for matches in results.values()),
+                'success': True
+            })
+        except Exception as e:
+            error_logger.addToErrorLogs(f"Error searching logs: {str(e)}")
+            return jsonify({'error': str(e), 'success': False}), 500
+    
     # Statistics and monitoring routes
     @app.route('/stats')
     def view_stats():
@@ -1189,9 +1286,9 @@ def register_routes(app):
         
         try:
             stats = {
-                'total_chatbot_logs': len(chatbot_logger.getLogs()),
-                'total_api_logs': len(api_logger.getLogs()),
-                'total_error_logs': len(error_logger.getLogs()),
+                'total_chatbot_logs': chatbot_logger.getLogCount(include_archives=True),
+                'total_api_logs': api_logger.getLogCount(include_archives=True),
+                'total_error_logs': error_logger.getLogCount(include_archives=True),
                 'available_apps': sum(1 for app in get_available_apps().values() if app['available']),
                 'total_apps': len(get_available_apps()),
                 'active_sessions': len(chatbot_engine.conversation_history) if hasattr(chatbot_engine, 'conversation_history') else 0
@@ -1220,7 +1317,10 @@ def register_routes(app):
                     'ai_service': ai_service is not None,
                     'prompt_manager': prompt_manager is not None,
                     'logging': all([chatbot_logger, api_logger, error_logger])
-                }
+                },
+                'llm_cache': get_response_cache().stats(),
+                'ai_scheduler': get_scheduler().stats(),
+                'model_router': get_router().stats()
             }
             
             return jsonify(health_status)
@@ -1232,9 +1332,32 @@ def register_routes(app):
                 'timestamp': datetime.now().isoformat()
             }), 500
     
+    @app.route('/api/metrics')
+    def api_metrics():
+        """Token, latency and cache histograms for the model calls made by each app"""
+        try:
+            metrics = get_metrics().snapshot()
+            metrics['timestamp'] = datetime.now().isoformat()
+            return jsonify(metrics)
+        except Exception as e:
+            error_logger.addToErrorLogs(f"Error reading AI metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+    
     chatbot_logger.addToLogs("All routes registered successfully")    
 
 # Helper functions
+def log_page_limit():
+    """How many of the most recent log entries a log page shows, from ?limit= (LOG_PAGE_SIZE by default)"""
+    return max(1, request.args.get('limit', LOG_PAGE_SIZE, type=int))
+
+def event_stream(events):
+    """Wrap a generator of Server-Sent Events in a streaming response that proxies will not buffer"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 def get_available_apps():
     """Get list of available apps with availability status"""
     return {
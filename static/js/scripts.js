@@ -621,11 +621,19 @@ async function sendMessage() {
                 },
                 body: JSON.stringify({
                     message: message,
-                    mode: currentMode
+                    mode: currentMode,
+                    stream: true
                 })
             });
         }
         
+        // The server only streams plain chat replies, messages that ask for an app come back as JSON
+        // with an app suggestion
+        if ((response.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+            await showStreamedReply(response);
+            return;
+        }
+        
         const data = await response.json();
         
         removeTypingIndicator();
@@ -652,6 +660,62 @@ async function sendMessage() {
     }
 }
 
+async function readEventStream(response, onEvent) {
+    // Parse a Server-Sent Events response body, calling onEvent(event, data) for each message
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            message.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+async function showStreamedReply(response) {
+    // Show the reply as it is generated, so the first words appear as soon as the model sends them
+    let replyText = '';
+    let replyParagraph = null;
+    let replyEntry = null;
+    
+    await readEventStream(response, (event, data) => {
+        if (event === 'done') return;
+        if (!replyParagraph) {
+            removeTypingIndicator();
+            addMessage('bot', '');
+            replyEntry = chatHistory[chatHistory.length - 1];
+            replyParagraph = document.querySelector('#chatMessages .bot-message:last-child .message-content p');
+        }
+        replyText += data.text;
+        replyParagraph.textContent = replyText;
+        const messagesDiv = document.getElementById('chatMessages');
+        messagesDiv.scrollTop = messagesDiv.scrollHeight;
+    });
+    
+    removeTypingIndicator();
+    if (replyEntry) {
+        // Only the history entry of the reply itself is filled in, never an earlier message
+        replyEntry.content = replyText;
+    } else {
+        addMessage('error', 'No reply was received. Please try again.');
+    }
+    saveChatHistory();
+}
+
 function addMessage(sender, content) {
     const messagesDiv = document.getElementById('chatMessages');
     const messageDiv = document.createElement('div');
@@ -1193,7 +1257,7 @@ async function executeDocumentSearch() {
                 <h4>Search Results</h4>
                 <div class="ai-summary">${data.ai_summary}</div>
                 <div class="results-list">
-                    ${data.results.map(r => `<div class="result-item">${r}</div>`).join('')}
+                    ${data.results.map(r => `<div class="result-item"><strong>${r.doc_id}</strong> (${(r.score * 100).toFixed(2)}%)<br>${r.snippet}...</div>`).join('')}
                 </div>
             `;
             resultsDiv.style.display = 'block';
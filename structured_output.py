@@ -0,0 +1,191 @@
+# Parsing of JSON answers from the model, shared by every app that asks for one.
+# Calls ask the model for JSON mode so the answer is usually plain JSON and is
+# parsed in one go. Otherwise the text is scanned once, left to right, for the
+# first complete JSON value, skipping prose and markdown fences around it, which
+# also works on a stream of chunks as they arrive. Values can be checked against
+# a small JSON Schema subset before they are used.
+
+import json
+
+JSON_MIME_TYPE = "application/json"
+
+TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+OPENERS = {'{': '}', '[': ']'}
+
+
+class StructuredOutputError(ValueError):
+    """The model's answer had no JSON in it, or the JSON did not match the schema"""
+
+
+def json_config(config=None):
+    """
+    Return a generation config that asks the model to answer in JSON.
+
+    Any settings in config (a dictionary) are kept, e.g. json_config({'temperature': 0.2}).
+    """
+    config = dict(config or {})
+    config['response_mime_type'] = JSON_MIME_TYPE
+    return config
+
+
+class JSONStreamParser:
+    """
+    Finds complete JSON values in text fed to it piece by piece.
+
+    Only objects and arrays are looked for. Each character is looked at once, so feeding a long
+    answer in chunks costs no more than parsing it whole, unless a bracket turns out not to start
+    JSON (e.g. "Use a [ bracket. {...}"). Then the text after that bracket is looked at again, when
+    the brackets it opened close on something that is not JSON, or in finish() if they never close.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.stack = []
+
+    def feed(self, text):
+        """Add the next piece of text, returning the values completed by it"""
+        values = []
+        for char in text:
+            if self.depth == 0:
+                if char in OPENERS:
+                    self.buffer = [char]
+                    self.stack.append(OPENERS[char])
+                    self.depth += 1
+                continue
+
+            self.buffer.append(char)
+            if self.in_string or char == '"':
+                self._scan_string(char)
+            elif char in OPENERS:
+                self.stack.append(OPENERS[char])
+                self.depth += 1
+            elif char == self.stack[-1]:
+                self.stack.pop()
+                self.depth -= 1
+                if self.depth == 0:
+                    values.extend(self._decode())
+        return values
+
+    def finish(self):
+        """Mark the end of the text, returning any values found after brackets that never closed"""
+        values = []
+        while self.depth:
+            rest = "".join(self.buffer[1:])
+            self._reset()
+            values.extend(self.feed(rest))
+        return values
+
+    def _scan_string(self, char):
+        """Follow a character of a JSON string (or the quote that opens one), tracking escapes"""
+        if not self.in_string:
+            self.in_string = True
+        elif self.escaped:
+            self.escaped = False
+        elif char == '\\':
+            self.escaped = True
+        elif char == '"':
+            self.in_string = False
+
+    def _decode(self):
+        candidate = "".join(self.buffer)
+        self.buffer = []
+        try:
+            return [(json.loads(candidate),)]
+        except json.JSONDecodeError:
+            # Brackets balanced but not valid JSON (e.g. {placeholder} text), look again from just after the first
+            return self.feed(candidate[1:])
+
+
+def iter_json_values(chunks):
+    """Yield JSON values from an iterable of text chunks (e.g. gemini_client.iter_text of a stream) as they complete"""
+    parser = JSONStreamParser()
+    for chunk in chunks:
+        for (value,) in parser.feed(chunk):
+            yield value
+    for (value,) in parser.finish():
+        yield value
+
+
+def validate(value, schema, path="$"):
+    """
+    Check a value against a schema, returning a list of problems (empty if it matches).
+
+    Supports type (a name or a list of names), properties, required, items and enum.
+    """
+    problems = []
+    expected = schema.get('type')
+    if expected is not None:
+        names = expected if isinstance(expected, list) else [expected]
+        if not any(TYPE_CHECKS[name](value) for name in names):
+            return [f"{path} should be {' or '.join(names)}, got {type(value).__name__}"]
+    if 'enum' in schema and value not in schema['enum']:
+        problems.append(f"{path} should be one of {schema['enum']}, got {value!r}")
+    if isinstance(value, dict):
+        for key in schema.get('required', []):
+            if key not in value:
+                problems.append(f"{path} is missing {key!r}")
+        for key, subschema in schema.get('properties', {}).items():
+            if key in value:
+                problems.extend(validate(value[key], subschema, f"{path}.{key}"))
+    if isinstance(value, list) and 'items' in schema:
+        for index, item in enumerate(value):
+            problems.extend(validate(item, schema['items'], f"{path}[{index}]"))
+    return problems
+
+
+def strip_fences(text):
+    """Remove a markdown code fence around an answer, if there is one"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def extract_json(text, schema=None):
+    """
+    Return the JSON value in a model answer.
+
+    Plain JSON (what JSON mode returns) is parsed directly, otherwise the first complete object or
+    array in the text is used. If schema is given the value is checked against it, and when the
+    schema expects an object or array only values of that type are considered.
+
+    Raises:
+    StructuredOutputError: If no JSON is found or it does not match the schema.
+    """
+    if not text:
+        raise StructuredOutputError("The model returned an empty answer")
+    expected = (schema or {}).get('type')
+    candidates = []
+    stripped = strip_fences(text)
+    try:
+        candidates.append(json.loads(stripped))
+    except json.JSONDecodeError:
+        candidates = iter_json_values([stripped])
+
+    problems = ["No JSON found in the model's answer"]
+    for value in candidates:
+        if schema is None:
+            return value
+        if expected in ('object', 'array') and not TYPE_CHECKS[expected](value):
+            continue
+        problems = validate(value, schema)
+        if not problems:
+            return value
+    raise StructuredOutputError("; ".join(problems[:5]))
+
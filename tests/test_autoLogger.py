@@ -0,0 +1,331 @@
+# Tests for autoLogger's buffered writer, rotation, search index, backwards reads and record counts, including archived segments.
+# Run from this folder with: python -m pytest (the repository root is a package that needs Flask)
+
+import os
+import sys
+import time
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+import autoLogger
+from autoLogger import (
+    BufferedLogWriter, general_logger, get_search_index, iter_records_reversed, list_archives, make_record, parse_record
+)
+
+
+def make_logger(tmp_path):
+    logger = general_logger(str(tmp_path / "logs" / "app_log.txt"))
+    # Start from an empty log rather than the "Log file created" record
+    logger.clearLogs()
+    return logger
+
+
+LEGACY_LOG = """Logging started...
+2026-01-05 09:00:00
+[2026-01-05 09:00:01] Output:
+hello from the old format
+[2026-01-05 09:00:02] Error:
+something failed
+[2026-01-05 09:00:03] User Input:
+question: what is logged
+"""
+
+
+def write_legacy_log(tmp_path):
+    path = tmp_path / "logs" / "legacy_log.txt"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(LEGACY_LOG)
+    return str(path)
+
+
+def log_entries(logger, count, prefix):
+    for number in range(count):
+        logger.addToLogs(f"{prefix} output {number}")
+        if number % 2 == 0:
+            logger.addToErrorLogs(f"{prefix} error {number}")
+        if number % 5 == 0:
+            logger.addToInputLogs("prompt", f"{prefix} input {number}")
+    logger.flush()
+
+
+def read_messages(filename):
+    with open(filename, 'rb') as logger:
+        return [parse_record(line)['message'] for line in logger]
+
+
+def test_counts_include_archives_after_rotation(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 10, "first")
+    assert logger.rotate() is not None
+    log_entries(logger, 4, "second")
+
+    assert logger.getRecordCounts() == {'output': 4, 'error': 2, 'input': 1}
+    assert logger.getRecordCounts(include_archives=True) == {'output': 14, 'error': 7, 'input': 3}
+    assert logger.getLogCount() == 7
+    assert logger.getLogCount(include_archives=True) == 24
+    assert logger.getLogCount('error', include_archives=True) == 7
+
+    stats = logger.getLogStats(include_archives=True)
+    assert stats['total_lines'] == 24
+    assert stats['archived_segments'] == 1
+    assert logger.getLogStats()['total_lines'] == 7
+
+
+def test_archive_counts_are_read_back_from_the_archive(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 10, "first")
+    logger.rotate()
+    # As in a new process, which did not do the rotation itself
+    autoLogger._archive_counts.clear()
+
+    assert logger.getRecordCounts(include_archives=True) == {'output': 10, 'error': 5, 'input': 2}
+
+
+def test_unlimited_reads_include_archives_oldest_first(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 3, "first")
+    logger.rotate()
+    log_entries(logger, 3, "second")
+
+    live = logger.getLogs()
+    everything = logger.getLogs(include_archives=True)
+    assert len(live) == 6
+    assert len(everything) == 12
+    assert everything[6:] == live
+    assert "first output 0" in everything[0]
+    assert len(logger.getLogs(log_type='input', include_archives=True)) == 2
+    # A limited read continues into the archives on its own
+    assert logger.getLogs(limit=8) == everything[-8:]
+
+
+def test_size_rotation_keeps_every_record_counted(tmp_path, monkeypatch):
+    monkeypatch.setattr(autoLogger, "LOG_MAX_BYTES", 2000)
+    logger = make_logger(tmp_path)
+    log_entries(logger, 40, "sized")
+
+    archives = list_archives(logger.getLoggerFile())
+    assert len(archives) > 1
+    assert logger.getRecordCounts(include_archives=True) == {'output': 40, 'error': 20, 'input': 8}
+    assert logger.getLogCount(include_archives=True) == len(logger.getLogs(include_archives=True))
+
+
+def test_removed_archives_stop_being_counted(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 10, "first")
+    logger.rotate()
+    log_entries(logger, 2, "second")
+
+    assert logger.clearLogs(archivesOnly=True)
+    assert logger.getArchives() == []
+    assert logger.getLogCount(include_archives=True) == logger.getLogCount() == 4
+
+
+def test_read_records_by_time_type_and_limit(tmp_path):
+    logger = make_logger(tmp_path)
+    base = 1700000000.0
+    records = [
+        autoLogger.make_record(autoLogger.RECORD_TYPES[number % 3], f"message {number}", when=base + number)
+        for number in range(50)
+    ]
+    autoLogger.append_records(logger.getLoggerFile(), records)
+
+    in_range = logger.readRecords(start_time=base + 10, end_time=base + 14)
+    assert [record['message'] for record in in_range] == [f"message {number}" for number in range(10, 15)]
+    last_errors = logger.readRecords('error', limit=2)
+    assert [record['message'] for record in last_errors] == ["message 46", "message 49"]
+    assert [record['line'] for record in last_errors] == [47, 50]
+
+
+def test_legacy_log_that_is_only_read(tmp_path):
+    logger = general_logger(write_legacy_log(tmp_path))
+
+    assert logger.getLogCount() == 4
+    assert logger.getRecordCounts() == {'output': 2, 'error': 1, 'input': 1}
+    assert logger.searchForLogs('hello') == ["Line 2: [2026-01-05 09:00:01] Output: hello from the old format"]
+    logs = logger.getLogs()
+    assert len(logs) == 4
+    assert logs[-1] == "[2026-01-05 09:00:03] User Input: question: what is logged"
+    assert logger.tailRecords(1)[0]['prompt'] == "question"
+
+
+def test_legacy_log_search_from_a_new_logger(tmp_path):
+    # As October's /search_logs does, with a logger opened only to search
+    path = write_legacy_log(tmp_path)
+    assert general_logger(path).searchLogs('failed')[0]['type'] == 'error'
+    assert general_logger(path).getLogCount('input') == 1
+
+
+def test_converted_legacy_log_does_not_rotate_on_its_first_write(tmp_path):
+    logger = general_logger(write_legacy_log(tmp_path))
+    logger.addToLogs("new one")
+    logger.flush()
+
+    assert logger.getArchives() == []
+    assert logger.getLogCount() == 5
+    assert logger.getLogs()[-1].endswith("Output: new one")
+
+
+def test_age_rotation_counts_from_the_segment_start(tmp_path, monkeypatch):
+    monkeypatch.setattr(autoLogger, "LOG_MAX_AGE", 60)
+    logger = make_logger(tmp_path)
+    log_entries(logger, 2, "young")
+    assert logger.getArchives() == []
+
+    autoLogger.start_segment(logger.getLoggerFile(), time.time() - 61)
+    logger.addToLogs("after a minute")
+    logger.flush()
+
+    assert len(logger.getArchives()) == 1
+    assert logger.getLogCount(include_archives=True) == 5
+    # The next segment starts at the rotation, so the following write stays in the live log
+    logger.addToLogs("next segment")
+    logger.flush()
+    assert len(logger.getArchives()) == 1
+    assert logger.getLogs() == [logger.getLogs(include_archives=True)[-1]]
+
+
+def test_buffered_writer_flush_writes_everything_queued(tmp_path):
+    filename = str(tmp_path / "buffered_log.txt")
+    # Nothing would be written without a flush for a minute
+    writer = BufferedLogWriter(flush_bytes=1 << 30, flush_interval=60)
+    for number in range(20):
+        writer.write(filename, make_record('output', f"message {number}"))
+    assert not os.path.exists(filename)
+
+    assert writer.flush()
+    assert read_messages(filename) == [f"message {number}" for number in range(20)]
+    assert writer.stats() == {'pending': 0, 'written': 20, 'dropped': 0, 'write_errors': 0}
+    writer.shutdown()
+
+
+def test_buffered_writer_drops_the_oldest_records_when_full(tmp_path):
+    filename = str(tmp_path / "buffered_log.txt")
+    writer = BufferedLogWriter(max_entries=5, flush_bytes=1 << 30, flush_interval=60)
+    for number in range(8):
+        writer.write(filename, make_record('output', f"message {number}"))
+    assert writer.stats()['dropped'] == 3
+
+    assert writer.flush()
+    assert read_messages(filename) == [f"message {number}" for number in range(3, 8)]
+    assert writer.stats() == {'pending': 0, 'written': 5, 'dropped': 3, 'write_errors': 0}
+    writer.shutdown()
+
+
+def test_buffered_writer_shutdown_writes_what_is_pending(tmp_path):
+    filename = str(tmp_path / "buffered_log.txt")
+    writer = BufferedLogWriter(flush_bytes=1 << 30, flush_interval=60)
+    for number in range(4):
+        writer.write(filename, make_record('error', f"message {number}"))
+
+    writer.shutdown()
+    assert writer.thread is None
+    assert read_messages(filename) == [f"message {number}" for number in range(4)]
+    assert writer.stats()['pending'] == 0
+
+
+def search_messages(logger, searchTerm, narrowTerm=None, log_type=None):
+    return [result['content'].split(": ", 2)[-1] for result in logger.searchLogs(searchTerm, log_type, narrowTerm)]
+
+
+def test_search_matches_long_terms_by_trigram_and_short_terms_with_like(tmp_path):
+    logger = make_logger(tmp_path)
+    for message in ["Alpha beta", "gamma ab", "50% off", "500 items"]:
+        logger.addToLogs(message)
+    logger.addToErrorLogs("beta failed")
+
+    # Three characters or more go through the trigram index, ignoring case
+    assert search_messages(logger, "BETA") == ["Alpha beta", "beta failed"]
+    assert search_messages(logger, "beta", "alp") == ["Alpha beta"]
+    assert search_messages(logger, "beta", log_type='error') == ["beta failed"]
+    # Shorter terms are matched with LIKE, with its wildcards taken literally
+    assert search_messages(logger, "Ab") == ["gamma ab"]
+    assert search_messages(logger, "0%") == ["50% off"]
+    assert search_messages(logger, "beta", "ed") == ["beta failed"]
+
+
+def test_search_index_only_reads_records_appended_since_the_last_search(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 4, "first")
+    assert len(logger.searchLogs("first output")) == 4
+    index = get_search_index(logger.loggerFile)
+    assert index._state()['offset'] == os.path.getsize(logger.loggerFile)
+
+    log_entries(logger, 3, "second")
+    assert len(logger.searchLogs("output")) == 7
+    assert [result['line'] for result in logger.searchLogs("second output")] == [8, 11, 12]
+    assert index._state()['records'] == 13
+
+
+def test_search_relabels_records_when_the_log_is_rotated(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 3, "first")
+    assert len(logger.searchLogs("first")) == 6
+    archive = os.path.basename(logger.rotate())
+    log_entries(logger, 1, "second")
+
+    results = logger.searchLogs("output")
+    assert [(result['segment'], result['line']) for result in results] == [(archive, 1), (archive, 4), (archive, 5), (None, 1)]
+    # The archived rows were moved, not indexed a second time
+    assert len(logger.searchLogs("first")) == 6
+
+
+def test_search_forgets_the_records_of_removed_archives(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 2, "first")
+    logger.rotate()
+    log_entries(logger, 2, "second")
+    logger.rotate()
+    log_entries(logger, 1, "third")
+    first_archive, second_archive = [os.path.basename(archive) for archive in list_archives(logger.loggerFile)]
+    assert {result['segment'] for result in logger.searchLogs("output")} == {first_archive, second_archive, None}
+
+    get_search_index(logger.loggerFile).forget_segment(first_archive)
+    assert search_messages(logger, "output") == ["second output 0", "second output 1", "third output 0"]
+
+    # Deleting the archives drops their records too
+    logger.clearLogs(archivesOnly=True)
+    assert search_messages(logger, "output") == ["third output 0"]
+
+
+def test_records_read_backwards_across_block_boundaries(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 12, "tail")
+    forwards = [record['message'] for record in logger.readRecords()]
+
+    # Blocks smaller than a record, about one record, and bigger than the whole log
+    for block_size in (16, 100, 1 << 20):
+        backwards = [record['message'] for record in iter_records_reversed(logger.loggerFile, block_size)]
+        assert backwards == forwards[::-1]
+    assert [record['message'] for record in logger.tailRecords(3)] == forwards[-3:]
+
+
+def test_records_read_backwards_skip_a_partial_last_line(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 3, "tail")
+    with open(logger.loggerFile, 'ab') as log_file:
+        # A record another process is still writing
+        log_file.write(b'{"time": 1767225600.0, "type": "output", "message": "not finished yet')
+
+    for block_size in (8, 64, 1 << 20):
+        backwards = [record['message'] for record in iter_records_reversed(logger.loggerFile, block_size)]
+        assert backwards == ["tail error 2", "tail output 2", "tail output 1", "tail input 0", "tail error 0", "tail output 0"]
+
+
+def test_record_counts_after_cleaning_and_clearing(tmp_path):
+    logger = make_logger(tmp_path)
+    log_entries(logger, 6, "first")
+    assert logger.getRecordCounts() == {'output': 6, 'error': 3, 'input': 2}
+    with open(logger.loggerFile, 'ab') as log_file:
+        log_file.write(b"not a record\n")
+
+    assert logger.cleanLoggerFile()
+    assert logger.getRecordCounts() == {'output': 6, 'error': 3, 'input': 2}
+    log_entries(logger, 2, "second")
+    assert logger.getRecordCounts() == {'output': 8, 'error': 4, 'input': 3}
+
+    assert logger.clearLogs()
+    assert logger.getRecordCounts() == {'output': 0, 'error': 0, 'input': 0}
+    log_entries(logger, 1, "third")
+    assert logger.getRecordCounts() == {'output': 1, 'error': 1, 'input': 1}
+    assert logger.getLogCount() == 3